@@ -0,0 +1,195 @@
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+
+
+@dataclass(frozen=True)
+class ProxyRoute:
+    """Declarative mapping from a gateway route to an upstream route."""
+    name: str
+    method: str
+    path: str
+    upstream: str
+    upstream_path: str
+    # Body fields the gateway rejects the request without (400)
+    required: Tuple[str, ...] = ()
+    # Client field name -> upstream field name; any entry forces a JSON re-encode
+    field_map: Dict[str, str] = field(default_factory=dict)
+    # Body/path values copied into log_metadata, and string fields logged by length only
+    log_fields: Tuple[str, ...] = ("user_id",)
+    log_lengths: Tuple[str, ...] = ()
+    # Per-user limit: rate_limit requests per rate_period seconds (0 = unlimited);
+    # routes sharing a rate_group share one budget
+    rate_limit: int = 0
+    rate_period: float = 60
+    rate_group: str = ""
+    # Bulkhead this route runs in (config.settings.ROUTE_CLASSES)
+    route_class: str = "interactive_cheap"
+    # Response cache: seconds fresh, then served stale while refreshing, then served stale if upstream fails
+    cache_ttl: float = 0
+    stale_while_revalidate: float = 0
+    stale_if_error: float = 0
+    # Share one upstream call between identical concurrent requests
+    coalesce: bool = False
+    # POST that only reads (the body is a query): answers If-None-Match with 304 like a GET
+    idempotent: bool = False
+    # Race a second upstream attempt after the route's p95 latency (idempotent reads only)
+    hedge: bool = False
+    # Upstream answers with text/event-stream; relayed chunk by chunk with proxy buffering disabled
+    sse: bool = False
+    # Routes (by name) fetched speculatively at low priority after this one succeeds,
+    # with their required body fields copied from this request
+    prefetch: Tuple[str, ...] = ()
+    # Path param or body field whose value pins the request to one upstream replica (consistent hashing)
+    affinity: str = ""
+    # Opt in to shadow mirroring (config.settings <PREFIX>_SHADOW_URL); only for cheap reads that
+    # are safe to run twice, never LLM calls or requests that change upstream state
+    shadow: bool = False
+
+    @property
+    def transforms_body(self) -> bool:
+        return bool(self.field_map)
+
+    @property
+    def buffered(self) -> bool:
+        """Whether responses are read fully so they can be cached or shared."""
+        return bool(self.cache_ttl) or self.coalesce or self.hedge
+
+
+ROUTES = [
+    ProxyRoute(
+        name="get_user_data",
+        method="POST",
+        path="/api/user-data",
+        upstream="analytics",
+        upstream_path="/analytics/user-data",
+        required=("user_id",),
+        coalesce=True,
+        prefetch=("get_recommendations", "analyze_stock_sentiments"),
+        shadow=True,
+    ),
+    ProxyRoute(
+        name="simulate_investment",
+        method="POST",
+        path="/api/simulate",
+        upstream="analytics",
+        upstream_path="/analytics/simulate",
+        required=("user_id", "simulation_data"),
+        route_class="interactive_llm",
+        rate_limit=30,
+    ),
+    ProxyRoute(
+        name="get_recommendations",
+        method="POST",
+        path="/api/recommend",
+        upstream="analytics",
+        upstream_path="/analytics/recommend",
+        required=("user_id",),
+        coalesce=True,
+    ),
+    ProxyRoute(
+        name="analyze_stock_sentiments",
+        method="POST",
+        path="/api/stock-sentiments",
+        upstream="nlp",
+        upstream_path="/nlp/user-stock-sentiments",
+        required=("user_id",),
+        field_map={"user_id": "userId"},
+        coalesce=True,
+        route_class="interactive_llm",
+        rate_limit=10,
+    ),
+    ProxyRoute(
+        name="enhance_simulation",
+        method="POST",
+        path="/api/enhance",
+        upstream="nlp",
+        upstream_path="/nlp/enhance",
+        required=("simulation_data", "user_id", "ai_prompt"),
+        route_class="interactive_llm",
+        rate_limit=10,
+        rate_group="enhance",
+    ),
+    ProxyRoute(
+        name="process_query",
+        method="POST",
+        path="/api/query",
+        upstream="nlp",
+        upstream_path="/nlp/query",
+        required=("query", "user_id"),
+        log_lengths=("query",),
+        route_class="interactive_llm",
+        rate_limit=20,
+        rate_group="query",
+    ),
+    ProxyRoute(
+        name="stream_enhance_simulation",
+        method="POST",
+        path="/api/enhance/stream",
+        upstream="nlp",
+        upstream_path="/nlp/enhance/stream",
+        required=("simulation_data", "user_id", "ai_prompt"),
+        route_class="interactive_llm",
+        sse=True,
+        rate_limit=10,
+        rate_group="enhance",
+    ),
+    ProxyRoute(
+        name="stream_process_query",
+        method="POST",
+        path="/api/query/stream",
+        upstream="nlp",
+        upstream_path="/nlp/query/stream",
+        required=("query", "user_id"),
+        log_lengths=("query",),
+        route_class="interactive_llm",
+        sse=True,
+        rate_limit=20,
+        rate_group="query",
+    ),
+    ProxyRoute(
+        name="get_stock_latest",
+        method="GET",
+        path="/api/stock-latest/{ticker}",
+        upstream="financial",
+        upstream_path="/api/stock/latest/{ticker}",
+        log_fields=("ticker",),
+        affinity="ticker",
+        cache_ttl=60,
+        stale_while_revalidate=300,
+        stale_if_error=3600,
+        coalesce=True,
+        hedge=True,
+        shadow=True,
+    ),
+    ProxyRoute(
+        name="get_stock_data",
+        method="POST",
+        path="/api/stock-data",
+        upstream="financial",
+        upstream_path="/api/stock/data",
+        required=("ticker", "start_date", "end_date"),
+        log_fields=("ticker",),
+        affinity="ticker",
+        cache_ttl=900,
+        stale_while_revalidate=3600,
+        stale_if_error=86400,
+        coalesce=True,
+        idempotent=True,
+        shadow=True,
+    ),
+    ProxyRoute(
+        name="get_stock_data_batch",
+        method="POST",
+        path="/api/stock-data/batch",
+        upstream="financial",
+        upstream_path="/api/stock/data/batch",
+        required=("tickers", "start_date", "end_date"),
+        log_fields=("tickers",),
+        cache_ttl=900,
+        stale_while_revalidate=3600,
+        stale_if_error=86400,
+        coalesce=True,
+        idempotent=True,
+        shadow=True,
+    ),
+]
@@ -3,6 +3,175 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-FINANCIAL_SERVER_URL = os.getenv("FINANCIAL_SERVER_URL", "http://localhost:8001")
-NLP_SERVER_URL = os.getenv("NLP_SERVER_URL", "http://localhost:8000")
-ANALYTICS_SERVER_URL = os.getenv("ANALYTICS_SERVER_URL", "http://localhost:8002")
\ No newline at end of file
+# Each may list several comma-separated replicas; replicas of one upstream must share the same path prefix
+FINANCIAL_SERVER_URL = os.getenv("FINANCIAL_SERVER_URL", "http://20.244.41.104:8001")
+NLP_SERVER_URL = os.getenv("NLP_SERVER_URL", "http://20.244.41.104:8000")
+ANALYTICS_SERVER_URL = os.getenv("ANALYTICS_SERVER_URL", "http://20.244.41.104:8002")
+
+
+def _upstream(prefix: str, base_url: str, timeout: str, health_interval: str = "10",
+              health_path: str = "/health") -> dict:
+    """Connection pool settings for one upstream, overridable with <PREFIX>_* env vars."""
+    return {
+        "base_urls": [url.strip().rstrip("/") for url in base_url.split(",") if url.strip()],
+        # "least_outstanding" or "p2c" (power of two choices)
+        "balancer": os.getenv(f"{prefix}_BALANCER", "least_outstanding"),
+        # Points per replica on the hash ring used by routes with replica affinity
+        "virtual_nodes": int(os.getenv(f"{prefix}_VIRTUAL_NODES", "160")),
+        # Active checks of multi-replica pools: any response below 500 counts as healthy;
+        # an interval of 0 disables them
+        "health": {
+            "path": os.getenv(f"{prefix}_HEALTH_PATH", health_path),
+            "interval": float(os.getenv(f"{prefix}_HEALTH_INTERVAL", health_interval)),
+            "timeout": float(os.getenv(f"{prefix}_HEALTH_TIMEOUT", "2")),
+            "unhealthy_threshold": int(os.getenv(f"{prefix}_HEALTH_UNHEALTHY_THRESHOLD", "2")),
+            "healthy_threshold": int(os.getenv(f"{prefix}_HEALTH_HEALTHY_THRESHOLD", "1")),
+        },
+        # Candidate build that receives a copy of sample_percent of this upstream's requests
+        # on routes with shadow=True (config.routes)
+        "shadow": {
+            "url": os.getenv(f"{prefix}_SHADOW_URL"),
+            "sample_percent": float(os.getenv(f"{prefix}_SHADOW_SAMPLE_PERCENT", "0")),
+        },
+        # Passive ejection after consecutive failures, for base_seconds times the number of ejections so far
+        "ejection": {
+            "consecutive_failures": int(os.getenv(f"{prefix}_EJECT_CONSECUTIVE_FAILURES", "5")),
+            "base_seconds": float(os.getenv(f"{prefix}_EJECT_BASE_SECONDS", "30")),
+            "max_seconds": float(os.getenv(f"{prefix}_EJECT_MAX_SECONDS", "300")),
+        },
+        "max_connections": int(os.getenv(f"{prefix}_POOL_MAX_CONNECTIONS", "100")),
+        "max_keepalive_connections": int(os.getenv(f"{prefix}_POOL_MAX_KEEPALIVE", "20")),
+        "keepalive_expiry": float(os.getenv(f"{prefix}_POOL_KEEPALIVE_EXPIRY", "30")),
+        # HTTP/2 is only negotiated over TLS (ALPN); plain http:// upstreams stay on HTTP/1.1
+        "http2": os.getenv(f"{prefix}_HTTP2", "true").lower() == "true",
+        "timeout": float(os.getenv(f"{prefix}_TIMEOUT", timeout)),
+        "connect_timeout": float(os.getenv(f"{prefix}_CONNECT_TIMEOUT", "5")),
+        "pool_timeout": float(os.getenv(f"{prefix}_POOL_TIMEOUT", "10")),
+        "breaker": {
+            "window_seconds": float(os.getenv(f"{prefix}_BREAKER_WINDOW", "30")),
+            "min_requests": int(os.getenv(f"{prefix}_BREAKER_MIN_REQUESTS", "20")),
+            "error_rate": float(os.getenv(f"{prefix}_BREAKER_ERROR_RATE", "0.5")),
+            "slow_call_seconds": float(os.getenv(f"{prefix}_BREAKER_SLOW_CALL", str(float(timeout) / 2))),
+            "slow_call_rate": float(os.getenv(f"{prefix}_BREAKER_SLOW_CALL_RATE", "0.5")),
+            "open_seconds": float(os.getenv(f"{prefix}_BREAKER_OPEN_SECONDS", "15")),
+            "half_open_probes": int(os.getenv(f"{prefix}_BREAKER_HALF_OPEN_PROBES", "3")),
+        },
+        # Adaptive (AIMD) concurrency limit with a bounded wait queue; disable with <PREFIX>_CONCURRENCY_ENABLED=false
+        "concurrency_enabled": os.getenv(f"{prefix}_CONCURRENCY_ENABLED", "true").lower() == "true",
+        "concurrency": {
+            "initial_limit": int(os.getenv(f"{prefix}_CONCURRENCY_INITIAL", "20")),
+            "min_limit": int(os.getenv(f"{prefix}_CONCURRENCY_MIN", "2")),
+            "max_limit": int(os.getenv(f"{prefix}_CONCURRENCY_MAX", os.getenv(f"{prefix}_POOL_MAX_CONNECTIONS", "100"))),
+            "max_queue": int(os.getenv(f"{prefix}_CONCURRENCY_MAX_QUEUE", "50")),
+            "queue_timeout": float(os.getenv(f"{prefix}_CONCURRENCY_QUEUE_TIMEOUT", "5")),
+        },
+    }
+
+
+# NLP calls wait on Gemini and news scraping, analytics on Prophet fits
+UPSTREAMS = {
+    "analytics": _upstream("ANALYTICS", ANALYTICS_SERVER_URL, "60"),
+    "nlp": _upstream("NLP", NLP_SERVER_URL, "90"),
+    "financial": _upstream("FINANCIAL", FINANCIAL_SERVER_URL, "30", health_path="/api/health"),
+}
+
+# Gateway response cache (in-process LRU, optional shared Redis tier)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")
+
+# Alpha Vantage FX feed behind /api/alpha-vantage; credentials come from the environment only
+ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY", "")
+# Third-party API: no active health checks
+ALPHA_VANTAGE = _upstream("ALPHA_VANTAGE", os.getenv("ALPHA_VANTAGE_URL", "https://www.alphavantage.co"), "30", "0")
+# Shared snapshot and refresh lock across gateway replicas; unset runs without Redis
+FX_REDIS_HOST = os.getenv("FX_REDIS_HOST")
+FX_REDIS_PORT = int(os.getenv("FX_REDIS_PORT", "6379"))
+FX_REDIS_USERNAME = os.getenv("FX_REDIS_USERNAME")
+FX_REDIS_PASSWORD = os.getenv("FX_REDIS_PASSWORD")
+FX_REDIS_MAX_CONNECTIONS = int(os.getenv("FX_REDIS_MAX_CONNECTIONS", "10"))
+FX_CACHE_TTL_SECONDS = int(os.getenv("FX_CACHE_TTL_SECONDS", "3600"))
+# Refresh this long before the cached snapshot expires so readers never miss
+FX_REFRESH_MARGIN_SECONDS = int(os.getenv("FX_REFRESH_MARGIN_SECONDS", "300"))
+# Provider limit: requests per second and burst size for the token bucket
+# (burst 0 = one token per currency pair, so a refresh fetches every pair at once)
+FX_RATE_PER_SECOND = float(os.getenv("FX_RATE_PER_SECOND", "0.8"))
+FX_RATE_BURST = int(os.getenv("FX_RATE_BURST", "0"))
+FX_STORE_PATH = os.getenv("FX_STORE_PATH", "data/fx_bars.sqlite3")
+
+# Synthetic probes behind /api/test, sent straight to the upstreams; a positive interval also runs them in the background
+PROBE_REPEAT = int(os.getenv("PROBE_REPEAT", "3"))
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", "4"))
+PROBE_TIMEOUT = float(os.getenv("PROBE_TIMEOUT", "120"))
+PROBE_INTERVAL_SECONDS = float(os.getenv("PROBE_INTERVAL_SECONDS", "0"))
+
+# /api/batch limits
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_DEFAULT_DEADLINE_MS = int(os.getenv("BATCH_DEFAULT_DEADLINE_MS", "15000"))
+BATCH_MAX_DEADLINE_MS = int(os.getenv("BATCH_MAX_DEADLINE_MS", "60000"))
+
+# Response compression: bodies below the threshold are sent as-is
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+# Session encryption: one RSA handshake per client session, then AES-GCM per request
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "100000"))
+KEY_RELOAD_INTERVAL_SECONDS = float(os.getenv("KEY_RELOAD_INTERVAL_SECONDS", "30"))
+# Replay protection: a request's X-Session-Seq must be new and within this many of the highest seen
+SESSION_REPLAY_WINDOW = int(os.getenv("SESSION_REPLAY_WINDOW", "64"))
+# When true, /api requests without a session are rejected instead of passed through in plaintext
+ENCRYPTION_REQUIRED = os.getenv("ENCRYPTION_REQUIRED", "false").lower() == "true"
+
+# Per-user rate limits (limits themselves are declared per route in config/routes.py);
+# with a Redis URL the budget is shared by all gateway replicas
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+
+# Ticker subscriptions (/ws/stock-latest, /api/stock-stream): one shared poller per ticker
+TICKER_POLL_SECONDS = float(os.getenv("TICKER_POLL_SECONDS", "15"))
+TICKER_STREAM_MAX_TICKERS = int(os.getenv("TICKER_STREAM_MAX_TICKERS", "20"))
+
+# /api/dashboard/{user_id}: sections share one deadline; prices cover at most this many tickers
+DASHBOARD_DEADLINE_MS = int(os.getenv("DASHBOARD_DEADLINE_MS", "10000"))
+DASHBOARD_MAX_TICKERS = int(os.getenv("DASHBOARD_MAX_TICKERS", "10"))
+
+# Speculative prefetch of follow-up routes (declared per route in config/routes.py); skipped
+# while gateway concurrency is above PREFETCH_MAX_LOAD of GATEWAY_MAX_CONCURRENCY or any bulkhead queues
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_TTL_SECONDS = float(os.getenv("PREFETCH_TTL_SECONDS", "30"))
+PREFETCH_MAX_ENTRIES = int(os.getenv("PREFETCH_MAX_ENTRIES", "1000"))
+PREFETCH_MAX_LOAD = float(os.getenv("PREFETCH_MAX_LOAD", "0.5"))
+
+# Shadow traffic (per-upstream targets above): mirrored requests beyond this many in flight are dropped;
+# at most SHADOW_MAX_DIFF_KEYS distinct differing response keys are tracked per route
+SHADOW_MAX_IN_FLIGHT = int(os.getenv("SHADOW_MAX_IN_FLIGHT", "20"))
+SHADOW_MAX_DIFF_KEYS = int(os.getenv("SHADOW_MAX_DIFF_KEYS", "50"))
+
+# Route classes (bulkheads): each gets its own share of every upstream pool, a concurrency
+# budget and a wait queue; queued requests are admitted by weighted fair scheduling
+ROUTE_CLASSES = {
+    "interactive_cheap": {
+        "weight": int(os.getenv("INTERACTIVE_CHEAP_WEIGHT", "6")),
+        "pool_share": float(os.getenv("INTERACTIVE_CHEAP_POOL_SHARE", "0.5")),
+        "max_concurrency": int(os.getenv("INTERACTIVE_CHEAP_MAX_CONCURRENCY", "128")),
+        "max_queue": int(os.getenv("INTERACTIVE_CHEAP_MAX_QUEUE", "256")),
+        "queue_timeout": float(os.getenv("INTERACTIVE_CHEAP_QUEUE_TIMEOUT", "2")),
+    },
+    "interactive_llm": {
+        "weight": int(os.getenv("INTERACTIVE_LLM_WEIGHT", "2")),
+        "pool_share": float(os.getenv("INTERACTIVE_LLM_POOL_SHARE", "0.35")),
+        "max_concurrency": int(os.getenv("INTERACTIVE_LLM_MAX_CONCURRENCY", "32")),
+        "max_queue": int(os.getenv("INTERACTIVE_LLM_MAX_QUEUE", "64")),
+        "queue_timeout": float(os.getenv("INTERACTIVE_LLM_QUEUE_TIMEOUT", "20")),
+    },
+    "background": {
+        "weight": int(os.getenv("BACKGROUND_WEIGHT", "1")),
+        "pool_share": float(os.getenv("BACKGROUND_POOL_SHARE", "0.15")),
+        "max_concurrency": int(os.getenv("BACKGROUND_MAX_CONCURRENCY", "16")),
+        "max_queue": int(os.getenv("BACKGROUND_MAX_QUEUE", "64")),
+        "queue_timeout": float(os.getenv("BACKGROUND_QUEUE_TIMEOUT", "30")),
+    },
+}
+GATEWAY_MAX_CONCURRENCY = int(os.getenv("GATEWAY_MAX_CONCURRENCY", "160"))
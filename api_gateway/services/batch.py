@@ -0,0 +1,104 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Tuple
+
+from config.settings import BATCH_DEFAULT_DEADLINE_MS, BATCH_MAX_DEADLINE_MS, BATCH_MAX_REQUESTS
+from services.proxy import error_status, execute_route, match_route
+from utils.logger import log_metadata
+
+
+def validate_batch(body: Any) -> List[Dict[str, Any]]:
+    """Check the batch envelope and return its sub-requests."""
+    if not isinstance(body, dict) or not isinstance(body.get("requests"), list) or not body["requests"]:
+        raise ValueError("Invalid request: requests list required")
+    items = body["requests"]
+    if len(items) > BATCH_MAX_REQUESTS:
+        raise ValueError(f"Invalid request: at most {BATCH_MAX_REQUESTS} requests per batch")
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get("path"):
+            raise ValueError(f"Invalid request: requests[{index}].path required")
+    return items
+
+
+def _encode_item(meta: Dict[str, Any], body: bytes, content_type: str) -> bytes:
+    """Serialize one result, splicing JSON upstream bodies in without decoding them."""
+    encoded = json.dumps(meta).encode("utf-8")
+    if not body:
+        return encoded
+    if content_type.startswith("application/json"):
+        return encoded[:-1] + b', "body": ' + body + b"}"
+    return encoded[:-1] + b', "body": ' + json.dumps(body.decode("utf-8", "replace")).encode("utf-8") + b"}"
+
+
+async def _run_item(index: int, item: Dict[str, Any]) -> Tuple[int, bytes]:
+    started = time.perf_counter()
+    meta: Dict[str, Any] = {
+        "id": item.get("id", index),
+        "method": item.get("method", "POST").upper(),
+        "path": item["path"],
+    }
+    try:
+        route, path_params = match_route(meta["method"], meta["path"])
+        raw_body = json.dumps(item["body"]).encode("utf-8") if item.get("body") is not None else b""
+        response, cache_state = await execute_route(route, path_params, raw_body)
+        meta.update({
+            "status": response.status_code,
+            "cache": cache_state,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+        return response.status_code, _encode_item(meta, response.body, response.headers.get("content-type", ""))
+    except LookupError as le:
+        meta.update({"status": 404, "error": str(le)})
+    except Exception as e:
+        status_code, detail, _ = error_status(e)
+        meta.update({"status": status_code, "error": detail})
+    meta["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return meta["status"], _encode_item(meta, b"", "")
+
+
+async def run_batch(body: Any) -> bytes:
+    """Execute every sub-request concurrently under one deadline.
+
+    Each item succeeds or fails on its own; items still running at the
+    deadline are cancelled and reported with status 504.
+    """
+    items = validate_batch(body)
+    deadline_ms = min(int(body.get("deadline_ms") or BATCH_DEFAULT_DEADLINE_MS), BATCH_MAX_DEADLINE_MS)
+    started = time.perf_counter()
+
+    tasks = [asyncio.ensure_future(_run_item(index, item)) for index, item in enumerate(items)]
+    await asyncio.wait(tasks, timeout=deadline_ms / 1000)
+
+    results = []
+    failed = 0
+    timed_out = 0
+    for index, (item, task) in enumerate(zip(items, tasks)):
+        if task.done():
+            status_code, encoded = task.result()
+        else:
+            task.cancel()
+            timed_out += 1
+            status_code, encoded = 504, _encode_item({
+                "id": item.get("id", index),
+                "method": item.get("method", "POST").upper(),
+                "path": item["path"],
+                "status": 504,
+                "error": f"Deadline of {deadline_ms}ms exceeded",
+            }, b"", "")
+        failed += status_code >= 400
+        results.append(encoded)
+
+    log_metadata({
+        "service": "api_gateway",
+        "endpoint": "/api/batch",
+        "requests": len(items),
+        "failed": failed,
+        "timed_out": timed_out,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "status": "success"
+    })
+    return (
+        b'{"deadline_ms": ' + str(deadline_ms).encode() + b', "failed": ' + str(failed).encode()
+        + b', "results": [' + b", ".join(results) + b"]}"
+    )
@@ -0,0 +1,124 @@
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict
+
+from config.settings import GATEWAY_MAX_CONCURRENCY, ROUTE_CLASSES
+from services.resilience import UpstreamUnavailableError
+
+
+class BulkheadFullError(UpstreamUnavailableError):
+    """Raised when a route class has no room left in its queue or its wait timed out."""
+
+    def __init__(self, route_class: str, reason: str, retry_after: float):
+        self.reason = reason
+        super().__init__(route_class, retry_after, f"Route class {route_class} saturated ({reason})")
+
+
+class RouteClass:
+    """Concurrency budget, wait queue and fair-share bookkeeping for one route class."""
+
+    def __init__(self, name: str, weight: int, max_concurrency: int, max_queue: int,
+                 queue_timeout: float, **_):
+        self.name = name
+        self.weight = max(weight, 1)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.virtual_time = 0.0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.counters = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_queue_timeout": 0}
+
+
+class BulkheadScheduler:
+    """Gateway-wide concurrency shared between route classes.
+
+    A class never exceeds its own max_concurrency, and the gateway never exceeds
+    total_concurrency. When slots free up, waiting classes are served in
+    weighted-fair order: each admission advances the class's virtual time by
+    1/weight and the class with the smallest virtual time goes next, so an LLM
+    burst cannot crowd cheap lookups out of the shared capacity.
+    """
+
+    def __init__(self, classes: Dict[str, Dict[str, Any]] = ROUTE_CLASSES,
+                 total_concurrency: int = GATEWAY_MAX_CONCURRENCY):
+        self.classes = {name: RouteClass(name, **cfg) for name, cfg in classes.items()}
+        self.total_concurrency = total_concurrency
+        self.in_flight = 0
+        self.virtual_clock = 0.0
+
+    def _has_room(self, route_class: RouteClass) -> bool:
+        return route_class.in_flight < route_class.max_concurrency and self.in_flight < self.total_concurrency
+
+    def _admit(self, route_class: RouteClass):
+        # A class returning from idle starts at the current clock instead of spending saved-up credit
+        start = max(route_class.virtual_time, self.virtual_clock)
+        route_class.virtual_time = start + 1 / route_class.weight
+        self.virtual_clock = start
+        route_class.in_flight += 1
+        self.in_flight += 1
+        route_class.counters["admitted"] += 1
+
+    def _dispatch(self):
+        while self.in_flight < self.total_concurrency:
+            eligible = [c for c in self.classes.values()
+                        if c.waiters and c.in_flight < c.max_concurrency]
+            if not eligible:
+                return
+            route_class = min(eligible, key=lambda c: max(c.virtual_time, self.virtual_clock))
+            waiter = route_class.waiters.popleft()
+            if waiter.done():
+                continue
+            self._admit(route_class)
+            waiter.set_result(None)
+
+    async def acquire(self, class_name: str):
+        """Wait for a slot in the given route class."""
+        route_class = self.classes[class_name]
+        if self._has_room(route_class) and not route_class.waiters:
+            self._admit(route_class)
+            return
+        if len(route_class.waiters) >= route_class.max_queue:
+            route_class.counters["shed_queue_full"] += 1
+            raise BulkheadFullError(class_name, "queue full", 1.0)
+
+        waiter = asyncio.get_running_loop().create_future()
+        route_class.waiters.append(waiter)
+        route_class.counters["queued"] += 1
+        try:
+            await asyncio.wait_for(waiter, timeout=route_class.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                self.release(class_name)
+            elif waiter in route_class.waiters:
+                route_class.waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            route_class.counters["shed_queue_timeout"] += 1
+            raise BulkheadFullError(class_name, "queue timeout", route_class.queue_timeout)
+
+    def release(self, class_name: str):
+        route_class = self.classes[class_name]
+        route_class.in_flight -= 1
+        self.in_flight -= 1
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "total_concurrency": self.total_concurrency,
+            "classes": {
+                name: {
+                    "weight": c.weight,
+                    "max_concurrency": c.max_concurrency,
+                    "in_flight": c.in_flight,
+                    "queue_depth": len(c.waiters),
+                    **c.counters,
+                }
+                for name, c in self.classes.items()
+            },
+        }
+
+
+# Global scheduler shared by every upstream client
+bulkheads = BulkheadScheduler()
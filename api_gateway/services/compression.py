@@ -0,0 +1,152 @@
+import gzip
+import hashlib
+import importlib.util
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from config.routes import ProxyRoute
+from config.settings import COMPRESSION_BROTLI_QUALITY, COMPRESSION_GZIP_LEVEL, COMPRESSION_MIN_BYTES
+from services.response_cache import CachedResponse
+
+BROTLI_AVAILABLE = importlib.util.find_spec("brotli") is not None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q-values; None for identity."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name] = quality
+    wildcard = weights.get("*", 0.0)
+    candidates = ["br", "gzip"] if BROTLI_AVAILABLE else ["gzip"]
+    best = max(candidates, key=lambda name: weights.get(name, wildcard))
+    return best if weights.get(best, wildcard) > 0 else None
+
+
+def conditional(route: ProxyRoute) -> bool:
+    """Whether a route answers If-None-Match: GETs and POST routes marked idempotent."""
+    return route.method == "GET" or route.idempotent
+
+
+def cache_control(route: ProxyRoute, cached: CachedResponse) -> str:
+    """Cache-Control for a route: its remaining freshness for cached GETs, no-store otherwise.
+
+    Idempotent POSTs get no-cache: HTTP caches never reuse POST responses, but
+    a client may keep the body and its ETag and revalidate with If-None-Match.
+    """
+    if not route.cache_ttl:
+        return "no-store"
+    if route.method != "GET":
+        return "private, no-cache" if route.idempotent else "no-store"
+    directives = [f"public, max-age={max(0, int(route.cache_ttl - cached.age()))}"]
+    if route.stale_while_revalidate:
+        directives.append(f"stale-while-revalidate={route.stale_while_revalidate}")
+    if route.stale_if_error:
+        directives.append(f"stale-if-error={route.stale_if_error}")
+    return ", ".join(directives)
+
+
+def _etag_matches(if_none_match: str, etags: tuple) -> bool:
+    # If-None-Match uses weak comparison, and every encoding of a body is the same resource
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in etags:
+            return True
+    return False
+
+
+class ResponseEncoder:
+    """Adds strong ETags, conditional requests and negotiated compression to buffered responses.
+
+    The ETag and each compressed body are computed once per cached entry, so a
+    cache hit costs a dictionary lookup rather than a recompression.
+    """
+
+    def __init__(self, min_bytes: int = COMPRESSION_MIN_BYTES):
+        self.min_bytes = min_bytes
+        self.counters = {"responses": 0, "not_modified": 0, "compressed": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def _compressible(self, cached: CachedResponse) -> bool:
+        headers = cached.headers
+        if "content-encoding" in headers or len(cached.body) < self.min_bytes:
+            return False
+        return headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+
+    def _encode(self, cached: CachedResponse, encoding: str) -> bytes:
+        if encoding not in cached.variants:
+            if encoding == "br":
+                import brotli
+                cached.variants[encoding] = brotli.compress(cached.body, quality=COMPRESSION_BROTLI_QUALITY)
+            else:
+                # mtime=0 keeps the output, and so the ETag, identical across replicas
+                cached.variants[encoding] = gzip.compress(cached.body, COMPRESSION_GZIP_LEVEL, mtime=0)
+        return cached.variants[encoding]
+
+    def render(self, request: Request, route: ProxyRoute, cached: CachedResponse,
+               cache_state: Optional[str] = None) -> Response:
+        """Build the client response for a buffered upstream response."""
+        self.counters["responses"] += 1
+        if cached.etag is None:
+            cached.etag = hashlib.sha256(cached.body).hexdigest()[:32]
+
+        encoding = None
+        if self._compressible(cached):
+            encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        etag = f'"{cached.etag}-{encoding}"' if encoding else f'"{cached.etag}"'
+
+        headers = dict(cached.headers)
+        headers.pop("content-length", None)
+        headers["ETag"] = etag
+        headers["Cache-Control"] = cache_control(route, cached)
+        headers["Vary"] = "Accept-Encoding"
+        if cache_state:
+            headers["X-Cache"] = cache_state
+            headers["Age"] = str(max(0, int(cached.age())))
+
+        if_none_match = request.headers.get("if-none-match")
+        if (if_none_match and conditional(route) and cached.status_code == 200
+                and _etag_matches(if_none_match, (etag, f'"{cached.etag}"'))):
+            self.counters["not_modified"] += 1
+            for name in ("content-type", "content-encoding"):
+                headers.pop(name, None)
+            return Response(status_code=304, headers=headers)
+
+        body = cached.body
+        if encoding:
+            body = self._encode(cached, encoding)
+            headers["content-encoding"] = encoding
+            self.counters["compressed"] += 1
+            self.counters["bytes_in"] += len(cached.body)
+            self.counters["bytes_out"] += len(body)
+        return Response(content=body, status_code=cached.status_code, headers=headers)
+
+    def stats(self) -> Dict[str, Any]:
+        ratio = self.counters["bytes_out"] / self.counters["bytes_in"] if self.counters["bytes_in"] else 0.0
+        return {
+            **self.counters,
+            "brotli": BROTLI_AVAILABLE,
+            "min_bytes": self.min_bytes,
+            "compression_ratio": round(ratio, 4),
+        }
+
+
+# Global encoder used by the proxy for buffered routes
+response_encoder = ResponseEncoder()
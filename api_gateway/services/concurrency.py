@@ -0,0 +1,107 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from services.resilience import UpstreamUnavailableError
+
+
+class LoadShedError(UpstreamUnavailableError):
+    """Raised when a request is rejected before reaching an overloaded upstream."""
+
+    def __init__(self, upstream: str, reason: str, retry_after: float):
+        self.reason = reason
+        super().__init__(upstream, retry_after, f"Upstream {upstream} overloaded ({reason})")
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit with a bounded FIFO wait queue.
+
+    The limit grows by 1/limit per fast success and shrinks multiplicatively
+    (at most once per observed latency) when a call errors or takes longer
+    than latency_tolerance times the long-run average. Requests beyond the
+    limit wait in a queue of max_queue; a full queue or a wait longer than
+    queue_timeout sheds the request.
+    """
+
+    def __init__(self, name: str, initial_limit: int = 20, min_limit: int = 2, max_limit: int = 100,
+                 max_queue: int = 50, queue_timeout: float = 5.0, latency_tolerance: float = 1.5,
+                 backoff: float = 0.9):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.avg_latency = 0.0
+        self.last_decrease = 0.0
+        self.counters = {"accepted": 0, "queued": 0, "shed_queue_full": 0, "shed_queue_timeout": 0}
+
+    def _retry_after(self) -> float:
+        return max(self.avg_latency, 1.0)
+
+    def _wake(self):
+        while self.waiters and self.in_flight < int(self.limit):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self):
+        """Take a concurrency slot, queueing up to queue_timeout for one."""
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+            self.counters["accepted"] += 1
+            return
+        if len(self.waiters) >= self.max_queue:
+            self.counters["shed_queue_full"] += 1
+            raise LoadShedError(self.name, "queue full", self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.counters["queued"] += 1
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted as we gave up; hand it to the next waiter
+                self.in_flight -= 1
+                self._wake()
+            elif waiter in self.waiters:
+                self.waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.counters["shed_queue_timeout"] += 1
+            raise LoadShedError(self.name, "queue timeout", self._retry_after())
+        self.counters["accepted"] += 1
+
+    def release(self, latency: float, ok: Optional[bool]):
+        """Return a slot and adapt the limit to the call's outcome (None: cancelled, no sample)."""
+        self.in_flight -= 1
+        if ok is None:
+            self._wake()
+            return
+        baseline = self.avg_latency or latency
+        self.avg_latency = latency if not self.avg_latency else 0.95 * self.avg_latency + 0.05 * latency
+        now = time.monotonic()
+        if not ok or latency > baseline * self.latency_tolerance:
+            if now - self.last_decrease >= baseline:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self.last_decrease = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": math.floor(self.limit),
+            "in_flight": self.in_flight,
+            "queue_depth": len(self.waiters),
+            "avg_latency_ms": round(self.avg_latency * 1000, 1),
+            **self.counters,
+        }
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from config.settings import DASHBOARD_DEADLINE_MS, DASHBOARD_MAX_TICKERS
+from services.proxy import error_status, execute_route, match_route
+from services.ticker_stream import parse_tickers
+from utils.logger import log_metadata
+
+# Section name -> gateway route it is built from; every section takes {"user_id": ...}
+USER_SECTIONS = {
+    "user_data": "/api/user-data",
+    "recommendations": "/api/recommend",
+    "stock_sentiments": "/api/stock-sentiments",
+}
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _run_section(method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        route, path_params = match_route(method, path)
+        raw_body = json.dumps(body).encode("utf-8") if body is not None else b""
+        response, cache_state = await execute_route(route, path_params, raw_body)
+        if response.headers.get("content-type", "").startswith("application/json"):
+            data = json.loads(response.body)
+        else:
+            data = response.body.decode("utf-8", "replace")
+        section = {"status": response.status_code, "cache": cache_state, "data": data}
+    except Exception as e:
+        status_code, detail, _ = error_status(e)
+        section = {"status": status_code, "error": detail}
+    section["duration_ms"] = _elapsed_ms(started)
+    return section
+
+
+def _collect(task: asyncio.Task, deadline_ms: int) -> Dict[str, Any]:
+    if task.done():
+        return task.result()
+    task.cancel()
+    return {"status": 504, "error": f"Deadline of {deadline_ms}ms exceeded", "duration_ms": deadline_ms}
+
+
+def _holding_tickers(user_section: Dict[str, Any]) -> List[str]:
+    data = user_section.get("data")
+    holdings = data.get("stock_holdings") if isinstance(data, dict) else None
+    symbols = [h.get("stock") for h in holdings or [] if isinstance(h, dict) and h.get("stock")]
+    try:
+        return parse_tickers(symbols[:DASHBOARD_MAX_TICKERS]) if symbols else []
+    except ValueError:
+        return []
+
+
+def validate_tickers(tickers: Optional[str]) -> Optional[List[str]]:
+    if tickers is None:
+        return None
+    symbols = parse_tickers(tickers)
+    if len(symbols) > DASHBOARD_MAX_TICKERS:
+        raise ValueError(f"Invalid request: at most {DASHBOARD_MAX_TICKERS} tickers per dashboard")
+    return symbols
+
+
+async def build_dashboard(user_id: str, tickers: Optional[str] = None,
+                          deadline_ms: int = DASHBOARD_DEADLINE_MS) -> Dict[str, Any]:
+    """Fetch every dashboard section concurrently under one deadline.
+
+    Sections fail or time out independently and each reports its own status
+    and duration. Without explicit tickers, prices are fetched for the
+    holdings in the user-data section as soon as it arrives.
+    """
+    tickers = validate_tickers(tickers)
+    started = time.perf_counter()
+    body = {"user_id": user_id}
+    tasks = {name: asyncio.ensure_future(_run_section("POST", path, body)) for name, path in USER_SECTIONS.items()}
+    price_tasks: Dict[str, asyncio.Task] = {}
+    price_source = {"error": None}
+
+    async def fan_out_prices():
+        symbols = tickers
+        if symbols is None:
+            # Shielded so hitting the deadline here does not also cancel the user-data section
+            user_section = await asyncio.shield(tasks["user_data"])
+            if user_section["status"] != 200:
+                price_source["error"] = "user_data unavailable"
+                return
+            symbols = _holding_tickers(user_section)
+        for symbol in symbols:
+            price_tasks[symbol] = asyncio.ensure_future(_run_section("GET", f"/api/stock-latest/{symbol}"))
+        if price_tasks:
+            await asyncio.wait(price_tasks.values())
+
+    prices = asyncio.ensure_future(fan_out_prices())
+    await asyncio.wait([*tasks.values(), prices], timeout=deadline_ms / 1000)
+
+    sections = {name: _collect(task, deadline_ms) for name, task in tasks.items()}
+    price_sections = {symbol: _collect(task, deadline_ms) for symbol, task in price_tasks.items()}
+    if price_source["error"]:
+        sections["prices"] = {"status": 424, "error": price_source["error"], "tickers": {}}
+    elif not prices.done() and not price_tasks:
+        prices.cancel()
+        sections["prices"] = {"status": 504, "error": f"Deadline of {deadline_ms}ms exceeded", "tickers": {}}
+    else:
+        prices.cancel()
+        sections["prices"] = {"status": 200, "tickers": price_sections}
+    sections["prices"]["duration_ms"] = max([s["duration_ms"] for s in price_sections.values()] or [0])
+
+    failed = [name for name, section in sections.items() if section["status"] >= 400]
+    failed += [f"prices.{symbol}" for symbol, section in price_sections.items() if section["status"] >= 400]
+    duration_ms = _elapsed_ms(started)
+    log_metadata({
+        "service": "api_gateway",
+        "endpoint": "/api/dashboard",
+        "user_id": user_id,
+        "failed": failed,
+        "duration_ms": duration_ms,
+        "status": "success" if not failed else "partial"
+    })
+    return {
+        "user_id": user_id,
+        "deadline_ms": deadline_ms,
+        "duration_ms": duration_ms,
+        "failed": failed,
+        "sections": sections,
+    }
@@ -0,0 +1,384 @@
+import asyncio
+import base64
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from config.settings import (
+    ENCRYPTION_REQUIRED, KEY_RELOAD_INTERVAL_SECONDS, SESSION_MAX_ENTRIES, SESSION_REPLAY_WINDOW,
+    SESSION_TTL_SECONDS
+)
+from utils.key_provider import (
+    CLIENT_PRIVATE_KEY_PATH, GATEWAY_PRIVATE_KEY_PATH, GATEWAY_PUBLIC_KEY_PATH, load_private_key, setup_keys
+)
+from utils.logger import log_metadata
+
+SESSION_HEADER = "x-session-id"
+SEQUENCE_HEADER = "x-session-seq"
+NONCE_BYTES = 12
+
+# Reachable without a session even when encryption is required
+EXEMPT_PATHS = ("/", "/api/session", "/api/public-key", "/api/public-private-key", "/api/stats")
+
+OAEP = padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+
+
+def envelope_aad(direction: str, method: str, path: str, sequence: int) -> bytes:
+    """Associated data binding an envelope to its direction ("req"/"resp"), route and sequence number.
+
+    The direction keeps a captured response from being sent back as a
+    request under the same session key, and the sequence number ties each
+    response to the request that produced it.
+    """
+    return f"{direction}|{method} {path}|{sequence}".encode("utf-8")
+
+
+def chunk_aad(aad: bytes, index: int, final: bool = False) -> bytes:
+    """Associated data for chunk `index` of an encrypted event stream.
+
+    The index stops chunks being dropped, reordered or replayed within the
+    stream; the final marker is sealed under the chunk count so a truncated
+    stream is detectable.
+    """
+    return aad + b"|" + str(index).encode("ascii") + (b"|end" if final else b"")
+
+
+class KeyStore:
+    """Gateway key material, loaded once and reloaded when the PEM files change on disk.
+
+    The previous private key is kept after a rotation so clients that fetched
+    the old public key can still complete their handshake.
+    """
+
+    def __init__(self, reload_interval: float = KEY_RELOAD_INTERVAL_SECONDS):
+        self.reload_interval = reload_interval
+        self.private_keys: List[Any] = []
+        self.public_key_pem: Optional[str] = None
+        self.client_private_key_pem: Optional[str] = None
+        self.mtimes: Dict[str, float] = {}
+        self.reloader: Optional[asyncio.Task] = None
+        self.reloads = 0
+
+    def _mtimes(self) -> Dict[str, float]:
+        paths = (GATEWAY_PRIVATE_KEY_PATH, GATEWAY_PUBLIC_KEY_PATH, CLIENT_PRIVATE_KEY_PATH)
+        return {path: os.path.getmtime(path) for path in paths if os.path.exists(path)}
+
+    def load(self):
+        private_key = load_private_key(GATEWAY_PRIVATE_KEY_PATH)
+        with open(GATEWAY_PUBLIC_KEY_PATH, "r") as f:
+            public_key_pem = f.read()
+        client_private_key_pem = None
+        if os.path.exists(CLIENT_PRIVATE_KEY_PATH):
+            with open(CLIENT_PRIVATE_KEY_PATH, "r") as f:
+                client_private_key_pem = f.read()
+        # Only a new gateway key shifts the current one into the previous slot
+        if not (self.private_keys and
+                self.private_keys[0].private_numbers() == private_key.private_numbers()):
+            self.private_keys = [private_key] + self.private_keys[:1]
+        self.public_key_pem = public_key_pem
+        self.client_private_key_pem = client_private_key_pem
+        self.mtimes = self._mtimes()
+
+    async def start(self):
+        await asyncio.to_thread(setup_keys)
+        await asyncio.to_thread(self.load)
+        if self.reload_interval > 0:
+            self.reloader = asyncio.create_task(self._reload_loop())
+
+    async def close(self):
+        if self.reloader is not None:
+            self.reloader.cancel()
+            try:
+                await self.reloader
+            except asyncio.CancelledError:
+                pass
+
+    async def _reload_loop(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                if self._mtimes() != self.mtimes:
+                    await asyncio.to_thread(self.load)
+                    self.reloads += 1
+                    log_metadata({"service": "api_gateway", "function": "key_reload", "status": "success"})
+            except Exception as e:
+                # Keep serving the keys already loaded until the files are readable again
+                log_metadata({"service": "api_gateway", "function": "key_reload", "error": str(e), "status": "error"})
+
+    def unwrap(self, wrapped_key: bytes) -> bytes:
+        """RSA-OAEP-decrypt a client's session key with the current or previous gateway key."""
+        for private_key in self.private_keys:
+            try:
+                return private_key.decrypt(wrapped_key, OAEP)
+            except ValueError:
+                continue
+        raise ValueError("Invalid request: encrypted_key could not be decrypted")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"loaded": bool(self.private_keys), "keys": len(self.private_keys), "reloads": self.reloads}
+
+
+class Session:
+    """A client's AES-256-GCM session key, its expiry and the request sequence numbers it has used.
+
+    Sequence numbers are accepted once each, within a sliding window below
+    the highest seen, so concurrent requests may arrive out of order but
+    none can be replayed.
+    """
+
+    def __init__(self, key: bytes, ttl: float, replay_window: int = SESSION_REPLAY_WINDOW):
+        self.aead = AESGCM(key)
+        self.expires_at = time.monotonic() + ttl
+        self.replay_window = replay_window
+        self.highest = 0
+        self.seen: Set[int] = set()
+        self.requests = 0
+
+    def fresh(self, sequence: int) -> bool:
+        """Whether a sequence number has not been used and is still inside the window."""
+        return sequence > 0 and sequence > self.highest - self.replay_window and sequence not in self.seen
+
+    def accept(self, sequence: int) -> bool:
+        """Record a sequence number as used; False if it is a replay or too old."""
+        if not self.fresh(sequence):
+            return False
+        self.seen.add(sequence)
+        if sequence > self.highest:
+            self.highest = sequence
+            floor = self.highest - self.replay_window
+            self.seen = {seen for seen in self.seen if seen > floor}
+        return True
+
+    def decrypt(self, envelope: bytes, aad: bytes) -> bytes:
+        data = json.loads(envelope)
+        return self.aead.decrypt(base64.b64decode(data["nonce"]), base64.b64decode(data["ciphertext"]), aad)
+
+    def encrypt(self, plaintext: bytes, aad: bytes) -> bytes:
+        nonce = os.urandom(NONCE_BYTES)
+        return json.dumps({
+            "nonce": base64.b64encode(nonce).decode("ascii"),
+            "ciphertext": base64.b64encode(self.aead.encrypt(nonce, plaintext, aad)).decode("ascii"),
+        }).encode("utf-8")
+
+
+class SessionStore:
+    """Expiring in-memory session keys, bounded by count with least-recently-used eviction."""
+
+    def __init__(self, keys: KeyStore, ttl: float = SESSION_TTL_SECONDS, max_entries: int = SESSION_MAX_ENTRIES):
+        self.keys = keys
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.sweeper: Optional[asyncio.Task] = None
+        self.counters = {"handshakes": 0, "handshake_errors": 0, "expired": 0, "evicted": 0,
+                         "requests": 0, "decrypt_errors": 0, "replays": 0}
+
+    async def start(self):
+        self.sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+            try:
+                await self.sweeper
+            except asyncio.CancelledError:
+                pass
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(min(self.ttl, 60))
+            now = time.monotonic()
+            for session_id in [sid for sid, s in self.sessions.items() if s.expires_at <= now]:
+                del self.sessions[session_id]
+                self.counters["expired"] += 1
+
+    async def handshake(self, body: Any) -> Dict[str, Any]:
+        """Unwrap a client-generated session key and register a new session for it."""
+        if not isinstance(body, dict) or not body.get("encrypted_key"):
+            raise ValueError("Invalid request: encrypted_key required")
+        try:
+            # RSA decryption is the expensive step; keep it off the event loop
+            key = await asyncio.to_thread(self.keys.unwrap, base64.b64decode(body["encrypted_key"]))
+        except ValueError:
+            self.counters["handshake_errors"] += 1
+            raise
+        if len(key) != 32:
+            self.counters["handshake_errors"] += 1
+            raise ValueError("Invalid request: session key must be 32 bytes")
+
+        session_id = secrets.token_urlsafe(24)
+        self.sessions[session_id] = Session(key, self.ttl)
+        while len(self.sessions) > self.max_entries:
+            self.sessions.popitem(last=False)
+            self.counters["evicted"] += 1
+        self.counters["handshakes"] += 1
+        return {"session_id": session_id, "expires_in": self.ttl, "algorithm": "AES-256-GCM",
+                "replay_window": SESSION_REPLAY_WINDOW}
+
+    def get(self, session_id: str) -> Optional[Session]:
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        if session.expires_at <= time.monotonic():
+            del self.sessions[session_id]
+            self.counters["expired"] += 1
+            return None
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active_sessions": len(self.sessions),
+            "ttl_seconds": self.ttl,
+            "required": ENCRYPTION_REQUIRED,
+            **self.counters,
+            "keys": self.keys.stats(),
+        }
+
+
+async def _reject(send, status_code: int, detail: str):
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class SessionEncryptionMiddleware:
+    """ASGI middleware that decrypts session-encrypted request bodies and encrypts responses.
+
+    Requests carrying X-Session-Id also carry X-Session-Seq, a per-session
+    sequence number, and send {"nonce", "ciphertext"} AES-GCM envelopes bound
+    to direction, method, path and that number (envelope_aad). A request body
+    is only accepted once per sequence number; bodyless requests must still
+    use a fresh number but do not consume it, since nothing authenticates it.
+    The handler sees plaintext and its response is sealed with the same
+    session key under the "resp" direction. Event streams are sent as one
+    "encrypted" event per chunk, each bound to its position (chunk_aad), whose
+    plaintexts concatenate to the original stream, followed by an "end" event
+    sealing an empty plaintext under the chunk count. A client that never sees
+    a valid "end" knows the stream was cut short. Requests without a session
+    pass through untouched unless ENCRYPTION_REQUIRED is set.
+    """
+
+    def __init__(self, app, store: Optional[SessionStore] = None, required: bool = ENCRYPTION_REQUIRED):
+        self.app = app
+        self.store = store or sessions
+        self.required = required
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        session_id = headers.get(SESSION_HEADER.encode())
+        path = scope["path"]
+        if session_id is None:
+            if self.required and path.startswith("/api/") and path not in EXEMPT_PATHS:
+                await _reject(send, 401, "Encrypted session required")
+                return
+            await self.app(scope, receive, send)
+            return
+
+        session = self.store.get(session_id.decode("latin-1"))
+        if session is None:
+            await _reject(send, 401, "Session expired or unknown")
+            return
+        try:
+            sequence = int(headers.get(SEQUENCE_HEADER.encode(), b""))
+        except ValueError:
+            await _reject(send, 400, "X-Session-Seq required")
+            return
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        request_aad = envelope_aad("req", scope["method"], path, sequence)
+        aad = envelope_aad("resp", scope["method"], path, sequence)
+        try:
+            plaintext = session.decrypt(body, request_aad) if body else b""
+        except (ValueError, KeyError, TypeError, InvalidTag):
+            self.store.counters["decrypt_errors"] += 1
+            await _reject(send, 400, "Invalid encrypted payload")
+            return
+        if not (session.accept(sequence) if body else session.fresh(sequence)):
+            self.store.counters["replays"] += 1
+            await _reject(send, 409, "Replayed or expired X-Session-Seq")
+            return
+        session.requests += 1
+        self.store.counters["requests"] += 1
+
+        # Ciphertext does not compress, so ask for identity responses and encrypt those
+        request_headers = [(name, value) for name, value in scope["headers"]
+                           if name not in (b"content-length", b"accept-encoding")]
+        request_headers.append((b"content-length", str(len(plaintext)).encode()))
+        scope = {**scope, "headers": request_headers}
+
+        delivered = False
+
+        async def receive_plaintext():
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": plaintext, "more_body": False}
+            return await receive()
+
+        start: Dict[str, Any] = {}
+        chunks: List[bytes] = []
+        sealed = 0
+
+        async def send_encrypted(message):
+            nonlocal sealed
+            if message["type"] == "http.response.start":
+                start.update(message)
+                if dict(message.get("headers", [])).get(b"content-type", b"").startswith(b"text/event-stream"):
+                    # Event streams are sealed chunk by chunk so nothing is held back
+                    start["streaming"] = True
+                    await send({**message, "headers": [(name, value) for name, value in message.get("headers", [])
+                                                       if name.lower() != b"content-length"]})
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            if start.get("streaming"):
+                body = message.get("body", b"")
+                if body:
+                    body = b"event: encrypted\ndata: " + session.encrypt(body, chunk_aad(aad, sealed)) + b"\n\n"
+                    sealed += 1
+                if not message.get("more_body", False):
+                    body += b"event: end\ndata: " + session.encrypt(b"", chunk_aad(aad, sealed, final=True)) + b"\n\n"
+                await send({**message, "body": body})
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            response_body = b"".join(chunks)
+            response_headers = [(name, value) for name, value in start.get("headers", [])
+                                if name.lower() not in (b"content-length", b"content-type")]
+            if response_body:
+                response_body = session.encrypt(response_body, aad)
+                response_headers.append((b"content-type", b"application/json"))
+            response_headers.append((b"content-length", str(len(response_body)).encode()))
+            await send({**start, "headers": response_headers})
+            await send({"type": "http.response.body", "body": response_body})
+
+        await self.app(scope, receive_plaintext, send_encrypted)
+
+
+# Global key material and session cache, started and stopped by the app lifespan
+key_store = KeyStore()
+sessions = SessionStore(key_store)
@@ -0,0 +1,366 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config.settings import (
+    ALPHA_VANTAGE, ALPHA_VANTAGE_API_KEY, FX_CACHE_TTL_SECONDS, FX_RATE_BURST, FX_RATE_PER_SECOND,
+    FX_REDIS_HOST, FX_REDIS_MAX_CONNECTIONS, FX_REDIS_PASSWORD, FX_REDIS_PORT, FX_REDIS_USERNAME,
+    FX_REFRESH_MARGIN_SECONDS, FX_STORE_PATH
+)
+from services.upstream import UpstreamClient
+from utils.logger import log_metadata
+
+CACHE_KEY = "alpha_vantage_currencies_data"
+REFRESH_LOCK_KEY = "alpha_vantage_currencies_refresh_lock"
+TIME_SERIES_KEY = "Time Series FX (Daily)"
+
+# Rare currencies to fetch
+RARE_CURRENCIES = {
+    'USDTRY': ('USD', 'TRY'),  # US Dollar to Turkish Lira
+    'USDZAR': ('USD', 'ZAR'),  # US Dollar to South African Rand
+    'USDRUB': ('USD', 'RUB'),  # US Dollar to Russian Ruble
+    'USDHUF': ('USD', 'HUF'),  # US Dollar to Hungarian Forint
+    'USDTHB': ('USD', 'THB'),  # US Dollar to Thai Baht
+}
+
+Bar = Tuple[str, float, float, float, float]
+
+
+class TokenBucket:
+    """Async token bucket; callers wait for a token instead of sleeping a fixed gap."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class FxBarStore:
+    """Persistent SQLite store of daily FX bars, one row per pair and date."""
+
+    def __init__(self, path: str = FX_STORE_PATH):
+        self.path = path
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection inside one transaction (committed, or rolled back on error), closed on exit."""
+        with closing(sqlite3.connect(self.path)) as conn, conn:
+            yield conn
+
+    def init(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fx_bars ("
+                "pair TEXT NOT NULL, date TEXT NOT NULL, open REAL, high REAL, low REAL, close REAL, "
+                "PRIMARY KEY (pair, date))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS fx_meta (pair TEXT PRIMARY KEY, metadata TEXT)")
+
+    def upsert(self, pair: str, bars: List[Bar], metadata: Dict[str, Any]):
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO fx_bars VALUES (?, ?, ?, ?, ?, ?)",
+                             [(pair, *bar) for bar in bars])
+            conn.execute("INSERT OR REPLACE INTO fx_meta VALUES (?, ?)", (pair, json.dumps(metadata)))
+
+    def latest(self, pair: str, days: int) -> Tuple[List[Bar], Dict[str, Any]]:
+        """Most recent bars for a pair, newest first, plus the provider metadata."""
+        with self._connect() as conn:
+            bars = conn.execute(
+                "SELECT date, open, high, low, close FROM fx_bars WHERE pair = ? ORDER BY date DESC LIMIT ?",
+                (pair, days),
+            ).fetchall()
+            meta = conn.execute("SELECT metadata FROM fx_meta WHERE pair = ?", (pair,)).fetchone()
+        return bars, json.loads(meta[0]) if meta else {}
+
+
+def _parse_series(time_series: Dict[str, Dict[str, str]]) -> List[Bar]:
+    return [
+        (day, float(values.get('1. open', 0)), float(values.get('2. high', 0)),
+         float(values.get('3. low', 0)), float(values.get('4. close', 0)))
+        for day, values in time_series.items()
+    ]
+
+
+def _currency_entry(name: str, bars: List[Bar], metadata: Dict[str, Any], days: int,
+                    error: Optional[str] = None) -> Dict[str, Any]:
+    from_curr, to_curr = RARE_CURRENCIES[name]
+    performance_key = f"performance_{days}d"
+    if not bars:
+        return {
+            'pair': f"{from_curr}/{to_curr}",
+            'error': error or "No time series data found",
+            'time_series': {},
+            'latest_rate': 0,
+            performance_key: {"error": "Data unavailable"}
+        }
+
+    time_series = {day: {'open': o, 'high': h, 'low': l, 'close': c} for day, o, h, l, c in bars}
+    end_price = bars[0][4]
+    if len(bars) >= 2:
+        start_price = bars[-1][4]
+        price_change = end_price - start_price
+        performance = {
+            'price_change': round(price_change, 4),
+            'percent_change': round((price_change / start_price) * 100, 2),
+            'start_price': round(start_price, 4),
+            'end_price': round(end_price, 4)
+        }
+    else:
+        performance = {"error": "Insufficient data"}
+
+    entry = {
+        'pair': f"{from_curr}/{to_curr}",
+        'metadata': metadata,
+        'time_series': time_series,
+        'latest_rate': end_price,
+        performance_key: performance
+    }
+    if error:
+        entry['error'] = error
+    return entry
+
+
+class FxService:
+    """Gateway-owned FX feed.
+
+    A background task refreshes the Redis snapshot before it expires, fetching
+    all pairs concurrently under a token bucket, and appends every daily bar
+    to a local store so arbitrary windows can be served without refetching.
+    """
+
+    def __init__(self):
+        self.client = UpstreamClient("alpha_vantage", ALPHA_VANTAGE)
+        self.bucket = TokenBucket(FX_RATE_PER_SECOND, FX_RATE_BURST or len(RARE_CURRENCIES))
+        self.store = FxBarStore()
+        self.redis = None
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.snapshot_at = 0.0
+        self.refresh_lock = asyncio.Lock()
+        self.catch_up_lock = asyncio.Lock()
+        self.refresher: Optional[asyncio.Task] = None
+        self.errors: Dict[str, str] = {}
+        self.counters = {"hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0, "provider_calls": 0}
+
+    async def start(self):
+        import redis.asyncio as aioredis
+
+        await self.client.start()
+        await asyncio.to_thread(self.store.init)
+        if not ALPHA_VANTAGE_API_KEY:
+            log_metadata({"service": "api_gateway", "function": "fx_start",
+                          "error": "ALPHA_VANTAGE_API_KEY is not set", "status": "warning"})
+        if FX_REDIS_HOST:
+            self.redis = aioredis.Redis(
+                host=FX_REDIS_HOST,
+                port=FX_REDIS_PORT,
+                username=FX_REDIS_USERNAME,
+                password=FX_REDIS_PASSWORD,
+                decode_responses=True,
+                max_connections=FX_REDIS_MAX_CONNECTIONS,
+            )
+        self.refresher = asyncio.create_task(self._refresh_loop())
+
+    async def close(self):
+        if self.refresher is not None:
+            self.refresher.cancel()
+            try:
+                await self.refresher
+            except asyncio.CancelledError:
+                pass
+        if self.redis is not None:
+            await self.redis.aclose()
+        await self.client.close()
+
+    async def _fetch_pair(self, name: str) -> Tuple[str, Optional[str]]:
+        from_curr, to_curr = RARE_CURRENCIES[name]
+        params = {
+            'function': 'FX_DAILY',
+            'from_symbol': from_curr,
+            'to_symbol': to_curr,
+            'apikey': ALPHA_VANTAGE_API_KEY,
+            'outputsize': 'compact'
+        }
+        try:
+            await self.bucket.acquire()
+            self.counters["provider_calls"] += 1
+            response = await self.client.get("/query", params=params)
+            response.raise_for_status()
+            data = response.json()
+            if TIME_SERIES_KEY not in data:
+                # Alpha Vantage reports throttling as a 200 with a Note/Information field
+                return name, data.get("Note") or data.get("Information") or "No time series data found"
+            metadata = {k: v for k, v in data.items() if k != TIME_SERIES_KEY}
+            await asyncio.to_thread(self.store.upsert, name, _parse_series(data[TIME_SERIES_KEY]), metadata)
+            return name, None
+        except Exception as e:
+            return name, str(e)
+
+    async def build_snapshot(self, days: int) -> Dict[str, Any]:
+        """Assemble the response for the last `days` trading days from the local store."""
+        currencies_data = {}
+        for name in RARE_CURRENCIES:
+            bars, metadata = await asyncio.to_thread(self.store.latest, name, days)
+            currencies_data[name] = _currency_entry(name, bars, metadata, days, self.errors.get(name))
+        return {
+            'metadata': {
+                'data_source': 'Alpha Vantage',
+                'timestamp': datetime.now().isoformat(),
+                'time_period': f'last_{days}_trading_days',
+                'currencies_count': len(currencies_data)
+            },
+            'currencies': currencies_data,
+        }
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Fetch every pair concurrently and republish the 7-day snapshot."""
+        async with self.refresh_lock:
+            results = await asyncio.gather(*(self._fetch_pair(name) for name in RARE_CURRENCIES))
+            self.errors = {name: error for name, error in results if error}
+            snapshot = await self.build_snapshot(7)
+            self.snapshot, self.snapshot_at = snapshot, time.time()
+            self.counters["refreshes"] += 1
+            if self.redis is not None:
+                try:
+                    await self.redis.setex(CACHE_KEY, FX_CACHE_TTL_SECONDS, json.dumps(snapshot))
+                except Exception as e:
+                    log_metadata({"service": "api_gateway", "function": "fx_refresh",
+                                  "error": str(e), "status": "error"})
+            log_metadata({
+                "service": "api_gateway",
+                "function": "fx_refresh",
+                "failed_pairs": list(self.errors),
+                "status": "success" if not self.errors else "partial"
+            })
+            return snapshot
+
+    async def _seconds_until_refresh(self) -> float:
+        """Time left before the shared snapshot enters its refresh margin."""
+        ttl = -2
+        if self.redis is not None:
+            try:
+                ttl = await self.redis.ttl(CACHE_KEY)
+            except Exception:
+                ttl = -2
+        if ttl < 0 and self.snapshot is not None:
+            ttl = FX_CACHE_TTL_SECONDS - (time.time() - self.snapshot_at)
+        return ttl - FX_REFRESH_MARGIN_SECONDS
+
+    async def _acquire_refresh_lock(self) -> bool:
+        """Claim the provider refresh for this cycle so only one gateway replica calls Alpha Vantage."""
+        if self.redis is None:
+            return True
+        try:
+            return bool(await self.redis.set(REFRESH_LOCK_KEY, "1", nx=True, ex=FX_REFRESH_MARGIN_SECONDS))
+        except Exception:
+            return True
+
+    async def _seed_from_shared(self) -> bool:
+        """Load the bars of the shared Redis snapshot into the local store, without calling the provider."""
+        if self.redis is None:
+            return False
+        try:
+            cached = await self.redis.get(CACHE_KEY)
+            ttl = await self.redis.ttl(CACHE_KEY) if cached else -2
+        except Exception:
+            return False
+        if not cached or ttl < 0:
+            return False
+        snapshot = json.loads(cached)
+        for name, entry in snapshot.get('currencies', {}).items():
+            bars = [(day, values['open'], values['high'], values['low'], values['close'])
+                    for day, values in entry.get('time_series', {}).items()]
+            if name in RARE_CURRENCIES and bars:
+                await asyncio.to_thread(self.store.upsert, name, bars, entry.get('metadata', {}))
+        self.snapshot = snapshot
+        self.snapshot_at = time.time() - (FX_CACHE_TTL_SECONDS - ttl)
+        return True
+
+    async def _catch_up(self):
+        """Bring a cold or stale replica up to date from the shared snapshot, or through the locked refresh."""
+        async with self.catch_up_lock:
+            if self.snapshot is not None and time.time() - self.snapshot_at <= FX_CACHE_TTL_SECONDS:
+                return
+            if await self._seed_from_shared():
+                return
+            if await self._acquire_refresh_lock():
+                await self.refresh()
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                wait = await self._seconds_until_refresh()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                # Only one gateway replica refreshes per cycle
+                if await self._acquire_refresh_lock():
+                    await self.refresh()
+                else:
+                    await asyncio.sleep(min(FX_REFRESH_MARGIN_SECONDS, 30))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters["refresh_errors"] += 1
+                log_metadata({"service": "api_gateway", "function": "fx_refresh_loop",
+                              "error": str(e), "status": "error"})
+                await asyncio.sleep(30)
+
+    async def get_snapshot(self, days: int = 7) -> Dict[str, Any]:
+        """Serve the FX snapshot, only fetching from the provider if no replica has loaded it yet."""
+        if days != 7:
+            # Another replica may hold the refresh lock; keep this replica's store from going stale
+            if time.time() - self.snapshot_at > FX_CACHE_TTL_SECONDS:
+                await self._catch_up()
+            self.counters["hits"] += 1
+            return {**await self.build_snapshot(days), 'cache_status': 'store'}
+
+        if self.redis is not None:
+            try:
+                cached = await self.redis.get(CACHE_KEY)
+                if cached:
+                    self.counters["hits"] += 1
+                    return {**json.loads(cached), 'cache_status': 'hit'}
+            except Exception:
+                pass
+        if self.snapshot is not None:
+            self.counters["hits"] += 1
+            return {**self.snapshot, 'cache_status': 'hit'}
+
+        self.counters["misses"] += 1
+        await self._catch_up()
+        # Without the lock another replica is mid-refresh; answer from whatever the store holds
+        snapshot = self.snapshot if self.snapshot is not None else await self.build_snapshot(7)
+        return {**snapshot, 'cache_status': 'miss'}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "snapshot_age_seconds": round(time.time() - self.snapshot_at, 1) if self.snapshot else None,
+            "failed_pairs": list(self.errors),
+            "provider": self.client.stats(),
+        }
+
+
+# Global FX service, started and stopped by the app lifespan
+fx_service = FxService()
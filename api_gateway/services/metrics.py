@@ -0,0 +1,129 @@
+import time
+from typing import Any, Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from starlette.routing import Match
+
+# Labels are limited to route templates, upstream names and status classes so series stay bounded
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+REQUESTS = Counter(
+    "gateway_requests_total", "Requests handled by the gateway",
+    ["route", "method", "status_class"],
+)
+REQUEST_DURATION = Histogram(
+    "gateway_request_duration_seconds", "Time from request received to last response byte sent",
+    ["route", "method", "status_class"], buckets=DURATION_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "gateway_requests_in_flight", "Requests currently being handled", ["route"],
+)
+RESPONSE_SIZE = Histogram(
+    "gateway_response_size_bytes", "Response body size sent to clients", ["route"], buckets=SIZE_BUCKETS,
+)
+UPSTREAM_REQUESTS = Counter(
+    "gateway_upstream_requests_total", "Requests sent to upstream servers", ["upstream", "status_class"],
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "gateway_upstream_in_flight", "Upstream requests currently awaiting a response or streaming", ["upstream"],
+)
+UPSTREAM_PHASE_DURATION = Histogram(
+    "gateway_upstream_phase_seconds",
+    "Upstream request time by phase: connect (new connections only), wait (request sent to headers "
+    "received) and transfer (response body)",
+    ["upstream", "phase"], buckets=DURATION_BUCKETS,
+)
+SHADOW_DURATION = Histogram(
+    "gateway_shadow_seconds", "Paired latency of mirrored requests on the primary and shadow upstream",
+    ["upstream", "side"], buckets=DURATION_BUCKETS,
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def status_class(status_code: Optional[int]) -> str:
+    return f"{status_code // 100}xx" if status_code else "error"
+
+
+def render_metrics() -> bytes:
+    return generate_latest()
+
+
+class UpstreamTimer:
+    """httpcore trace hook that splits one upstream request into connect, wait and transfer phases."""
+
+    def __init__(self, upstream: str):
+        self.upstream = upstream
+        self.started: Dict[str, float] = {}
+
+    def _observe(self, phase: str, start_event: str):
+        started = self.started.pop(start_event, None)
+        if started is not None:
+            UPSTREAM_PHASE_DURATION.labels(self.upstream, phase).observe(time.perf_counter() - started)
+
+    async def __call__(self, event_name: str, info: Dict[str, Any]):
+        now = time.perf_counter()
+        if event_name == "connection.connect_tcp.started":
+            self.started["connect"] = now
+        elif event_name.endswith(".send_request_headers.started"):
+            # Connection setup (TCP plus any TLS) ends once the request starts going out
+            self._observe("connect", "connect")
+            self.started["wait"] = now
+        elif event_name.endswith(".receive_response_headers.complete"):
+            self._observe("wait", "wait")
+        elif event_name.endswith(".receive_response_body.started"):
+            self.started["transfer"] = now
+        elif event_name.endswith(".receive_response_body.complete"):
+            self._observe("transfer", "transfer")
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording RED metrics per route template.
+
+    Duration runs until the last body chunk is sent, so streamed responses
+    are measured end to end.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _route_template(self, scope) -> str:
+        router = getattr(scope.get("app"), "router", None)
+        for route in getattr(router, "routes", ()):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", UNMATCHED_ROUTE)
+        return UNMATCHED_ROUTE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = self._route_template(scope)
+        method = scope["method"]
+        status_code: Optional[int] = None
+        size = 0
+        started = time.perf_counter()
+
+        async def send_observed(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.labels(route).inc()
+        try:
+            await self.app(scope, receive, send_observed)
+        except Exception:
+            status_code = status_code or 500
+            raise
+        finally:
+            REQUESTS_IN_FLIGHT.labels(route).dec()
+            outcome = status_class(status_code)
+            REQUESTS.labels(route, method, outcome).inc()
+            REQUEST_DURATION.labels(route, method, outcome).observe(time.perf_counter() - started)
+            RESPONSE_SIZE.labels(route).observe(size)
+
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from config.settings import PREFETCH_ENABLED, PREFETCH_MAX_ENTRIES, PREFETCH_MAX_LOAD, PREFETCH_TTL_SECONDS
+from services.bulkhead import bulkheads
+from services.response_cache import CachedResponse
+from services.upstream import upstreams
+
+
+class Prefetcher:
+    """Short-lived store of speculatively fetched follow-up responses.
+
+    Each prefetched response answers at most one request and is dropped
+    unused once its TTL passes; a request arriving while its prefetch is
+    still in flight waits for it instead of calling upstream again. New
+    prefetches are skipped while the gateway is busy or the target
+    upstream's breaker is not closed, so speculation never competes with
+    real traffic for capacity.
+    """
+
+    def __init__(self, enabled: bool = PREFETCH_ENABLED, ttl: float = PREFETCH_TTL_SECONDS,
+                 max_entries: int = PREFETCH_MAX_ENTRIES, max_load: float = PREFETCH_MAX_LOAD):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_load = max_load
+        self.entries: "OrderedDict[str, Tuple[float, CachedResponse]]" = OrderedDict()
+        self.pending: Dict[str, asyncio.Task] = {}
+        self.sweeper: Optional[asyncio.Task] = None
+        self.counters = {"issued": 0, "hits": 0, "wasted": 0, "errors": 0, "skipped_load": 0}
+
+    async def start(self):
+        if self.enabled:
+            self.sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        tasks = [task for task in (self.sweeper, *self.pending.values()) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.pending = {}
+        self.entries.clear()
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.ttl)
+            now = time.monotonic()
+            for key in [key for key, (expires_at, _) in self.entries.items() if expires_at <= now]:
+                del self.entries[key]
+                self.counters["wasted"] += 1
+
+    def overloaded(self, upstream: str) -> bool:
+        if bulkheads.in_flight >= self.max_load * bulkheads.total_concurrency:
+            return True
+        if any(route_class.waiters for route_class in bulkheads.classes.values()):
+            return True
+        return upstreams.get(upstream).breaker.state != "closed"
+
+    def schedule(self, key: str, upstream: str, fetch: Callable[[], Awaitable[CachedResponse]]):
+        """Start fetching a follow-up response in the background unless it is already on hand."""
+        if not self.enabled or key in self.pending or key in self.entries:
+            return
+        if self.overloaded(upstream) or len(self.pending) + len(self.entries) >= self.max_entries:
+            self.counters["skipped_load"] += 1
+            return
+        self.counters["issued"] += 1
+        self.pending[key] = asyncio.create_task(self._run(key, fetch))
+
+    async def _run(self, key: str, fetch: Callable[[], Awaitable[CachedResponse]]):
+        try:
+            response = await fetch()
+            response.stored_at = time.time()
+            self.entries[key] = (time.monotonic() + self.ttl, response)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.counters["errors"] += 1
+        finally:
+            self.pending.pop(key, None)
+
+    async def take(self, key: str) -> Optional[CachedResponse]:
+        """Claim the prefetched response for a request, waiting if its prefetch is in flight."""
+        task = self.pending.get(key)
+        if task is not None:
+            await asyncio.shield(task)
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at <= time.monotonic():
+            self.counters["wasted"] += 1
+            return None
+        self.counters["hits"] += 1
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        issued = self.counters["issued"]
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl,
+            "stored": len(self.entries),
+            "in_flight": len(self.pending),
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / issued, 4) if issued else 0.0,
+        }
+
+
+# Global prefetch store, started and stopped by the app lifespan
+prefetcher = Prefetcher()
@@ -0,0 +1,290 @@
+import hashlib
+import json
+import math
+import re
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from config.routes import ROUTES, ProxyRoute
+from services.compression import response_encoder
+from services.prefetch import prefetcher
+from services.rate_limit import RateLimitExceeded, rate_limiter
+from services.resilience import UpstreamUnavailableError, hedger
+from services.response_cache import CachedResponse, response_cache
+from services.shadow import shadow_mirror
+from services.singleflight import singleflight
+from services.upstream import DEFAULT_ROUTE_CLASS, upstreams
+from utils.logger import log_metadata
+
+# Upstream response headers relayed to the client as-is
+FORWARDED_RESPONSE_HEADERS = ("content-type", "content-encoding", "content-length")
+
+# Keep browsers and intermediaries (nginx) from caching or holding back event streams
+SSE_RESPONSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _path_pattern(path: str) -> "re.Pattern":
+    return re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", path) + "$")
+
+
+ROUTE_PATTERNS: List[Tuple[ProxyRoute, "re.Pattern"]] = [(route, _path_pattern(route.path)) for route in ROUTES]
+ROUTES_BY_NAME: Dict[str, ProxyRoute] = {route.name: route for route in ROUTES}
+
+
+def match_route(method: str, path: str) -> Tuple[ProxyRoute, Dict[str, str]]:
+    """Resolve a gateway method and path to its declared route and path params."""
+    for route, pattern in ROUTE_PATTERNS:
+        match = pattern.match(path)
+        if match and route.method == method.upper():
+            return route, match.groupdict()
+    raise LookupError(f"No gateway route for {method.upper()} {path}")
+
+
+def error_status(exc: Exception) -> Tuple[int, str, Dict[str, str]]:
+    """Map a proxy failure to the status code, detail and headers returned to the client."""
+    if isinstance(exc, ValueError):
+        return 400, str(exc), {}
+    if isinstance(exc, RateLimitExceeded):
+        return 429, str(exc), exc.headers
+    if isinstance(exc, UpstreamUnavailableError):
+        return 503, str(exc), {"Retry-After": str(math.ceil(exc.retry_after))}
+    return 500, f"Server error: {str(exc)}", {}
+
+
+def _required_message(fields: Tuple[str, ...]) -> str:
+    if len(fields) == 1:
+        names = fields[0]
+    elif len(fields) == 2:
+        names = f"{fields[0]} and {fields[1]}"
+    else:
+        names = ", ".join(fields[:-1]) + f", and {fields[-1]}"
+    return f"Invalid request: {names} required"
+
+
+def parse_body(route: ProxyRoute, raw: bytes) -> Tuple[bytes, Dict[str, Any]]:
+    """Validate a client body and return the bytes to send upstream plus the validated payload.
+
+    Routes with required fields forward only those fields, so a client cannot
+    pass extra keys upstream or shadow a renamed field (e.g. send its own
+    userId next to user_id). The original bytes are forwarded untouched when
+    they already hold exactly the forwarded fields and nothing is renamed.
+    Buffered routes are always parsed so the payload can key the cache.
+    """
+    if not (route.required or route.transforms_body or route.buffered):
+        return raw, {}
+    payload = json.loads(raw) if raw else {}
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid request: JSON object required")
+    if not all(payload.get(name) for name in route.required):
+        raise ValueError(_required_message(route.required))
+    received = len(payload)
+    if route.required:
+        payload = {name: payload[name] for name in route.required}
+    if route.transforms_body:
+        # Renamed values are applied last so they win over any client key with the same name
+        forwarded = {key: value for key, value in payload.items() if key not in route.field_map}
+        forwarded.update({route.field_map[key]: value for key, value in payload.items() if key in route.field_map})
+        return json.dumps(forwarded).encode("utf-8"), payload
+    if len(payload) != received:
+        return json.dumps(payload).encode("utf-8"), payload
+    return raw, payload
+
+
+def log_context(route: ProxyRoute, path_params: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields from the request worth attaching to the route's log lines."""
+    values = {**payload, **path_params}
+    context = {name: values[name] for name in route.log_fields if name in values}
+    for name in route.log_lengths:
+        if isinstance(values.get(name), str):
+            context[f"{name}_length"] = len(values[name])
+    return context
+
+
+def affinity_key(route: ProxyRoute, path_params: Dict[str, str], payload: Dict[str, Any]) -> Optional[str]:
+    """The value a route's replica affinity hashes on, normalized so ABC and abc land together."""
+    if not route.affinity:
+        return None
+    value = path_params.get(route.affinity, payload.get(route.affinity))
+    return str(value).strip().upper() if value else None
+
+
+async def open_upstream(route: ProxyRoute, path_params: Dict[str, str], content: Any = None,
+                        affinity: Optional[str] = None, tried: Optional[Set[str]] = None) -> httpx.Response:
+    """Send the request upstream and return the response with its body still unread.
+
+    tried collects the replicas earlier attempts went to (see UpstreamClient.send).
+    Error responses are read and raised as httpx.HTTPStatusError.
+    """
+    client = upstreams.get(route.upstream)
+    headers = {"Content-Type": "application/json"} if content is not None else None
+    upstream_request = client.build_request(
+        route.method,
+        route.upstream_path.format(**path_params),
+        content=content,
+        headers=headers,
+    )
+    response = await client.send(upstream_request, stream=True, route_class=route.route_class,
+                                 affinity=affinity, tried=tried)
+    if response.is_error:
+        try:
+            await response.aread()
+        finally:
+            await response.aclose()
+        response.raise_for_status()
+    return response
+
+
+def relay_headers(response: httpx.Response) -> Dict[str, str]:
+    return {name: response.headers[name] for name in FORWARDED_RESPONSE_HEADERS if name in response.headers}
+
+
+def request_key(route: ProxyRoute, path_params: Dict[str, str], payload: Dict[str, Any]) -> str:
+    """Stable key for a request: route name plus a digest of its path params and normalized body."""
+    canonical = json.dumps({"path": path_params, "body": payload}, sort_keys=True, separators=(",", ":"))
+    return f"{route.name}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+
+async def fetch_buffered(route: ProxyRoute, path_params: Dict[str, str], content: Optional[bytes] = None,
+                         affinity: Optional[str] = None, tried: Optional[Set[str]] = None) -> CachedResponse:
+    """Send the request upstream and buffer the raw (still encoded) response body."""
+    upstream_path = route.upstream_path.format(**path_params)
+    try:
+        response = await open_upstream(route, path_params, content, affinity, tried)
+    except httpx.HTTPStatusError as e:
+        shadow_mirror.mirror(route, upstream_path, content, e.response.status_code, e.response.elapsed.total_seconds())
+        raise
+    try:
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+    finally:
+        await response.aclose()
+    headers = relay_headers(response)
+    headers.pop("content-length", None)
+    # Bodies are only compared in identity encoding; elapsed starts once the call is admitted
+    # (after the bulkhead and limiter queues) and ends when the body is closed
+    shadow_mirror.mirror(route, upstream_path, content, response.status_code, response.elapsed.total_seconds(),
+                         None if "content-encoding" in headers else body)
+    return CachedResponse(response.status_code, headers, body)
+
+
+async def load_buffered(route: ProxyRoute, path_params: Dict[str, str], payload: Dict[str, Any],
+                        content: Optional[bytes]) -> Tuple[CachedResponse, Optional[str]]:
+    """Fetch a buffered response through the route's cache and single-flight layers.
+
+    Returns the response and its cache state, or None for uncached routes.
+    """
+    key = request_key(route, path_params, payload)
+    affinity = affinity_key(route, path_params, payload)
+    prefetched = await prefetcher.take(key)
+    if prefetched is not None:
+        return prefetched, "PREFETCH"
+
+    async def fetch() -> CachedResponse:
+        if route.hedge:
+            return await hedger.run(
+                route.name, lambda tried: fetch_buffered(route, path_params, content, affinity, tried))
+        return await fetch_buffered(route, path_params, content, affinity)
+
+    async def load() -> CachedResponse:
+        if route.coalesce:
+            return await singleflight.do(route.name, key, fetch)
+        return await fetch()
+
+    if route.cache_ttl:
+        return await response_cache.fetch(route, key, load)
+    return await load(), None
+
+
+def schedule_prefetch(route: ProxyRoute, payload: Dict[str, Any]):
+    """Start background fetches of the route's likely follow-up requests."""
+    for name in route.prefetch:
+        follow_up = ROUTES_BY_NAME[name]
+        if not all(payload.get(field) for field in follow_up.required):
+            continue
+        content, follow_payload = parse_body(
+            follow_up, json.dumps({field: payload[field] for field in follow_up.required}).encode("utf-8"))
+        # Speculative work runs in the background class and never counts against the user's rate limit
+        speculative = replace(follow_up, route_class=DEFAULT_ROUTE_CLASS)
+        prefetcher.schedule(
+            request_key(follow_up, {}, follow_payload), follow_up.upstream,
+            lambda speculative=speculative, content=content, affinity=affinity_key(follow_up, {}, follow_payload):
+                fetch_buffered(speculative, {}, content, affinity),
+        )
+
+
+async def execute_route(route: ProxyRoute, path_params: Dict[str, str],
+                        raw_body: bytes = b"") -> Tuple[CachedResponse, Optional[str]]:
+    """Run a route fully buffered, outside of a client request (batch, dashboard, prefetch)."""
+    payload: Dict[str, Any] = {}
+    content: Optional[bytes] = None
+    if route.method != "GET":
+        content, payload = parse_body(route, raw_body)
+    await rate_limiter.check(route, payload)
+    if route.buffered:
+        return await load_buffered(route, path_params, payload, content)
+    return await fetch_buffered(route, path_params, content, affinity_key(route, path_params, payload)), None
+
+
+async def proxy_request(route: ProxyRoute, request: Request):
+    """Forward one client request to the route's upstream and stream the response back."""
+    path_params = dict(request.path_params)
+    # The route template, not the URL: "endpoint" is a Loki label and tickers in the path would each get a stream
+    base_log = {"service": "api_gateway", "endpoint": route.path}
+    try:
+        payload: Dict[str, Any] = {}
+        content: Optional[Any] = None
+        if route.method != "GET":
+            if route.required or route.transforms_body or route.buffered:
+                content, payload = parse_body(route, await request.body())
+            else:
+                content = request.stream()
+        limit = await rate_limiter.check(route, payload)
+        limit_headers = limit.headers() if limit else {}
+
+        if route.buffered:
+            cached, cache_state = await load_buffered(route, path_params, payload, content)
+            log_metadata({**base_log, **log_context(route, path_params, payload),
+                          "cache": cache_state, "status": "success"})
+            schedule_prefetch(route, payload)
+            response = response_encoder.render(request, route, cached, cache_state)
+            response.headers.update(limit_headers)
+            return response
+
+        response = await open_upstream(route, path_params, content, affinity_key(route, path_params, payload))
+
+        async def close():
+            await response.aclose()
+            shadow_mirror.mirror(route, route.upstream_path.format(**path_params), content,
+                                 response.status_code, response.elapsed.total_seconds())
+
+        log_metadata({**base_log, **log_context(route, path_params, payload), "status": "success"})
+        schedule_prefetch(route, payload)
+        headers = {**relay_headers(response), **limit_headers}
+        if route.sse:
+            headers.update(SSE_RESPONSE_HEADERS)
+        return StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            headers=headers,
+            background=BackgroundTask(close),
+        )
+    except Exception as e:
+        status_code, detail, headers = error_status(e)
+        log_metadata({**base_log, "error": str(e), "status": "error"})
+        raise HTTPException(status_code=status_code, detail=detail, headers=headers or None)
+
+
+def _make_handler(route: ProxyRoute):
+    async def handler(request: Request):
+        return await proxy_request(route, request)
+    return handler
+
+
+def register_routes(app: FastAPI, routes=ROUTES):
+    """Mount a proxy handler on the app for every declared route."""
+    for route in routes:
+        app.add_api_route(route.path, _make_handler(route), methods=[route.method], name=route.name)
@@ -0,0 +1,167 @@
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from config.routes import ProxyRoute
+from config.settings import RATE_LIMIT_ENABLED, RATE_LIMIT_REDIS_URL
+from utils.logger import log_metadata
+
+# Summing a fractional interval (1/3s for 3 per second) drifts by ulps; comparisons allow this much slack
+# so the last slot of a burst is neither refused nor reported as used (GCRA_SCRIPT uses the same literal)
+SLACK = 1e-9
+
+# GCRA in one round trip; Redis TIME keeps every replica on the same clock.
+# Returns {allowed, retry_after, reset} with the floats as strings (Lua numbers truncate).
+GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then tat = now end
+local new_tat = tat + interval
+if now < new_tat - period - 1e-9 then
+  return {0, tostring(new_tat - period - now), tostring(tat - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, '0', tostring(new_tat - now)}
+"""
+
+
+@dataclass
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: float
+    retry_after: float = 0.0
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(math.ceil(self.retry_after), 1))
+        return headers
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a user has used up a route's rate limit."""
+
+    def __init__(self, route_name: str, decision: RateLimitDecision):
+        self.decision = decision
+        self.headers = decision.headers()
+        super().__init__(f"Rate limit exceeded for {route_name}, retry in {self.headers['Retry-After']}s")
+
+
+class RateLimiter:
+    """Per-user, per-route GCRA limiter.
+
+    Each key holds a single theoretical arrival time, so a check is O(1) no
+    matter how many users are tracked. A route allows `rate_limit` requests
+    per `rate_period` seconds, all of which may arrive as a burst. With
+    RATE_LIMIT_REDIS_URL set the state lives in Redis and holds across
+    replicas; if Redis is unreachable the in-process state is used instead.
+    """
+
+    def __init__(self, enabled: bool = RATE_LIMIT_ENABLED, redis_url: Optional[str] = RATE_LIMIT_REDIS_URL):
+        self.enabled = enabled
+        self.redis_url = redis_url
+        self.redis = None
+        self.script = None
+        self.tat: Dict[str, float] = {}
+        self.sweeper: Optional[asyncio.Task] = None
+        self.counters = {"allowed": 0, "limited": 0, "redis_errors": 0}
+
+    async def start(self):
+        self.sweeper = asyncio.create_task(self._sweep_loop())
+        if not self.redis_url:
+            return
+        try:
+            import redis.asyncio as aioredis
+            self.redis = aioredis.from_url(self.redis_url)
+            self.script = self.redis.register_script(GCRA_SCRIPT)
+        except Exception as e:
+            self.redis = None
+            log_metadata({
+                "service": "api_gateway",
+                "function": "rate_limiter_start",
+                "error": str(e),
+                "status": "error"
+            })
+
+    async def close(self):
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+            try:
+                await self.sweeper
+            except asyncio.CancelledError:
+                pass
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+
+    async def _sweep_loop(self):
+        # Keys whose arrival time has passed carry no state; dropping them bounds memory
+        while True:
+            await asyncio.sleep(60)
+            now = time.time()
+            for key in [key for key, tat in self.tat.items() if tat <= now]:
+                del self.tat[key]
+
+    def _check_local(self, key: str, interval: float, period: float):
+        now = time.time()
+        tat = max(self.tat.get(key, now), now)
+        new_tat = tat + interval
+        if now < new_tat - period - SLACK:
+            return False, new_tat - period - now, tat - now
+        self.tat[key] = new_tat
+        return True, 0.0, new_tat - now
+
+    async def _check_redis(self, key: str, interval: float, period: float):
+        allowed, retry_after, reset = await self.script(keys=[f"gateway:ratelimit:{key}"], args=[interval, period])
+        return bool(allowed), float(retry_after), float(reset)
+
+    async def check(self, route: ProxyRoute, payload: Dict[str, Any]) -> Optional[RateLimitDecision]:
+        """Count one request against the route's limit for its user.
+
+        Returns None for unlimited routes and requests without a user_id;
+        raises RateLimitExceeded when the limit is used up.
+        """
+        user_id = payload.get("user_id")
+        if not (self.enabled and route.rate_limit and user_id):
+            return None
+        key = f"{route.rate_group or route.name}:{user_id}"
+        interval = route.rate_period / route.rate_limit
+        if self.redis is not None:
+            try:
+                allowed, retry_after, reset = await self._check_redis(key, interval, route.rate_period)
+            except Exception:
+                self.counters["redis_errors"] += 1
+                allowed, retry_after, reset = self._check_local(key, interval, route.rate_period)
+        else:
+            allowed, retry_after, reset = self._check_local(key, interval, route.rate_period)
+
+        remaining = max(int((route.rate_period - reset) / interval + SLACK), 0)
+        decision = RateLimitDecision(allowed, route.rate_limit, remaining, reset, retry_after)
+        if not allowed:
+            self.counters["limited"] += 1
+            raise RateLimitExceeded(route.name, decision)
+        self.counters["allowed"] += 1
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "backend": "redis" if self.redis is not None else "memory",
+            "tracked_keys": len(self.tat),
+            **self.counters,
+        }
+
+
+# Global limiter, opened and closed by the app lifespan
+rate_limiter = RateLimiter()
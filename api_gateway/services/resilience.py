@@ -0,0 +1,214 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+from utils.logger import log_metadata
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised when the gateway refuses to call an upstream; maps to 503 with Retry-After."""
+
+    def __init__(self, upstream: str, retry_after: float, message: str):
+        self.upstream = upstream
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(upstream, retry_after, f"Upstream {upstream} unavailable (circuit open)")
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker with half-open probing.
+
+    The breaker opens when, over the last window_seconds and at least
+    min_requests calls, either the error rate or the share of calls slower
+    than slow_call_seconds reaches its threshold. After open_seconds it lets
+    half_open_probes calls through; all succeeding closes it, any failing
+    re-opens it.
+    """
+
+    def __init__(self, name: str, window_seconds: float = 30, min_requests: int = 20,
+                 error_rate: float = 0.5, slow_call_seconds: float = 10, slow_call_rate: float = 0.5,
+                 open_seconds: float = 15, half_open_probes: int = 3):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        self.outcomes: Deque[Tuple[float, bool, bool]] = deque()
+        self.rejected = 0
+        self.times_opened = 0
+
+    def _trim(self, now: float):
+        while self.outcomes and now - self.outcomes[0][0] > self.window_seconds:
+            self.outcomes.popleft()
+
+    def _transition(self, state: str):
+        self.state = state
+        if state == "open":
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+        if state in ("open", "closed"):
+            self.probes_in_flight = 0
+            self.probe_successes = 0
+            self.outcomes.clear()
+        log_metadata({
+            "service": "api_gateway",
+            "function": "circuit_breaker",
+            "upstream": self.name,
+            "state": state,
+            "status": "success"
+        })
+
+    def before_call(self):
+        """Admit a call or raise CircuitOpenError."""
+        if self.state == "open":
+            remaining = self.open_seconds - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, remaining)
+            self._transition("half_open")
+        if self.state == "half_open":
+            if self.probes_in_flight >= self.half_open_probes:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.open_seconds)
+            self.probes_in_flight += 1
+
+    def release(self):
+        """Forget an admitted call that was cancelled before it finished."""
+        if self.state == "half_open":
+            self.probes_in_flight = max(self.probes_in_flight - 1, 0)
+
+    def record(self, ok: bool, latency: float):
+        """Record the outcome of an admitted call."""
+        slow = latency >= self.slow_call_seconds
+        if self.state == "half_open":
+            self.probes_in_flight = max(self.probes_in_flight - 1, 0)
+            if not ok or slow:
+                self._transition("open")
+                return
+            self.probe_successes += 1
+            if self.probe_successes >= self.half_open_probes:
+                self._transition("closed")
+            return
+        if self.state == "open":
+            return
+
+        now = time.monotonic()
+        self.outcomes.append((now, ok, slow))
+        self._trim(now)
+        total = len(self.outcomes)
+        if total < self.min_requests:
+            return
+        errors = sum(1 for _, call_ok, _ in self.outcomes if not call_ok)
+        slow_calls = sum(1 for _, _, call_slow in self.outcomes if call_slow)
+        if errors / total >= self.error_rate or slow_calls / total >= self.slow_call_rate:
+            self._transition("open")
+
+    def stats(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        total = len(self.outcomes)
+        return {
+            "state": self.state,
+            "window_calls": total,
+            "window_error_rate": round(sum(1 for _, ok, _ in self.outcomes if not ok) / total, 4) if total else 0.0,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
+
+
+class LatencyTracker:
+    """Keeps the most recent latencies of a route to estimate its p95."""
+
+    def __init__(self, size: int = 200):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def observe(self, latency: float):
+        self.samples.append(latency)
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class Hedger:
+    """Sends a second attempt when the first is slower than the route's p95."""
+
+    def __init__(self, min_samples: int = 20, default_delay: float = 1.0, min_delay: float = 0.05):
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.latencies: Dict[str, LatencyTracker] = {}
+        self.counters: Dict[str, Dict[str, int]] = {}
+
+    def delay_for(self, route_name: str) -> float:
+        tracker = self.latencies.get(route_name)
+        if tracker is None or len(tracker.samples) < self.min_samples:
+            return self.default_delay
+        return max(tracker.percentile(0.95), self.min_delay)
+
+    async def run(self, route_name: str, fn: Callable[[Set[str]], Awaitable[Any]]) -> Any:
+        """Run fn, racing a second copy against it once the hedge delay passes.
+
+        Both attempts get the same set, which fn fills with the replica it
+        sent to, so the hedge goes to a different replica than the primary.
+        """
+        tracker = self.latencies.setdefault(route_name, LatencyTracker())
+        counters = self.counters.setdefault(route_name, {"calls": 0, "hedged": 0, "hedge_wins": 0})
+        counters["calls"] += 1
+        started = time.monotonic()
+
+        tried: Set[str] = set()
+        primary = asyncio.ensure_future(fn(tried))
+        hedge = None
+        pending = {primary}
+        error: Optional[BaseException] = None
+        # Everything awaits inside the try, so a cancelled caller never leaves an attempt running
+        # (and holding its bulkhead, limiter and connection slots)
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.delay_for(route_name))
+            if not done:
+                counters["hedged"] += 1
+                hedge = asyncio.ensure_future(fn(tried))
+                pending = {primary, hedge}
+            while True:
+                for task in done:
+                    if task.cancelled():
+                        error = error or asyncio.CancelledError()
+                        continue
+                    if task.exception() is None:
+                        if task is hedge:
+                            counters["hedge_wins"] += 1
+                        tracker.observe(time.monotonic() - started)
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {**counters, "hedge_delay_ms": round(self.delay_for(name) * 1000, 1)}
+            for name, counters in self.counters.items()
+        }
+
+
+# Global hedger shared by every hedged route
+hedger = Hedger()
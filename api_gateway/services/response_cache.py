@@ -0,0 +1,193 @@
+import asyncio
+import base64
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from config.routes import ProxyRoute
+from config.settings import (
+    RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_REDIS_URL
+)
+from utils.logger import log_metadata
+
+
+@dataclass
+class CachedResponse:
+    """A fully buffered upstream response."""
+    status_code: int
+    headers: Dict[str, str]
+    body: bytes
+    stored_at: float = 0.0
+    # Lazily computed ETag and compressed bodies, kept in process only
+    etag: Optional[str] = field(default=None, repr=False, compare=False)
+    variants: Dict[str, bytes] = field(default_factory=dict, repr=False, compare=False)
+
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "status_code": self.status_code,
+            "headers": self.headers,
+            "body": base64.b64encode(self.body).decode("ascii"),
+            "stored_at": self.stored_at,
+        })
+
+    @classmethod
+    def from_json(cls, raw: str) -> "CachedResponse":
+        data = json.loads(raw)
+        return cls(data["status_code"], data["headers"], base64.b64decode(data["body"]), data["stored_at"])
+
+
+Loader = Callable[[], Awaitable[CachedResponse]]
+
+
+class ResponseCache:
+    """LRU response cache with stale-while-revalidate and stale-if-error.
+
+    Entries live in a byte- and count-bounded in-process tier and, when
+    RESPONSE_CACHE_REDIS_URL is set, in a Redis tier shared by gateway replicas.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES, redis_url: Optional[str] = RESPONSE_CACHE_REDIS_URL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.redis_url = redis_url
+        self.redis = None
+        self.entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.size_bytes = 0
+        self.refreshing: Dict[str, asyncio.Task] = {}
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "stale_if_error": 0,
+            "revalidations": 0,
+            "revalidation_errors": 0,
+            "evictions": 0,
+            "redis_hits": 0,
+            "redis_errors": 0,
+        }
+
+    async def start(self):
+        if not self.redis_url:
+            return
+        try:
+            import redis.asyncio as aioredis
+            self.redis = aioredis.from_url(self.redis_url)
+        except Exception as e:
+            self.redis = None
+            log_metadata({
+                "service": "api_gateway",
+                "function": "response_cache_start",
+                "error": str(e),
+                "status": "error"
+            })
+
+    async def close(self):
+        for task in list(self.refreshing.values()):
+            task.cancel()
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+
+    def _store_local(self, key: str, entry: CachedResponse):
+        if len(entry.body) > self.max_bytes:
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size_bytes -= len(previous.body)
+        self.entries[key] = entry
+        self.size_bytes += len(entry.body)
+        while self.entries and (len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes):
+            _, evicted = self.entries.popitem(last=False)
+            self.size_bytes -= len(evicted.body)
+            self.counters["evictions"] += 1
+
+    async def _lookup(self, key: str) -> Optional[CachedResponse]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            return entry
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(f"gateway:cache:{key}")
+        except Exception:
+            self.counters["redis_errors"] += 1
+            return None
+        if raw is None:
+            return None
+        entry = CachedResponse.from_json(raw)
+        self.counters["redis_hits"] += 1
+        self._store_local(key, entry)
+        return entry
+
+    async def store(self, route: ProxyRoute, key: str, entry: CachedResponse):
+        entry.stored_at = time.time()
+        self._store_local(key, entry)
+        if self.redis is None:
+            return
+        lifetime = route.cache_ttl + max(route.stale_while_revalidate, route.stale_if_error)
+        try:
+            await self.redis.set(f"gateway:cache:{key}", entry.to_json(), ex=max(int(lifetime), 1))
+        except Exception:
+            self.counters["redis_errors"] += 1
+
+    async def _revalidate(self, route: ProxyRoute, key: str, loader: Loader):
+        try:
+            await self.store(route, key, await loader())
+            self.counters["revalidations"] += 1
+        except Exception as e:
+            self.counters["revalidation_errors"] += 1
+            log_metadata({
+                "service": "api_gateway",
+                "function": "response_cache_revalidate",
+                "route": route.name,
+                "error": str(e),
+                "status": "error"
+            })
+        finally:
+            self.refreshing.pop(key, None)
+
+    async def fetch(self, route: ProxyRoute, key: str, loader: Loader) -> Tuple[CachedResponse, str]:
+        """Return the response for key and its cache state: HIT, STALE or MISS."""
+        entry = await self._lookup(key)
+        if entry is not None:
+            age = entry.age()
+            if age < route.cache_ttl:
+                self.counters["hits"] += 1
+                return entry, "HIT"
+            if age < route.cache_ttl + route.stale_while_revalidate:
+                self.counters["stale"] += 1
+                if key not in self.refreshing:
+                    self.refreshing[key] = asyncio.create_task(self._revalidate(route, key, loader))
+                return entry, "STALE"
+
+        self.counters["misses"] += 1
+        try:
+            fresh = await loader()
+        except Exception:
+            if entry is not None and entry.age() < route.cache_ttl + route.stale_if_error:
+                self.counters["stale_if_error"] += 1
+                return entry, "STALE"
+            raise
+        await self.store(route, key, fresh)
+        return fresh, "MISS"
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"] + self.counters["stale"]
+        return {
+            **self.counters,
+            "entries": len(self.entries),
+            "size_bytes": self.size_bytes,
+            "hit_ratio": round((self.counters["hits"] + self.counters["stale"]) / lookups, 4) if lookups else 0.0,
+            "redis_enabled": self.redis is not None,
+        }
+
+
+# Global cache instance, opened and closed by the app lifespan
+response_cache = ResponseCache()
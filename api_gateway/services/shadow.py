@@ -0,0 +1,161 @@
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional, Set
+
+import httpx
+
+from config.routes import ProxyRoute
+from config.settings import SHADOW_MAX_IN_FLIGHT, SHADOW_MAX_DIFF_KEYS, UPSTREAMS
+from services.metrics import SHADOW_DURATION
+from services.resilience import LatencyTracker
+from utils.logger import log_metadata
+
+
+def diff_keys(primary: Any, shadow: Any) -> Set[str]:
+    """Top-level keys whose values differ between two JSON objects."""
+    if not (isinstance(primary, dict) and isinstance(shadow, dict)):
+        return {"<body>"}
+    return {key for key in primary.keys() | shadow.keys() if primary.get(key) != shadow.get(key)}
+
+
+class RouteComparison:
+    """Paired primary/shadow latencies and response agreement for one route."""
+
+    def __init__(self):
+        self.primary = LatencyTracker()
+        self.shadow = LatencyTracker()
+        self.delta = LatencyTracker()
+        self.counters = {"mirrored": 0, "shadow_errors": 0, "status_mismatch": 0, "body_match": 0, "body_mismatch": 0}
+        self.diff_keys: Dict[str, int] = defaultdict(int)
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(tracker: LatencyTracker, q: float) -> float:
+            return round(tracker.percentile(q) * 1000, 1)
+
+        return {
+            **self.counters,
+            "primary_p50_ms": ms(self.primary, 0.5),
+            "primary_p95_ms": ms(self.primary, 0.95),
+            "shadow_p50_ms": ms(self.shadow, 0.5),
+            "shadow_p95_ms": ms(self.shadow, 0.95),
+            # Per-request shadow minus primary, so a regression shows even when load varies
+            "delta_p50_ms": ms(self.delta, 0.5),
+            "delta_p95_ms": ms(self.delta, 0.95),
+            "diff_keys": dict(self.diff_keys),
+        }
+
+
+class ShadowMirror:
+    """Replays a sample of upstream requests against candidate builds and compares the results.
+
+    Mirroring starts after the primary response is in hand, runs in a
+    detached task over its own connection pool and is dropped when too many
+    are in flight, so it never adds latency or load to client requests and
+    its failures never reach them. Only routes with shadow set are mirrored.
+    Both sides are timed from the upstream call (after admission) to the end
+    of the body; buffered routes are compared on status and JSON body,
+    streamed routes on status only.
+    """
+
+    def __init__(self, config: Dict[str, Dict[str, Any]] = UPSTREAMS, max_in_flight: int = SHADOW_MAX_IN_FLIGHT):
+        self.targets = {name: cfg["shadow"] for name, cfg in config.items()
+                        if cfg["shadow"]["url"] and cfg["shadow"]["sample_percent"] > 0}
+        self.timeouts = {name: config[name]["timeout"] for name in self.targets}
+        self.max_in_flight = max_in_flight
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.tasks: Set[asyncio.Task] = set()
+        self.routes: Dict[str, RouteComparison] = defaultdict(RouteComparison)
+        self.counters = {"sampled": 0, "dropped": 0}
+
+    async def start(self):
+        for name, target in self.targets.items():
+            self.clients[name] = httpx.AsyncClient(
+                base_url=target["url"],
+                timeout=self.timeouts[name],
+                limits=httpx.Limits(max_connections=self.max_in_flight),
+            )
+        if self.targets:
+            log_metadata({
+                "service": "api_gateway",
+                "function": "shadow_start",
+                "targets": {name: target["url"] for name, target in self.targets.items()},
+                "status": "success"
+            })
+
+    async def close(self):
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        for client in self.clients.values():
+            await client.aclose()
+        self.clients = {}
+
+    def mirror(self, route: ProxyRoute, path: str, content: Any, status_code: int, latency: float,
+               body: Optional[bytes] = None):
+        """Maybe replay a finished primary request against the route's shadow upstream."""
+        client = self.clients.get(route.upstream)
+        if not route.shadow or client is None or not isinstance(content, (bytes, type(None))):
+            return
+        if random.random() * 100 >= self.targets[route.upstream]["sample_percent"]:
+            return
+        self.counters["sampled"] += 1
+        if len(self.tasks) >= self.max_in_flight:
+            self.counters["dropped"] += 1
+            return
+        task = asyncio.create_task(self._replay(client, route, path, content, status_code, latency, body))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _replay(self, client: httpx.AsyncClient, route: ProxyRoute, path: str, content: Optional[bytes],
+                      status_code: int, latency: float, body: Optional[bytes]):
+        comparison = self.routes[route.name]
+        comparison.counters["mirrored"] += 1
+        headers = {"Content-Type": "application/json"} if content is not None else None
+        started = time.perf_counter()
+        try:
+            async with client.stream(route.method, path, content=content, headers=headers) as response:
+                shadow_body = await response.aread()
+                shadow_latency = time.perf_counter() - started
+        except Exception as e:
+            comparison.counters["shadow_errors"] += 1
+            log_metadata({"service": "api_gateway", "function": "shadow_replay", "route": route.name,
+                          "error": str(e), "status": "error"})
+            return
+
+        comparison.primary.observe(latency)
+        comparison.shadow.observe(shadow_latency)
+        comparison.delta.observe(shadow_latency - latency)
+        SHADOW_DURATION.labels(route.upstream, "primary").observe(latency)
+        SHADOW_DURATION.labels(route.upstream, "shadow").observe(shadow_latency)
+        if response.status_code != status_code:
+            comparison.counters["status_mismatch"] += 1
+            return
+        if body is None:
+            return
+        try:
+            differing = diff_keys(json.loads(body), json.loads(shadow_body)) if body != shadow_body else set()
+        except ValueError:
+            differing = {"<body>"}
+        if not differing:
+            comparison.counters["body_match"] += 1
+            return
+        comparison.counters["body_mismatch"] += 1
+        for key in differing:
+            # Bounded so responses keyed by data (tickers, dates) cannot grow the stats without limit
+            if key in comparison.diff_keys or len(comparison.diff_keys) < SHADOW_MAX_DIFF_KEYS:
+                comparison.diff_keys[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "targets": dict(self.targets),
+            "in_flight": len(self.tasks),
+            **self.counters,
+            "routes": {name: comparison.stats() for name, comparison in self.routes.items()},
+        }
+
+
+# Global mirror, opened and closed by the app lifespan
+shadow_mirror = ShadowMirror()
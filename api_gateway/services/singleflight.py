@@ -0,0 +1,45 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Collapses identical concurrent calls into one shared upstream call.
+
+    The first caller for a key runs the call; callers arriving while it is in
+    flight await the same task. The task is shielded so a client that
+    disconnects does not cancel the call for everyone else.
+    """
+
+    def __init__(self):
+        self.calls: Dict[str, asyncio.Task] = {}
+        self.counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {"calls": 0, "collapsed": 0})
+
+    async def do(self, route_name: str, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        counters = self.counters[route_name]
+        task = self.calls.get(key)
+        if task is not None:
+            counters["collapsed"] += 1
+            return await asyncio.shield(task)
+
+        counters["calls"] += 1
+        task = asyncio.ensure_future(fn())
+        self.calls[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        self.calls.pop(key, None)
+        # Mark the exception retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self.calls),
+            "routes": {name: dict(counters) for name, counters in self.counters.items()},
+        }
+
+
+# Global instance shared by every coalescing route
+singleflight = SingleFlight()
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import re
+from typing import Any, Dict, List, Optional, Set
+
+from config.settings import TICKER_POLL_SECONDS, TICKER_STREAM_MAX_TICKERS
+from services.proxy import execute_route, match_route
+from utils.logger import log_metadata
+
+TICKER_PATTERN = re.compile(r"^[A-Z0-9.\-=^]{1,15}$")
+
+# Fields that change between polls without the price changing
+IGNORED_FIELDS = ("cache_hit",)
+
+
+def parse_tickers(tickers: Any) -> List[str]:
+    """Normalize and validate a list of ticker symbols."""
+    if isinstance(tickers, str):
+        tickers = tickers.split(",")
+    if not isinstance(tickers, list):
+        raise ValueError("Invalid request: tickers list required")
+    symbols = list(dict.fromkeys(str(t).strip().upper() for t in tickers if str(t).strip()))
+    if not symbols:
+        raise ValueError("Invalid request: tickers list required")
+    if len(symbols) > TICKER_STREAM_MAX_TICKERS:
+        raise ValueError(f"Invalid request: at most {TICKER_STREAM_MAX_TICKERS} tickers per subscription")
+    for symbol in symbols:
+        if not TICKER_PATTERN.match(symbol):
+            raise ValueError(f"Invalid request: bad ticker {symbol}")
+    return symbols
+
+
+def diff(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Keys of `new` whose values differ from `old`, recursing into nested objects."""
+    changes = {}
+    for key, value in new.items():
+        if key in IGNORED_FIELDS:
+            continue
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = diff(previous, value)
+            if nested:
+                changes[key] = nested
+        elif value != previous:
+            changes[key] = value
+    return changes
+
+
+def merge(base: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(base)
+    for key, value in delta.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class Subscriber:
+    """One client connection.
+
+    Updates not yet sent are merged per ticker rather than queued, so a slow
+    client gets the latest state in one message and its memory stays bounded.
+    """
+
+    def __init__(self):
+        self.tickers: Set[str] = set()
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.ready = asyncio.Event()
+
+    def push(self, ticker: str, kind: str, data: Dict[str, Any]):
+        previous = self.pending.get(ticker)
+        if previous is not None and previous["type"] == "snapshot":
+            self.pending[ticker] = {"type": "snapshot", "data": merge(previous["data"], data)}
+        elif previous is not None and kind == "delta":
+            self.pending[ticker] = {"type": "delta", "data": merge(previous["data"], data)}
+        else:
+            self.pending[ticker] = {"type": kind, "data": data}
+        self.ready.set()
+
+    async def next_messages(self) -> List[Dict[str, Any]]:
+        """Wait for updates and return them as {"ticker", "type", "data"} messages."""
+        await self.ready.wait()
+        self.ready.clear()
+        pending, self.pending = self.pending, {}
+        return [{"ticker": ticker, **update} for ticker, update in pending.items()]
+
+
+class TickerFeed:
+    """A single upstream poller for one ticker, shared by all of its subscribers."""
+
+    def __init__(self, hub: "TickerHub", ticker: str):
+        self.hub = hub
+        self.ticker = ticker
+        self.subscribers: Set[Subscriber] = set()
+        self.latest: Optional[Dict[str, Any]] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def _fetch(self) -> Optional[Dict[str, Any]]:
+        route, path_params = match_route("GET", f"/api/stock-latest/{self.ticker}")
+        response, _ = await execute_route(route, path_params)
+        self.hub.counters["upstream_polls"] += 1
+        if response.status_code != 200:
+            return None
+        return json.loads(response.body)
+
+    async def run(self):
+        while self.subscribers:
+            try:
+                data = await self._fetch()
+                if data is not None:
+                    if self.latest is None:
+                        self.latest = data
+                        for subscriber in self.subscribers:
+                            subscriber.push(self.ticker, "snapshot", data)
+                    else:
+                        changes = diff(self.latest, data)
+                        self.latest = data
+                        if changes:
+                            self.hub.counters["deltas"] += 1
+                            for subscriber in self.subscribers:
+                                subscriber.push(self.ticker, "delta", changes)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.hub.counters["poll_errors"] += 1
+                log_metadata({"service": "api_gateway", "function": "ticker_poll",
+                              "ticker": self.ticker, "error": str(e), "status": "error"})
+            await asyncio.sleep(self.hub.poll_seconds)
+
+
+class TickerHub:
+    """Fans one poller per distinct ticker out to every subscribed client.
+
+    Upstream load grows with the number of distinct tickers, not with the
+    number of connected clients: a feed starts with its first subscriber and
+    stops when its last one leaves.
+    """
+
+    def __init__(self, poll_seconds: float = TICKER_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.feeds: Dict[str, TickerFeed] = {}
+        self.subscribers: Set[Subscriber] = set()
+        self.counters = {"subscriptions": 0, "upstream_polls": 0, "poll_errors": 0, "deltas": 0}
+
+    def connect(self) -> Subscriber:
+        subscriber = Subscriber()
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def subscribe(self, subscriber: Subscriber, tickers: List[str]):
+        # All or nothing: a request that would pass the cap adds none of its tickers
+        new = [ticker for ticker in dict.fromkeys(tickers) if ticker not in subscriber.tickers]
+        if len(subscriber.tickers) + len(new) > TICKER_STREAM_MAX_TICKERS:
+            raise ValueError(f"Invalid request: at most {TICKER_STREAM_MAX_TICKERS} tickers per subscription")
+        for ticker in new:
+            feed = self.feeds.get(ticker)
+            if feed is None:
+                feed = self.feeds[ticker] = TickerFeed(self, ticker)
+            feed.subscribers.add(subscriber)
+            subscriber.tickers.add(ticker)
+            self.counters["subscriptions"] += 1
+            if feed.latest is not None:
+                subscriber.push(ticker, "snapshot", feed.latest)
+            if feed.task is None or feed.task.done():
+                feed.task = asyncio.create_task(feed.run())
+
+    def unsubscribe(self, subscriber: Subscriber, tickers: List[str]):
+        for ticker in tickers:
+            subscriber.tickers.discard(ticker)
+            subscriber.pending.pop(ticker, None)
+            feed = self.feeds.get(ticker)
+            if feed is None:
+                continue
+            feed.subscribers.discard(subscriber)
+            if not feed.subscribers:
+                if feed.task is not None:
+                    feed.task.cancel()
+                del self.feeds[ticker]
+
+    def disconnect(self, subscriber: Subscriber):
+        self.unsubscribe(subscriber, list(subscriber.tickers))
+        self.subscribers.discard(subscriber)
+
+    async def close(self):
+        tasks = [feed.task for feed in self.feeds.values() if feed.task is not None]
+        for subscriber in list(self.subscribers):
+            self.disconnect(subscriber)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self.subscribers),
+            "tickers": len(self.feeds),
+            "poll_seconds": self.poll_seconds,
+            **self.counters,
+        }
+
+
+# Global hub, closed by the app lifespan
+ticker_hub = TickerHub()
+
+
+async def _read_commands(websocket, subscriber: Subscriber):
+    from starlette.websockets import WebSocketDisconnect
+
+    try:
+        while True:
+            message = await websocket.receive_json()
+            try:
+                if not isinstance(message, dict):
+                    raise ValueError("Invalid request: JSON object required")
+                if "subscribe" in message:
+                    ticker_hub.subscribe(subscriber, parse_tickers(message["subscribe"]))
+                if "unsubscribe" in message:
+                    ticker_hub.unsubscribe(subscriber, parse_tickers(message["unsubscribe"]))
+            except ValueError as ve:
+                await websocket.send_json({"type": "error", "detail": str(ve)})
+    except (WebSocketDisconnect, json.JSONDecodeError):
+        return
+
+
+async def serve_websocket(websocket):
+    """Relay ticker updates over an accepted WebSocket.
+
+    Clients send {"subscribe": [...]} / {"unsubscribe": [...]} and receive
+    {"ticker", "type": "snapshot" | "delta", "data"} messages.
+    """
+    subscriber = ticker_hub.connect()
+    reader = asyncio.create_task(_read_commands(websocket, subscriber))
+    try:
+        while True:
+            updates = asyncio.create_task(subscriber.next_messages())
+            done, _ = await asyncio.wait({reader, updates}, return_when=asyncio.FIRST_COMPLETED)
+            if updates not in done:
+                updates.cancel()
+                break
+            for message in updates.result():
+                await websocket.send_json(message)
+    finally:
+        reader.cancel()
+        ticker_hub.disconnect(subscriber)
+
+
+async def sse_events(tickers: List[str], keepalive: float = 15):
+    """Server-sent ticker updates for a fixed set of tickers, with periodic keep-alive comments."""
+    subscriber = ticker_hub.connect()
+    try:
+        ticker_hub.subscribe(subscriber, tickers)
+        while True:
+            try:
+                messages = await asyncio.wait_for(subscriber.next_messages(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            for message in messages:
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+    finally:
+        ticker_hub.disconnect(subscriber)
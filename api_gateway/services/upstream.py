@@ -0,0 +1,456 @@
+import asyncio
+import bisect
+import hashlib
+import importlib.util
+import random
+import time
+from typing import Any, Callable, Collection, Dict, List, Optional, Set
+
+import httpx
+
+from config.settings import ROUTE_CLASSES, UPSTREAMS
+from services.bulkhead import bulkheads
+from services.concurrency import AdaptiveLimiter
+from services.metrics import UPSTREAM_IN_FLIGHT, UPSTREAM_REQUESTS, UpstreamTimer, status_class
+from services.resilience import CircuitBreaker, LatencyTracker
+from utils.logger import log_metadata
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Callers that are not serving a client route (FX refresh, health checks) run as background work
+DEFAULT_ROUTE_CLASS = "background"
+
+
+class Replica:
+    """One server behind an upstream, with its own load, health and latency figures."""
+
+    def __init__(self, base_url: str, ejection: Dict[str, Any]):
+        self.base_url = base_url
+        self.url = httpx.URL(base_url)
+        self.ejection = ejection
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.healthy = True
+        self.health_streak = 0
+        self.latency = LatencyTracker()
+
+    def available(self, now: float) -> bool:
+        return self.healthy and self.ejected_until <= now
+
+    def record(self, ok: bool, latency: float) -> bool:
+        """Count a finished call; returns True when it got the replica ejected."""
+        self.latency.observe(latency)
+        if ok:
+            self.consecutive_failures = 0
+            return False
+        self.errors += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures < self.ejection["consecutive_failures"]:
+            return False
+        # Each repeat ejection lasts longer, so a flapping replica spends less time in rotation
+        self.ejections += 1
+        self.consecutive_failures = 0
+        duration = min(self.ejection["base_seconds"] * self.ejections, self.ejection["max_seconds"])
+        self.ejected_until = time.monotonic() + duration
+        return True
+
+    def record_health(self, ok: bool, health: Dict[str, Any]) -> bool:
+        """Count an active check; returns True when it flipped the replica's health."""
+        if ok == self.healthy:
+            self.health_streak = 0
+            return False
+        self.health_streak += 1
+        if self.health_streak < health["healthy_threshold" if ok else "unhealthy_threshold"]:
+            return False
+        self.healthy = ok
+        self.health_streak = 0
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "ejected_for_seconds": round(max(self.ejected_until - time.monotonic(), 0), 1),
+            "ejections": self.ejections,
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "latency_p50_ms": round(self.latency.percentile(0.5) * 1000, 1),
+            "latency_p95_ms": round(self.latency.percentile(0.95) * 1000, 1),
+        }
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes for pinning keys (tickers) to replicas.
+
+    A key belongs to the first point clockwise from its hash. When that
+    replica is unavailable the walk continues to the next replica, so only
+    the keys it owned move and they return once it recovers.
+    """
+
+    def __init__(self, replicas: List[Replica], virtual_nodes: int):
+        points = sorted(
+            (_ring_hash(f"{replica.base_url}#{i}"), replica)
+            for replica in replicas for i in range(max(virtual_nodes, 1))
+        )
+        self.hashes = [point for point, _ in points]
+        self.replicas = [replica for _, replica in points]
+
+    def get(self, key: str, now: float, exclude: Collection[str] = ()) -> Optional[Replica]:
+        """The first available replica clockwise from the key, skipping base URLs in exclude."""
+        start = bisect.bisect(self.hashes, _ring_hash(key))
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if replica.available(now) and replica.base_url not in exclude:
+                return replica
+        return None
+
+    def shares(self) -> Dict[str, float]:
+        """Fraction of the hash space each replica owns while all are available."""
+        shares = {replica.base_url: 0.0 for replica in self.replicas}
+        previous = self.hashes[-1] - 2 ** 64
+        for point, replica in zip(self.hashes, self.replicas):
+            shares[replica.base_url] += (point - previous) / 2 ** 64
+            previous = point
+        return shares
+
+
+class HeldStream(httpx.AsyncByteStream):
+    """Response body that runs a callback once when closed, with the call's outcome.
+
+    Errors while reading the body turn the outcome into a failure; a reader
+    cancelled mid-body (client disconnect) reports no outcome at all.
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, ok: bool, on_close: Callable[[Optional[bool]], None]):
+        self.stream = stream
+        self.ok: Optional[bool] = ok
+        self.on_close: Optional[Callable[[Optional[bool]], None]] = on_close
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self.stream:
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            self.ok = None
+            raise
+        except Exception:
+            self.ok = False
+            raise
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            if self.on_close is not None:
+                on_close, self.on_close = self.on_close, None
+                on_close(self.ok)
+
+
+class UpstreamClient:
+    """Long-lived pooled httpx client for an upstream served by one or more replicas."""
+
+    def __init__(self, name: str, config: Dict[str, Any]):
+        self.name = name
+        self.config = config
+        self.replicas: List[Replica] = [Replica(url, config["ejection"]) for url in config["base_urls"]]
+        self.base_url = self.replicas[0].base_url
+        self.balancer = config["balancer"]
+        self.ring = HashRing(self.replicas, config["virtual_nodes"])
+        self.affinity_routed = 0
+        self.health = config["health"]
+        self.health_client: Optional[httpx.AsyncClient] = None
+        self.health_task: Optional[asyncio.Task] = None
+        # One pool per route class so a burst in one class cannot exhaust another's connections
+        self.pools: Dict[str, httpx.AsyncClient] = {}
+        self.http2 = config["http2"] and HTTP2_AVAILABLE
+        self.breaker = CircuitBreaker(name, **config["breaker"])
+        self.limiter = AdaptiveLimiter(name, **config["concurrency"]) if config["concurrency_enabled"] else None
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.connections_opened = 0
+
+    async def start(self):
+        """Open the connection pool."""
+        if self.config["http2"] and not HTTP2_AVAILABLE:
+            log_metadata({
+                "service": "api_gateway",
+                "upstream": self.name,
+                "status": "warning",
+                "message": "h2 not installed, falling back to HTTP/1.1"
+            })
+        for class_name, class_config in ROUTE_CLASSES.items():
+            share = class_config["pool_share"]
+            self.pools[class_name] = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=max(1, round(self.config["max_connections"] * share)),
+                    max_keepalive_connections=max(1, round(self.config["max_keepalive_connections"] * share)),
+                    keepalive_expiry=self.config["keepalive_expiry"],
+                ),
+                timeout=httpx.Timeout(
+                    self.config["timeout"],
+                    connect=self.config["connect_timeout"],
+                    pool=self.config["pool_timeout"],
+                ),
+            )
+        # A lone replica is always picked, so checking it would only add load
+        if self.health["interval"] > 0 and len(self.replicas) > 1:
+            # Checks bypass the breaker, bulkheads and limiter so they never compete with client traffic
+            self.health_client = httpx.AsyncClient(timeout=self.health["timeout"])
+            self.health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        """Stop health checks and close every connection pool and the keep-alive connections in them."""
+        if self.health_task is not None:
+            self.health_task.cancel()
+            try:
+                await self.health_task
+            except asyncio.CancelledError:
+                pass
+            self.health_task = None
+        if self.health_client is not None:
+            await self.health_client.aclose()
+            self.health_client = None
+        for pool in self.pools.values():
+            await pool.aclose()
+        self.pools = {}
+
+    async def _check(self, replica: Replica):
+        try:
+            response = await self.health_client.get(replica.base_url + self.health["path"])
+            ok = response.status_code < 500
+        except Exception:
+            ok = False
+        if replica.record_health(ok, self.health):
+            log_metadata({
+                "service": "api_gateway",
+                "upstream": self.name,
+                "replica": replica.base_url,
+                "function": "health_check",
+                "status": "healthy" if ok else "unhealthy"
+            })
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+            await asyncio.sleep(self.health["interval"])
+
+    def pick(self, affinity: Optional[str] = None, exclude: Collection[str] = ()) -> Replica:
+        """Choose a replica by affinity key, else by least outstanding requests or power of two choices.
+
+        Unhealthy and ejected replicas are skipped, and so are the base URLs in
+        exclude (replicas an earlier attempt of the same request is waiting
+        on) while another available replica remains. If that leaves none, all
+        replicas are eligible again rather than failing every request.
+        """
+        if len(self.replicas) == 1:
+            return self.replicas[0]
+        now = time.monotonic()
+        if affinity is not None:
+            replica = self.ring.get(affinity, now, exclude) or self.ring.get(affinity, now)
+            if replica is not None:
+                self.affinity_routed += 1
+                return replica
+        available = [replica for replica in self.replicas if replica.available(now)]
+        candidates = ([replica for replica in available if replica.base_url not in exclude]
+                      or available or self.replicas)
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.balancer == "p2c":
+            first, second = random.sample(candidates, 2)
+            return first if first.in_flight <= second.in_flight else second
+        fewest = min(replica.in_flight for replica in candidates)
+        return random.choice([replica for replica in candidates if replica.in_flight == fewest])
+
+    def _retarget(self, request: httpx.Request, replica: Replica):
+        url = replica.url
+        if (request.url.scheme, request.url.host, request.url.port) == (url.scheme, url.host, url.port):
+            return
+        request.url = request.url.copy_with(scheme=url.scheme, host=url.host, port=url.port)
+        request.headers["Host"] = url.netloc.decode("ascii")
+
+    def _tracer(self):
+        timer = UpstreamTimer(self.name)
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            # httpcore emits this once per new TCP connection; everything else rode a pooled one
+            if event_name == "connection.connect_tcp.complete":
+                self.connections_opened += 1
+            await timer(event_name, info)
+        return trace
+
+    def build_request(self, method: str, path: str, **kwargs) -> httpx.Request:
+        """Build a request against this upstream with connection and phase tracing attached."""
+        extensions = kwargs.pop("extensions", {})
+        extensions["trace"] = self._tracer()
+        return self.pools[DEFAULT_ROUTE_CLASS].build_request(method, path, extensions=extensions, **kwargs)
+
+    async def send(self, request: httpx.Request, stream: bool = False,
+                   route_class: str = DEFAULT_ROUTE_CLASS, affinity: Optional[str] = None,
+                   tried: Optional[Set[str]] = None) -> httpx.Response:
+        """Send a request to a balanced replica over the route class's pool through the breaker, bulkhead and limiter.
+
+        Requests with an affinity key go to the replica owning that key on the
+        hash ring while it is available. When tried is given, replicas in it
+        are avoided and the chosen one is added, so a hedged attempt sharing the
+        set lands on a different replica. Raises CircuitOpenError without
+        touching the network while the breaker is open, BulkheadFullError when
+        the route class is saturated, and LoadShedError when the upstream limiter's queue is full or too slow.
+        5xx responses and transport errors count as failures. Streamed responses
+        hold their breaker, bulkhead and limiter slots until the body is closed,
+        and their latency runs until then.
+        """
+        self.breaker.before_call()
+        try:
+            await bulkheads.acquire(route_class)
+        except BaseException:
+            self.breaker.release()
+            raise
+        try:
+            if self.limiter is not None:
+                await self.limiter.acquire()
+        except BaseException:
+            bulkheads.release(route_class)
+            self.breaker.release()
+            raise
+        replica = self.pick(affinity, tried or ())
+        if tried is not None:
+            tried.add(replica.base_url)
+        self._retarget(request, replica)
+        self.requests += 1
+        self.in_flight += 1
+        replica.requests += 1
+        replica.in_flight += 1
+        UPSTREAM_IN_FLIGHT.labels(self.name).inc()
+        started = time.monotonic()
+        status_code: Optional[int] = None
+
+        def finish(ok: Optional[bool]):
+            # ok=None means the call was cancelled and says nothing about upstream health
+            self.in_flight -= 1
+            replica.in_flight -= 1
+            UPSTREAM_IN_FLIGHT.labels(self.name).dec()
+            UPSTREAM_REQUESTS.labels(self.name, status_class(status_code)).inc()
+            latency = time.monotonic() - started
+            if ok is False:
+                self.errors += 1
+            if ok is None:
+                self.breaker.release()
+            else:
+                self.breaker.record(ok, latency)
+                if replica.record(ok, latency):
+                    log_metadata({
+                        "service": "api_gateway",
+                        "upstream": self.name,
+                        "replica": replica.base_url,
+                        "function": "replica_ejected",
+                        "ejections": replica.ejections,
+                        "status": "warning"
+                    })
+            if self.limiter is not None:
+                self.limiter.release(latency, ok)
+            bulkheads.release(route_class)
+
+        try:
+            response = await self.pools[route_class].send(request, stream=stream)
+        except asyncio.CancelledError:
+            finish(None)
+            raise
+        except Exception:
+            finish(False)
+            raise
+        status_code = response.status_code
+        if stream:
+            # The slots stay taken until the caller closes the body, so long streams
+            # (SSE) count against the route class and the limiter sees their full duration
+            response.stream = HeldStream(response.stream, response.status_code < 500, finish)
+        else:
+            finish(response.status_code < 500)
+        return response
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a buffered request to this upstream."""
+        return await self.send(self.build_request(method, path, **kwargs))
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    def pool_snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Current occupancy of each route class's httpcore connection pool."""
+        snapshot = {}
+        for class_name, client in self.pools.items():
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", None) or [])
+            idle = sum(1 for connection in connections if connection.is_idle())
+            snapshot[class_name] = {
+                "open": len(connections),
+                "idle": idle,
+                "active": len(connections) - idle,
+            }
+        return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        reused = max(self.requests - self.connections_opened, 0)
+        return {
+            "balancer": self.balancer,
+            "replicas": [replica.stats() for replica in self.replicas],
+            "ring_shares": {url: round(share, 4) for url, share in self.ring.shares().items()},
+            "affinity_routed": self.affinity_routed,
+            "http2": self.http2,
+            "max_connections": self.config["max_connections"],
+            "max_keepalive_connections": self.config["max_keepalive_connections"],
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "connections_opened": self.connections_opened,
+            "connections_reused": reused,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+            "pool": self.pool_snapshot(),
+            "breaker": self.breaker.stats(),
+            "concurrency": self.limiter.stats() if self.limiter is not None else None,
+        }
+
+
+class UpstreamRegistry:
+    """Holds one pooled client per configured upstream for the app lifetime."""
+
+    def __init__(self, config: Dict[str, Dict[str, Any]] = UPSTREAMS):
+        self.clients = {name: UpstreamClient(name, cfg) for name, cfg in config.items()}
+
+    async def start(self):
+        for client in self.clients.values():
+            await client.start()
+        log_metadata({
+            "service": "api_gateway",
+            "function": "upstreams_start",
+            "upstreams": list(self.clients),
+            "status": "success"
+        })
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.close()
+
+    def get(self, name: str) -> UpstreamClient:
+        return self.clients[name]
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: client.stats() for name, client in self.clients.items()}
+
+
+# Global registry, opened and closed by the app lifespan
+upstreams = UpstreamRegistry()
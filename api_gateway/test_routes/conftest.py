@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Unit tests import the gateway packages (config, services, utils) from the app root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from services.bulkhead import BulkheadFullError, BulkheadScheduler
+
+CLASSES = {
+    "cheap": {"weight": 3, "max_concurrency": 4, "max_queue": 10, "queue_timeout": 1},
+    "llm": {"weight": 1, "max_concurrency": 4, "max_queue": 10, "queue_timeout": 1},
+}
+
+
+def test_class_cap_holds_while_the_gateway_has_room():
+    scheduler = BulkheadScheduler(CLASSES, total_concurrency=10)
+
+    async def scenario():
+        for _ in range(4):
+            await scheduler.acquire("llm")
+        with pytest.raises(BulkheadFullError, match="queue timeout"):
+            await asyncio.wait_for(scheduler.acquire("llm"), timeout=2)
+        # The LLM class being full does not block cheap routes
+        await scheduler.acquire("cheap")
+
+    asyncio.run(scenario())
+    assert scheduler.classes["llm"].in_flight == 4
+    assert scheduler.classes["cheap"].in_flight == 1
+
+
+def test_freed_slots_go_to_waiting_classes_by_weight():
+    """With both classes queued, cheap (weight 3) gets three slots for every one LLM slot"""
+    scheduler = BulkheadScheduler(CLASSES, total_concurrency=1)
+    order = []
+
+    async def run(class_name):
+        await scheduler.acquire(class_name)
+        order.append(class_name)
+
+    async def scenario():
+        await scheduler.acquire("cheap")
+        tasks = [asyncio.ensure_future(run(name)) for name in ["llm"] * 4 + ["cheap"] * 4]
+        await asyncio.sleep(0)
+        for _ in range(8):
+            scheduler.release(order[-1] if order else "cheap")
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert order == ["llm", "cheap", "cheap", "cheap", "llm", "cheap", "llm", "llm"]
+
+
+def test_full_queue_sheds_immediately():
+    scheduler = BulkheadScheduler({"llm": {**CLASSES["llm"], "max_concurrency": 1, "max_queue": 1}},
+                                  total_concurrency=10)
+
+    async def scenario():
+        await scheduler.acquire("llm")
+        waiter = asyncio.ensure_future(scheduler.acquire("llm"))
+        await asyncio.sleep(0)
+        with pytest.raises(BulkheadFullError, match="queue full"):
+            await scheduler.acquire("llm")
+        scheduler.release("llm")
+        await waiter
+
+    asyncio.run(scenario())
+    assert scheduler.classes["llm"].counters == {"admitted": 2, "queued": 1, "shed_queue_full": 1,
+                                                 "shed_queue_timeout": 0}
@@ -0,0 +1,71 @@
+import gzip
+
+from starlette.requests import Request
+
+from services.compression import BROTLI_AVAILABLE, ResponseEncoder, cache_control, negotiate_encoding
+from services.proxy import ROUTES_BY_NAME
+from services.response_cache import CachedResponse
+
+BODY = b'{"ticker": "INTC", "prices": [' + b'{"close": 20.5}, ' * 200 + b'{"close": 21.0}]}'
+
+
+def make_request(method: str, headers: dict) -> Request:
+    return Request({
+        "type": "http",
+        "method": method,
+        "path": "/",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def cached_response() -> CachedResponse:
+    return CachedResponse(200, {"content-type": "application/json"}, BODY, stored_at=0.0)
+
+
+def test_negotiate_encoding_honours_q_values():
+    preferred = "br" if BROTLI_AVAILABLE else "gzip"
+    assert negotiate_encoding("gzip, deflate, br") == preferred
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert negotiate_encoding("br;q=0, gzip;q=0") is None
+    assert negotiate_encoding("*") == preferred
+    assert negotiate_encoding("*;q=0, gzip") == "gzip"
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("") is None
+
+
+def test_render_compresses_and_reuses_etag_across_encodings():
+    encoder = ResponseEncoder()
+    route = ROUTES_BY_NAME["get_stock_latest"]
+    cached = cached_response()
+
+    plain = encoder.render(make_request("GET", {}), route, cached)
+    zipped = encoder.render(make_request("GET", {"Accept-Encoding": "gzip"}), route, cached)
+    assert plain.body == BODY
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(zipped.body) == BODY
+    assert zipped.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+
+    revalidated = encoder.render(
+        make_request("GET", {"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["etag"]}), route, cached)
+    assert revalidated.status_code == 304
+    # The identity ETag still validates once the client starts accepting gzip
+    upgraded = encoder.render(
+        make_request("GET", {"Accept-Encoding": "gzip", "If-None-Match": plain.headers["etag"]}), route, cached)
+    assert upgraded.status_code == 304
+
+
+def test_idempotent_post_answers_if_none_match():
+    encoder = ResponseEncoder()
+    cached = cached_response()
+    stock_data = ROUTES_BY_NAME["get_stock_data"]
+
+    first = encoder.render(make_request("POST", {}), stock_data, cached)
+    assert first.headers["cache-control"] == "private, no-cache"
+    again = encoder.render(make_request("POST", {"If-None-Match": first.headers["etag"]}), stock_data, cached)
+    assert again.status_code == 304
+
+    # Non-idempotent POSTs are never answered from the client's copy
+    user_data = ROUTES_BY_NAME["get_user_data"]
+    assert cache_control(user_data, cached) == "no-store"
+    fresh = encoder.render(make_request("POST", {"If-None-Match": first.headers["etag"]}), user_data, cached)
+    assert fresh.status_code == 200
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from services import concurrency
+from services.concurrency import AdaptiveLimiter, LoadShedError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(concurrency.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_fast_successes_grow_the_limit_additively(clock):
+    limiter = AdaptiveLimiter("nlp", initial_limit=4, max_limit=5)
+
+    async def calls(n):
+        for _ in range(n):
+            await limiter.acquire()
+            limiter.release(0.1, True)
+
+    asyncio.run(calls(1))
+    assert limiter.limit == 4.25
+    asyncio.run(calls(10))
+    assert limiter.limit == 5
+
+
+def test_errors_and_slow_calls_back_off_once_per_latency(clock):
+    limiter = AdaptiveLimiter("nlp", initial_limit=10, min_limit=2, backoff=0.5)
+
+    async def call(latency, ok):
+        await limiter.acquire()
+        limiter.release(latency, ok)
+
+    asyncio.run(call(1.0, True))
+    limit = limiter.limit
+    asyncio.run(call(1.0, False))
+    assert limiter.limit == limit * 0.5
+    # A second failure within one average latency does not cut again
+    asyncio.run(call(1.0, False))
+    assert limiter.limit == limit * 0.5
+
+    clock[0] += 2
+    asyncio.run(call(5.0, True))
+    assert limiter.limit == limit * 0.25
+    for _ in range(5):
+        clock[0] += 10
+        asyncio.run(call(1.0, False))
+    assert limiter.limit == 2
+
+
+def test_cancelled_calls_return_the_slot_without_a_sample(clock):
+    limiter = AdaptiveLimiter("nlp", initial_limit=3)
+
+    async def call():
+        await limiter.acquire()
+        limiter.release(9.0, None)
+
+    asyncio.run(call())
+    assert (limiter.in_flight, limiter.limit, limiter.avg_latency) == (0, 3, 0.0)
+
+
+def test_queue_hands_slots_over_and_sheds_when_full():
+    limiter = AdaptiveLimiter("nlp", initial_limit=2, max_queue=1, queue_timeout=1)
+
+    async def scenario():
+        await limiter.acquire()
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(LoadShedError, match="queue full"):
+            await limiter.acquire()
+        limiter.release(0.1, True)
+        await waiter
+        return limiter.in_flight
+
+    assert asyncio.run(scenario()) == 2
+    assert limiter.counters == {"accepted": 3, "queued": 1, "shed_queue_full": 1, "shed_queue_timeout": 0}
+
+
+def test_queue_timeout_sheds():
+    limiter = AdaptiveLimiter("nlp", initial_limit=2, max_queue=5, queue_timeout=0.01)
+
+    async def scenario():
+        await limiter.acquire()
+        await limiter.acquire()
+        with pytest.raises(LoadShedError, match="queue timeout") as raised:
+            await limiter.acquire()
+        return raised.value.retry_after
+
+    assert asyncio.run(scenario()) == 1.0
+    assert not limiter.waiters
+    assert limiter.counters["shed_queue_timeout"] == 1
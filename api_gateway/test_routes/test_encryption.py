@@ -0,0 +1,146 @@
+import asyncio
+import os
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from services import encryption
+from services.encryption import (KeyStore, Session, SessionEncryptionMiddleware, SessionStore, chunk_aad,
+                                 envelope_aad)
+
+
+async def echo_app(scope, receive, send):
+    message = await receive()
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": message.get("body", b"")})
+
+
+def call(middleware, session_id: str, sequence, body: bytes, path: str = "/api/query"):
+    headers = [(b"x-session-id", session_id.encode())]
+    if sequence is not None:
+        headers.append((b"x-session-seq", str(sequence).encode()))
+    scope = {"type": "http", "method": "POST", "path": path, "headers": headers}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return messages[0]["status"], b"".join(m.get("body", b"") for m in messages[1:])
+
+
+def open_session(app=echo_app):
+    store = SessionStore(KeyStore(reload_interval=0))
+    key = os.urandom(32)
+    store.sessions["sid"] = Session(key, 60)
+    return SessionEncryptionMiddleware(app, store=store, required=True), Session(key, 60), store
+
+
+def test_session_accepts_each_sequence_once_within_window():
+    session = Session(os.urandom(32), 60, replay_window=4)
+    assert session.accept(2)
+    assert session.accept(1)          # out of order, still inside the window
+    assert not session.accept(2)      # replay
+    assert session.accept(10)
+    assert not session.accept(6)      # fell out of the window
+    assert session.accept(7)
+    assert not session.accept(0)
+
+
+def test_request_replay_is_rejected():
+    middleware, client, store = open_session()
+    request = client.encrypt(b'{"query": "q"}', envelope_aad("req", "POST", "/api/query", 1))
+
+    status, body = call(middleware, "sid", 1, request)
+    assert status == 200
+    assert client.decrypt(body, envelope_aad("resp", "POST", "/api/query", 1)) == b'{"query": "q"}'
+
+    status, _ = call(middleware, "sid", 1, request)
+    assert status == 409
+    assert store.counters["replays"] == 1
+    # Re-labelling the captured envelope with a new sequence number breaks its tag
+    status, _ = call(middleware, "sid", 2, request)
+    assert status == 400
+
+
+def test_response_cannot_be_sent_back_as_request():
+    middleware, client, _ = open_session()
+    request = client.encrypt(b'{"query": "q"}', envelope_aad("req", "POST", "/api/query", 1))
+    _, response = call(middleware, "sid", 1, request)
+
+    status, _ = call(middleware, "sid", 1, response)
+    assert status == 400
+    status, _ = call(middleware, "sid", None, request)
+    assert status == 400
+
+
+def test_key_reload_keeps_one_copy_of_unchanged_key(tmp_path, monkeypatch):
+    def write_key(name):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        (tmp_path / f"{name}_private.pem").write_bytes(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+        (tmp_path / f"{name}_public.pem").write_bytes(key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo))
+
+    write_key("gateway")
+    write_key("client")
+    monkeypatch.setattr(encryption, "GATEWAY_PRIVATE_KEY_PATH", str(tmp_path / "gateway_private.pem"))
+    monkeypatch.setattr(encryption, "GATEWAY_PUBLIC_KEY_PATH", str(tmp_path / "gateway_public.pem"))
+    monkeypatch.setattr(encryption, "CLIENT_PRIVATE_KEY_PATH", str(tmp_path / "client_private.pem"))
+
+    store = KeyStore(reload_interval=0)
+    store.load()
+    write_key("client")               # only the client PEM changes
+    store.load()
+    assert len(store.private_keys) == 1
+
+    write_key("gateway")              # a rotation keeps the previous key
+    store.load()
+    store.load()
+    assert len(store.private_keys) == 2
+    assert store.stats()["keys"] == 2
+
+
+async def stream_app(scope, receive, send):
+    await receive()
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"text/event-stream")]})
+    for chunk in (b"data: one\n\n", b"data: two\n\n"):
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def stream_events(body: bytes):
+    events = []
+    for block in body.decode().strip().split("\n\n"):
+        name, data = block.split("\n")
+        events.append((name[len("event: "):], data[len("data: "):].encode()))
+    return events
+
+
+def test_stream_chunks_are_bound_to_their_position():
+    middleware, client, _ = open_session(stream_app)
+    request = client.encrypt(b"{}", envelope_aad("req", "POST", "/api/query", 1))
+    aad = envelope_aad("resp", "POST", "/api/query", 1)
+
+    status, body = call(middleware, "sid", 1, request)
+    events = stream_events(body)
+    assert status == 200
+    assert [name for name, _ in events] == ["encrypted", "encrypted", "end"]
+    assert [client.decrypt(data, chunk_aad(aad, i)) for i, (_, data) in enumerate(events[:2])] == \
+        [b"data: one\n\n", b"data: two\n\n"]
+    assert client.decrypt(events[2][1], chunk_aad(aad, 2, final=True)) == b""
+
+    # Swapped chunks fail their tags, and a truncated stream has no end marker for its length
+    with pytest.raises(InvalidTag):
+        client.decrypt(events[1][1], chunk_aad(aad, 0))
+    with pytest.raises(InvalidTag):
+        client.decrypt(events[0][1], chunk_aad(aad, 1))
+    with pytest.raises(InvalidTag):
+        client.decrypt(events[2][1], chunk_aad(aad, 1, final=True))
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from services.proxy import ROUTES_BY_NAME, parse_body
+
+
+def test_parse_body_forwards_only_required_fields():
+    """Extra client fields are dropped and the raw bytes are reused when nothing changes"""
+    route = ROUTES_BY_NAME["get_user_data"]
+
+    content, payload = parse_body(route, b'{"user_id": "u1", "admin": true}')
+    assert json.loads(content) == {"user_id": "u1"}
+    assert payload == {"user_id": "u1"}
+
+    raw = b'{"user_id": "u1"}'
+    assert parse_body(route, raw) == (raw, {"user_id": "u1"})
+
+
+def test_parse_body_mapped_field_wins_over_client_key():
+    """A client cannot send its own userId to act for another user"""
+    route = ROUTES_BY_NAME["analyze_stock_sentiments"]
+
+    content, payload = parse_body(route, b'{"user_id": "u1", "userId": "someone-else"}')
+    assert json.loads(content) == {"userId": "u1"}
+    assert payload == {"user_id": "u1"}
+
+
+def test_parse_body_rejects_missing_fields():
+    with pytest.raises(ValueError, match="user_id required"):
+        parse_body(ROUTES_BY_NAME["get_user_data"], b'{"userId": "u1"}')
+    with pytest.raises(ValueError, match="JSON object required"):
+        parse_body(ROUTES_BY_NAME["get_user_data"], b'["u1"]')
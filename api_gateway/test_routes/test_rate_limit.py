@@ -0,0 +1,79 @@
+import asyncio
+from dataclasses import replace
+
+import pytest
+
+from services import rate_limit
+from services.proxy import ROUTES_BY_NAME
+from services.rate_limit import RateLimiter, RateLimitExceeded
+
+ENHANCE = ROUTES_BY_NAME["enhance_simulation"]  # 10 per 60s, rate_group "enhance"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+    return now
+
+
+def check(limiter: RateLimiter, route=ENHANCE, user_id="u1"):
+    return asyncio.run(limiter.check(route, {"user_id": user_id}))
+
+
+def test_burst_then_one_request_per_interval(clock):
+    limiter = RateLimiter(enabled=True, redis_url=None)
+    decisions = [check(limiter) for _ in range(10)]
+    assert [decision.remaining for decision in decisions] == [9, 8, 7, 6, 5, 4, 3, 2, 1, 0]
+    assert decisions[-1].headers() == {"RateLimit-Limit": "10", "RateLimit-Remaining": "0", "RateLimit-Reset": "60"}
+
+    with pytest.raises(RateLimitExceeded) as raised:
+        check(limiter)
+    # The next slot opens one emission interval (60s / 10) later
+    assert raised.value.headers["Retry-After"] == "6"
+    assert raised.value.decision.reset == 60
+
+    clock[0] += 6
+    assert check(limiter).remaining == 0
+    with pytest.raises(RateLimitExceeded):
+        check(limiter)
+    assert limiter.counters == {"allowed": 11, "limited": 2, "redis_errors": 0}
+
+
+def test_fractional_interval_reports_the_full_allowance(clock):
+    """3 per 1s has an interval of 1/3s, which float division must not round away"""
+    limiter = RateLimiter(enabled=True, redis_url=None)
+    route = replace(ENHANCE, rate_limit=3, rate_period=1)
+    assert [check(limiter, route).remaining for _ in range(3)] == [2, 1, 0]
+    with pytest.raises(RateLimitExceeded):
+        check(limiter, route)
+    clock[0] += 1
+    assert check(limiter, route).remaining == 2
+
+
+def test_idle_time_refills_the_burst(clock):
+    limiter = RateLimiter(enabled=True, redis_url=None)
+    for _ in range(10):
+        check(limiter)
+    clock[0] += 30
+    assert check(limiter).remaining == 4
+    clock[0] += 600
+    assert check(limiter).remaining == 9
+
+
+def test_keys_are_per_user_and_per_rate_group(clock):
+    limiter = RateLimiter(enabled=True, redis_url=None)
+    for _ in range(10):
+        check(limiter)
+    # The streaming variant shares the "enhance" budget
+    with pytest.raises(RateLimitExceeded):
+        check(limiter, ROUTES_BY_NAME["stream_enhance_simulation"])
+    assert check(limiter, user_id="u2").remaining == 9
+    assert check(limiter, ROUTES_BY_NAME["process_query"]).remaining == 19
+
+
+def test_unlimited_routes_and_anonymous_requests_pass(clock):
+    limiter = RateLimiter(enabled=True, redis_url=None)
+    assert check(limiter, ROUTES_BY_NAME["get_user_data"]) is None
+    assert asyncio.run(limiter.check(ENHANCE, {})) is None
+    assert check(RateLimiter(enabled=False, redis_url=None)) is None
@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from services import resilience
+from services.resilience import CircuitBreaker, CircuitOpenError, Hedger
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def breaker(**overrides) -> CircuitBreaker:
+    config = {"window_seconds": 30, "min_requests": 4, "error_rate": 0.5, "slow_call_seconds": 1,
+              "slow_call_rate": 0.5, "open_seconds": 15, "half_open_probes": 2}
+    return CircuitBreaker("financial", **{**config, **overrides})
+
+
+def call(cb: CircuitBreaker, ok: bool = True, latency: float = 0.1):
+    cb.before_call()
+    cb.record(ok, latency)
+
+
+def test_opens_on_error_rate_only_after_min_requests(clock):
+    cb = breaker()
+    call(cb, ok=False)
+    call(cb, ok=False)
+    call(cb, ok=False)
+    assert cb.state == "closed"
+    call(cb)
+    assert cb.state == "open"
+    with pytest.raises(CircuitOpenError) as raised:
+        cb.before_call()
+    assert raised.value.retry_after == 15
+    assert cb.rejected == 1
+
+
+def test_opens_on_slow_calls(clock):
+    cb = breaker()
+    for latency in (0.1, 0.1, 2.0, 2.0):
+        call(cb, latency=latency)
+    assert cb.state == "open"
+
+
+def test_outcomes_older_than_the_window_do_not_count(clock):
+    cb = breaker()
+    call(cb, ok=False)
+    call(cb, ok=False)
+    clock[0] += 31
+    call(cb, ok=False)
+    call(cb)
+    call(cb)
+    assert cb.state == "closed"
+
+
+def test_half_open_probes_close_or_reopen(clock):
+    cb = breaker()
+    for _ in range(4):
+        call(cb, ok=False)
+    clock[0] += 15
+
+    cb.before_call()
+    assert cb.state == "half_open"
+    cb.before_call()
+    # Only half_open_probes calls are let through
+    with pytest.raises(CircuitOpenError):
+        cb.before_call()
+    cb.record(True, 0.1)
+    cb.record(True, 0.1)
+    assert cb.state == "closed"
+
+    for _ in range(4):
+        call(cb, ok=False)
+    clock[0] += 15
+    call(cb, ok=False)
+    assert cb.state == "open"
+    assert cb.times_opened == 3
+
+
+def test_cancelled_probe_frees_its_slot(clock):
+    cb = breaker(half_open_probes=1)
+    for _ in range(4):
+        call(cb, ok=False)
+    clock[0] += 15
+    cb.before_call()
+    cb.release()
+    cb.before_call()
+    assert cb.probes_in_flight == 1
+
+
+def test_cancelled_caller_cancels_the_unfinished_attempt():
+    hedger = Hedger(default_delay=10)
+    attempts = []
+
+    async def attempt(tried):
+        attempts.append(asyncio.current_task())
+        await asyncio.sleep(60)
+
+    async def scenario():
+        caller = asyncio.ensure_future(hedger.run("get_stock_latest", attempt))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+        return attempts[0]
+
+    assert asyncio.run(scenario()).cancelled()
+
+
+def test_attempt_cancelled_from_outside_falls_back_to_the_other():
+    hedger = Hedger(default_delay=0.01)
+    attempts = []
+
+    async def attempt(tried):
+        attempts.append(asyncio.current_task())
+        if len(attempts) == 1:
+            await asyncio.sleep(60)
+        attempts[0].cancel()
+        await asyncio.sleep(0.01)
+        return "hedge"
+
+    assert asyncio.run(hedger.run("get_stock_latest", attempt)) == "hedge"
@@ -0,0 +1,29 @@
+import asyncio
+
+from config.settings import UPSTREAMS
+from services.proxy import ROUTES_BY_NAME
+from services.shadow import ShadowMirror, diff_keys
+
+
+def test_only_opted_in_routes_are_mirrored():
+    config = {"nlp": {**UPSTREAMS["nlp"], "shadow": {"url": "http://127.0.0.1:1", "sample_percent": 100}},
+              "financial": {**UPSTREAMS["financial"], "shadow": {"url": "http://127.0.0.1:1", "sample_percent": 100}}}
+    mirror = ShadowMirror(config, max_in_flight=0)
+
+    async def scenario():
+        await mirror.start()
+        try:
+            mirror.mirror(ROUTES_BY_NAME["enhance_simulation"], "/nlp/enhance", b"{}", 200, 0.1)
+            mirror.mirror(ROUTES_BY_NAME["stream_process_query"], "/nlp/query/stream", b"{}", 200, 0.1)
+            mirror.mirror(ROUTES_BY_NAME["get_stock_latest"], "/api/stock/latest/BHP", None, 200, 0.1)
+        finally:
+            await mirror.close()
+
+    asyncio.run(scenario())
+    # Only the stock read was sampled (and dropped, as no replays may run here)
+    assert mirror.counters == {"sampled": 1, "dropped": 1}
+
+
+def test_diff_keys():
+    assert diff_keys({"a": 1, "b": 2}, {"a": 1, "b": 3, "c": 4}) == {"b", "c"}
+    assert diff_keys([1], {"a": 1}) == {"<body>"}
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from config.settings import TICKER_STREAM_MAX_TICKERS
+from services.ticker_stream import TickerFeed, TickerHub
+
+
+@pytest.fixture
+def polls(monkeypatch):
+    seen = []
+
+    async def fetch(feed):
+        seen.append(feed.ticker)
+        return {"ticker": feed.ticker, "price": 1.0}
+
+    monkeypatch.setattr(TickerFeed, "_fetch", fetch)
+    return seen
+
+
+def test_subscription_over_the_cap_adds_nothing(polls):
+    hub = TickerHub(poll_seconds=60)
+    tickers = [f"T{i}" for i in range(TICKER_STREAM_MAX_TICKERS + 1)]
+
+    async def scenario():
+        subscriber = hub.connect()
+        hub.subscribe(subscriber, tickers[:-2])
+        with pytest.raises(ValueError, match="at most"):
+            hub.subscribe(subscriber, tickers[-3:])
+        before = (set(subscriber.tickers), set(hub.feeds))
+        # Already subscribed tickers do not count again
+        hub.subscribe(subscriber, tickers[-3:-1])
+        tasks = [feed.task for feed in hub.feeds.values()]
+        await hub.close()
+        return before, subscriber, tasks
+
+    before, subscriber, tasks = asyncio.run(scenario())
+    assert before == (set(tickers[:-2]), set(tickers[:-2]))
+    assert not subscriber.tickers and not hub.feeds
+    assert all(task.done() for task in tasks)
@@ -0,0 +1,118 @@
+import asyncio
+
+import httpx
+import pytest
+
+from config.settings import UPSTREAMS
+from services.bulkhead import bulkheads
+from services.resilience import Hedger
+from services.upstream import HashRing, Replica, UpstreamClient
+
+
+def mock_client(handler) -> UpstreamClient:
+    client = UpstreamClient("nlp", UPSTREAMS["nlp"])
+    client.pools = {"interactive_llm": httpx.AsyncClient(base_url=client.base_url,
+                                                         transport=httpx.MockTransport(handler))}
+    return client
+
+
+def test_streamed_response_holds_slots_until_closed():
+    """An SSE body keeps its bulkhead and in-flight slots until the relay closes it"""
+    async def events():
+        yield b"data: hi\n\n"
+
+    client = mock_client(lambda request: httpx.Response(200, content=events()))
+
+    async def scenario():
+        request = client.pools["interactive_llm"].build_request("POST", "/nlp/enhance/stream")
+        response = await client.send(request, stream=True, route_class="interactive_llm")
+        held = (client.in_flight, bulkheads.classes["interactive_llm"].in_flight)
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+        await response.aclose()
+        return held, body
+
+    held, body = asyncio.run(scenario())
+    assert held == (1, 1)
+    assert body == b"data: hi\n\n"
+    assert client.in_flight == 0
+    assert bulkheads.classes["interactive_llm"].in_flight == 0
+    assert client.breaker.stats()["state"] == "closed"
+
+
+def test_buffered_response_releases_slots_on_return():
+    client = mock_client(lambda request: httpx.Response(503))
+
+    async def scenario():
+        request = client.pools["interactive_llm"].build_request("GET", "/")
+        return await client.send(request, route_class="interactive_llm")
+
+    assert asyncio.run(scenario()).status_code == 503
+    assert client.in_flight == 0
+    assert client.errors == 1
+    assert bulkheads.classes["interactive_llm"].in_flight == 0
+
+
+def test_health_checks_only_run_for_replicated_pools():
+    async def started_task(base_urls):
+        client = UpstreamClient("financial", {**UPSTREAMS["financial"], "base_urls": base_urls})
+        await client.start()
+        try:
+            return client.health_task is not None, client.health["path"]
+        finally:
+            await client.close()
+
+    assert asyncio.run(started_task(["http://127.0.0.1:1"])) == (False, "/api/health")
+    assert asyncio.run(started_task(["http://127.0.0.1:1", "http://127.0.0.1:2"])) == (True, "/api/health")
+
+
+def test_hedged_attempt_avoids_the_primary_replica():
+    """The hedge shares the primary's tried set, so it skips the ring owner the primary is waiting on"""
+    client = UpstreamClient("financial", {**UPSTREAMS["financial"],
+                                          "base_urls": ["http://a:1", "http://b:1", "http://c:1"]})
+    tried = set()
+    owner = client.pick("BHP", tried)
+    tried.add(owner.base_url)
+    hedge = client.pick("BHP", tried)
+    assert hedge is not owner
+    assert hedge is client.ring.get("BHP", 0, {owner.base_url})
+    # With every replica tried, affinity still wins
+    assert client.pick("BHP", {replica.base_url for replica in client.replicas}) is owner
+
+
+def test_hedger_passes_one_tried_set_to_both_attempts():
+    hedger = Hedger(default_delay=0.01)
+    seen = []
+
+    async def attempt(tried):
+        seen.append(tried)
+        tried.add(f"replica-{len(seen)}")
+        if len(seen) == 1:
+            await asyncio.sleep(1)
+        return len(seen)
+
+    assert asyncio.run(hedger.run("get_stock_latest", attempt)) == 2
+    assert seen[0] is seen[1] and seen[0] == {"replica-1", "replica-2"}
+    assert hedger.counters["get_stock_latest"]["hedge_wins"] == 1
+
+
+def test_hash_ring_moves_only_the_lost_replicas_keys():
+    replicas = [Replica(f"http://10.0.0.{i}:8001", UPSTREAMS["financial"]["ejection"]) for i in range(1, 5)]
+    ring = HashRing(replicas, virtual_nodes=160)
+    tickers = [f"T{i:04d}" for i in range(4000)]
+    before = {ticker: ring.get(ticker, 0) for ticker in tickers}
+
+    shares = ring.shares()
+    assert sum(shares.values()) == pytest.approx(1.0)
+    assert all(0.15 < share < 0.35 for share in shares.values())
+
+    lost = replicas[1]
+    lost.healthy = False
+    after = {ticker: ring.get(ticker, 0) for ticker in tickers}
+    moved = {ticker for ticker in tickers if after[ticker] is not before[ticker]}
+    assert moved == {ticker for ticker in tickers if before[ticker] is lost}
+    assert lost not in after.values()
+    # The lost replica's keys spread over the survivors instead of piling onto one
+    assert len({after[ticker] for ticker in moved}) == 3
+
+    lost.healthy = True
+    assert {ticker: ring.get(ticker, 0) for ticker in tickers} == before
@@ -0,0 +1,77 @@
+"""Gateway-side cost of per-message RSA envelopes versus AES-GCM session keys.
+
+Run from the api_gateway directory:
+
+    python -m utils.benchmark_encryption --messages 2000 --requests-per-session 50
+"""
+import argparse
+import json
+import os
+import time
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from services.encryption import OAEP, Session, envelope_aad
+from utils.test_module import decrypt_response, encrypt_request
+
+SAMPLE_BODY = {
+    "user_id": "uid1",
+    "simulation_data": {"projected_balance": 360000.45, "timeframe": 10},
+    "ai_prompt": "Use a savings analogy.",
+}
+
+
+def bench_per_message(messages: int, gateway_key, client_key) -> float:
+    """Decrypt each request and encrypt each response with a fresh RSA-wrapped AES-CBC key."""
+    requests = [encrypt_request(SAMPLE_BODY, gateway_key.public_key()) for _ in range(messages)]
+    started = time.perf_counter()
+    for envelope in requests:
+        body = decrypt_response(envelope["encrypted_data"], envelope["encrypted_key"], envelope["iv"], gateway_key)
+        encrypt_request(body, client_key.public_key())
+    return time.perf_counter() - started
+
+
+def bench_session(messages: int, requests_per_session: int, gateway_key) -> float:
+    """One RSA unwrap per session, then AES-GCM for every request and response."""
+    aad = envelope_aad("req", "POST", "/api/enhance", 1)
+    plaintext = json.dumps(SAMPLE_BODY).encode("utf-8")
+    sessions = (messages + requests_per_session - 1) // requests_per_session
+    handshakes = [gateway_key.public_key().encrypt(os.urandom(32), OAEP) for _ in range(sessions)]
+    client_sessions = [Session(os.urandom(32), 3600) for _ in range(sessions)]
+    sealed = [client_sessions[i // requests_per_session].encrypt(plaintext, aad) for i in range(messages)]
+
+    started = time.perf_counter()
+    gateway_sessions = []
+    for client_session, wrapped in zip(client_sessions, handshakes):
+        gateway_key.decrypt(wrapped, OAEP)
+        # The benchmark reuses the client's key so the pre-sealed requests decrypt
+        gateway_sessions.append(client_session)
+    for i, envelope in enumerate(sealed):
+        session = gateway_sessions[i // requests_per_session]
+        body = session.decrypt(envelope, aad)
+        session.encrypt(body, aad)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--requests-per-session", type=int, default=50)
+    args = parser.parse_args()
+
+    gateway_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    client_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    per_message = bench_per_message(args.messages, gateway_key, client_key)
+    session = bench_session(args.messages, args.requests_per_session, gateway_key)
+    print(json.dumps({
+        "messages": args.messages,
+        "requests_per_session": args.requests_per_session,
+        "per_message_rsa": {"seconds": round(per_message, 4), "msgs_per_sec": round(args.messages / per_message, 1)},
+        "session_key": {"seconds": round(session, 4), "msgs_per_sec": round(args.messages / session, 1)},
+        "speedup": round(per_message / session, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
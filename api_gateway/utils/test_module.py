@@ -1,17 +1,37 @@
-import requests
+import asyncio
 import json
 import base64
 import os
-import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives import padding as sym_padding
 from cryptography.hazmat.backends import default_backend
-from utils.key_provider import load_private_key, load_public_key, setup_keys
-
-API_GATEWAY_BASE_URL = "http://localhost:8080"
-PUBLIC_KEY_URL = f"{API_GATEWAY_BASE_URL}/api/public-key"
+from config.routes import ROUTES
+from config.settings import PROBE_CONCURRENCY, PROBE_INTERVAL_SECONDS, PROBE_REPEAT, PROBE_TIMEOUT
+from services.proxy import affinity_key, match_route, open_upstream, parse_body
+from utils.logger import log_metadata
+
+# End-to-end checks: (endpoint, request body, method, route name in config/routes.py)
+PROBES = [
+    ("/api/stock-sentiments", {"user_id": "uid1"}, "POST", "analyze_stock_sentiments"),
+    ("/api/user-data", {"user_id": "uid1"}, "POST", "get_user_data"),
+    ("/api/simulate", {"user_id": "uid1", "simulation_data": {
+        "projected_balance": 360000.45, "timeframe": 10}}, "POST", "simulate_investment"),
+    ("/api/recommend", {"user_id": "uid1"}, "POST", "get_recommendations"),
+    ("/api/enhance", {"simulation_data": {"projected_balance": 360000.45,
+        "timeframe": 10}, "user_id": "uid1", "ai_prompt": "Use a savings analogy."}, "POST", "enhance_simulation"),
+    ("/api/query", {"query": "BHP.AX recession", "user_id": "uid1"}, "POST", "process_query"),
+    ("/api/stock-latest/INTC", None, "GET", "get_stock_latest"),
+    ("/api/stock-data", {"ticker": "INTC", "start_date": "2025-07-20", "end_date": "2025-08-15"}, "POST", "get_stock_data")
+]
+
+ROUTE_UPSTREAMS = {route.name: route.upstream for route in ROUTES}
 
 
 def encrypt_request(data: dict, public_key):
@@ -68,11 +88,33 @@ def decrypt_response(encrypted_data: str, encrypted_key: str, iv: str, private_k
     return json.loads(data.decode('utf-8'))
 
 
-def test_endpoint(endpoint: str, request_data: dict, method: str = "POST"):
-    """Test a single endpoint and return results"""
-    setup_keys()
-    client_private_key = load_private_key("keys/client_private_key.pem")
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(int(round(q * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
 
+def summarize_latencies(samples: List[float]) -> Dict[str, Any]:
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 0.50), 1),
+        "p95_ms": round(percentile(samples, 0.95), 1),
+        "p99_ms": round(percentile(samples, 0.99), 1),
+        "max_ms": round(max(samples), 1) if samples else 0.0,
+    }
+
+
+async def test_endpoint(endpoint: str, request_data: Optional[dict], method: str = "POST") -> Dict[str, Any]:
+    """Run a single probe straight against its route's upstream and return its result and latency.
+
+    Probes skip the gateway's response cache, single-flight, prefetch and
+    per-user rate limits, so every sample is a real upstream round trip
+    rather than a cache hit or a 429; they still pass the upstream's breaker,
+    bulkhead and concurrency limit like any other request.
+    """
     result = {
         "endpoint": endpoint,
         "method": method,
@@ -80,85 +122,124 @@ def test_endpoint(endpoint: str, request_data: dict, method: str = "POST"):
         "request_data": request_data,
         "response": None,
         "error": None,
-        "status_code": None
+        "status_code": None,
+        "latency_ms": None
     }
 
-    try:
-        # Get public key from gateway
-        response = requests.get(PUBLIC_KEY_URL)
-        response.raise_for_status()
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pem", mode="w") as temp_file:
-            temp_file.write(response.json()["public_key"])
-            temp_file_path = temp_file.name
-
+    async def round_trip() -> httpx.Response:
+        route, path_params = match_route(method, endpoint)
+        content, payload = None, {}
+        if method != "GET":
+            content, payload = parse_body(route, json.dumps(request_data).encode("utf-8"))
+        response = await open_upstream(route, path_params, content, affinity_key(route, path_params, payload))
         try:
-            gateway_public_key = load_public_key(temp_file_path)
-            encrypted_request = encrypt_request(request_data, gateway_public_key)
-
-            # Send request
-            if method == "POST":
-                response = requests.post(
-                    f"{API_GATEWAY_BASE_URL}{endpoint}", json=encrypted_request)
-            else:
-                response = requests.get(
-                    f"{API_GATEWAY_BASE_URL}{endpoint}", json=encrypted_request)
-            
-            result["status_code"] = response.status_code
-            response.raise_for_status()
-            response_data = response.json()
-
-            decrypted_response = decrypt_response(
-                response_data["encrypted_data"],
-                response_data["encrypted_key"],
-                response_data["iv"],
-                client_private_key
-            )
-            
-            result["response"] = decrypted_response
-            
-        except requests.exceptions.RequestException as re:
-            result["status"] = "error"
-            result["error"] = str(re)
-        except ValueError as ve:
-            result["status"] = "error"
-            result["error"] = str(ve)
-        except Exception as e:
-            result["status"] = "error"
-            result["error"] = str(e)
+            await response.aread()
         finally:
-            os.unlink(temp_file_path)
-            
+            await response.aclose()
+        return response
+
+    started = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(round_trip(), PROBE_TIMEOUT)
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        result["status_code"] = response.status_code
+        result["response"] = response.json()
     except Exception as e:
+        if result["latency_ms"] is None:
+            result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        if isinstance(e, httpx.HTTPStatusError):
+            result["status_code"] = e.response.status_code
         result["status"] = "error"
-        result["error"] = f"Failed to get public key: {str(e)}"
+        result["error"] = str(e) or type(e).__name__
 
     return result
 
 
-def run_all_tests():
-    """Run all test endpoints and return results"""
-    test_results = []
-    
-    # Test all endpoints
-    endpoints = [
-        ("/api/stock-sentiments", {"user_id": "uid1"}, "POST"),
-        ("/api/user-data", {"user_id": "uid1"}, "POST"),
-        ("/api/simulate", {"user_id": "uid1", "simulation_data": {
-            "projected_balance": 360000.45, "timeframe": 10}}, "POST"),
-        ("/api/recommend", {"user_id": "uid1"}, "POST"),
-        ("/api/enhance", {"simulation_data": {"projected_balance": 360000.45,
-            "timeframe": 10}, "user_id": "uid1", "ai_prompt": "Use a savings analogy."}, "POST"),
-        ("/api/query", {"query": "BHP.AX recession", "user_id": "uid1"}, "POST"),
-        ("/api/stock-latest/INTC", {"ticker": "INTC", "start_date": "2024-06-19", "end_date": "2025-08-19"}, "GET"),
-        ("/api/stock-data", {"ticker": "INTC", "start_date": "2025-07-20", "end_date": "2025-08-15"}, "POST")
-    ]
-    
-    for endpoint, data, method in endpoints:
-        print(f"-------------running test for {endpoint} --------------")
-        result = test_endpoint(endpoint, data, method)
-        test_results.append(result)
-        print(f"------------- Test for {endpoint} finished --------------")
-
-    
-    return test_results
\ No newline at end of file
+async def run_all_tests(repeat: int = PROBE_REPEAT, concurrency: int = PROBE_CONCURRENCY) -> Dict[str, Any]:
+    """Run every probe `repeat` times with at most `concurrency` in flight and report latency percentiles"""
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run_probe(endpoint, data, method):
+        async with semaphore:
+            return await test_endpoint(endpoint, data, method)
+
+    started = time.perf_counter()
+    test_results = await asyncio.gather(*(
+        run_probe(endpoint, data, method)
+        for _ in range(max(repeat, 1))
+        for endpoint, data, method, _ in PROBES
+    ))
+
+    route_samples: Dict[str, List[float]] = {}
+    upstream_samples: Dict[str, List[float]] = {}
+    probe_routes = {endpoint: route_name for endpoint, _, _, route_name in PROBES}
+    for result in test_results:
+        if result["status"] != "success":
+            continue
+        route_samples.setdefault(result["endpoint"], []).append(result["latency_ms"])
+        upstream = ROUTE_UPSTREAMS.get(probe_routes[result["endpoint"]], "unknown")
+        upstream_samples.setdefault(upstream, []).append(result["latency_ms"])
+
+    success_count = sum(1 for result in test_results if result["status"] == "success")
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "repeat": repeat,
+        "concurrency": concurrency,
+        "total_tests": len(test_results),
+        "successful_tests": success_count,
+        "failed_tests": len(test_results) - success_count,
+        "latency": {
+            "routes": {name: summarize_latencies(samples) for name, samples in route_samples.items()},
+            "upstreams": {name: summarize_latencies(samples) for name, samples in upstream_samples.items()},
+        },
+        "results": test_results
+    }
+
+
+class ProbeScheduler:
+    """Runs the probe suite in the background every PROBE_INTERVAL_SECONDS and keeps the last report."""
+
+    def __init__(self, interval: float = PROBE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.task: Optional[asyncio.Task] = None
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    async def start(self):
+        if self.interval > 0:
+            self.task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                report = await run_all_tests()
+                self.last_report = {key: value for key, value in report.items() if key != "results"}
+                log_metadata({
+                    "service": "api_gateway",
+                    "function": "scheduled_probes",
+                    "failed_tests": report["failed_tests"],
+                    "latency": report["latency"]["upstreams"],
+                    "status": "success"
+                })
+            except Exception as e:
+                log_metadata({
+                    "service": "api_gateway",
+                    "function": "scheduled_probes",
+                    "error": str(e),
+                    "status": "error"
+                })
+
+    def stats(self) -> Optional[Dict[str, Any]]:
+        return self.last_report
+
+
+probe_scheduler = ProbeScheduler()
@@ -4,10 +4,14 @@ from datetime import datetime, date, timedelta
 from app.services.financial_service import financial_service
 import uuid
 
+from app.config.settings import settings
 from app.schemas.financial import (
+    BatchStockDataRequest, BatchStockDataResponse, BatchStockDataResult,
     StockDataRequest, StockDataResponse, HealthResponse
 )
 from app.services.financial_service import financial_service
+from app.services.bar_store import bar_store
+from app.services.ohlcv_cache import ohlcv_cache
 from app.utils.logger import log_metadata
 
 router = APIRouter(prefix="/api", tags=["financial"])
@@ -31,6 +35,12 @@ async def health_check():
     )
 
 
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit, miss and eviction counters for the OHLCV cache, and bar store fetch counters"""
+    return {**ohlcv_cache.stats(), "bar_store": bar_store.stats()}
+
+
 @router.post("/stock/data", response_model=StockDataResponse)
 async def get_stock_data(
     request: StockDataRequest,
@@ -85,6 +95,8 @@ async def get_stock_data(
 
         if "rate limit" in str(e).lower():
             raise HTTPException(status_code=429, detail="Rate limit exceeded")
+        elif "invalid ticker" in str(e).lower():
+            raise HTTPException(status_code=400, detail=str(e))
         elif "no data found" in str(e).lower():
             raise HTTPException(
                 status_code=404, detail=f"No data found for ticker {request.ticker}")
@@ -93,6 +105,77 @@ async def get_stock_data(
                 status_code=500, detail="Internal server error")
 
 
+def error_status(error: Exception) -> int:
+    """HTTP status for a failed stock data fetch"""
+    if "rate limit" in str(error).lower():
+        return 429
+    if "invalid ticker" in str(error).lower():
+        return 400
+    if "no data found" in str(error).lower():
+        return 404
+    return 500
+
+
+@router.post("/stock/data/batch", response_model=BatchStockDataResponse)
+async def get_stock_data_batch(
+    request: BatchStockDataRequest,
+    user_id: str = Depends(get_user_id)
+):
+    """
+    Fetch historical stock price data for several tickers in one call
+
+    - **tickers**: Stock symbols (e.g., ["AAPL", "GOOGL", "CBA.AX"])
+    - **start_date**: Start date for data retrieval
+    - **end_date**: End date for data retrieval
+
+    Every ticker gets its own status: 200 with data, or 400/404/429/500 with an
+    error, so one bad symbol does not fail the rest.
+    """
+    if len(request.tickers) > settings.batch_max_tickers:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.batch_max_tickers} tickers per request"
+        )
+    if request.end_date > date.today():
+        raise HTTPException(
+            status_code=400,
+            detail="End date cannot be in the future"
+        )
+    if request.start_date >= request.end_date:
+        raise HTTPException(
+            status_code=400,
+            detail="Start date must be before end date"
+        )
+    if (request.end_date - request.start_date).days > 365:
+        raise HTTPException(
+            status_code=400,
+            detail="Date range cannot exceed 365 days"
+        )
+
+    try:
+        results, meta = await financial_service.get_stock_data_batch(request, user_id)
+    except Exception as e:
+        log_metadata({
+            "function": "api_stock_data_batch",
+            "user_id": user_id,
+            "tickers": request.tickers,
+            "status": "error",
+            "error": str(e)
+        })
+        raise HTTPException(status_code=error_status(e), detail=str(e))
+
+    return BatchStockDataResponse(
+        results=[
+            BatchStockDataResult(ticker=ticker, status=error_status(result), error=str(result))
+            if isinstance(result, Exception)
+            else BatchStockDataResult(ticker=ticker, status=200, data=result)
+            for ticker, result in results.items()
+        ],
+        meta=meta,
+        last_updated=datetime.utcnow()
+    )
+
+
 @router.get("/stock/latest/{ticker}")
 async def get_latest_stock_price(
     ticker: str,
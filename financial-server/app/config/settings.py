@@ -22,11 +22,21 @@ class Settings(BaseSettings):
     debug: bool = Field(default=False, env='DEBUG')
     log_level: str = Field(default="INFO", env='LOG_LEVEL')
     
-    # Cache Configuration (Commented out if not used)
-    # cache_type: str = "file"  # file or redis
-    # cache_ttl_seconds: int = 3600
-    # cache_dir: str = "./cache"
-    # redis_url: Optional[str] = None
+    # Cache Configuration
+    # memory, file (memory + local files), redis (memory + local files + Redis at redis_url) or none
+    cache_type: str = Field(default="file", env='CACHE_TYPE')
+    cache_ttl_seconds: int = Field(default=3600, env='CACHE_TTL_SECONDS')
+    # Ranges reaching the last closed session (or later) can still change, so they expire sooner
+    cache_recent_ttl_seconds: int = Field(default=60, env='CACHE_RECENT_TTL_SECONDS')
+    cache_dir: str = Field(default="./cache", env='CACHE_DIR')
+    redis_url: Optional[str] = Field(default=None, env='REDIS_URL')
+    cache_memory_max_bytes: int = Field(default=64 * 1024 * 1024, env='CACHE_MEMORY_MAX_BYTES')
+    # Daily bars up to the last session closed in this timezone are final and never refetched
+    market_timezone: str = Field(default="America/New_York", env='MARKET_TIMEZONE')
+    market_close_hour: int = Field(default=16, env='MARKET_CLOSE_HOUR')
+    market_close_minute: int = Field(default=30, env='MARKET_CLOSE_MINUTE')
+    # Most tickers accepted by one /api/stock/data/batch request
+    batch_max_tickers: int = Field(default=50, env='BATCH_MAX_TICKERS')
     
     # Rate Limiting
     yahoo_finance_rate_limit: int = Field(default=2000, env='YAHOO_FINANCE_RATE_LIMIT')
@@ -5,6 +5,7 @@ import uvicorn
 
 from app.config.settings import settings
 from app.api.financial import router as financial_router
+from app.services.ohlcv_cache import ohlcv_cache
 from app.utils.logger import setup_logging, log_metadata
 
 @asynccontextmanager
@@ -18,10 +19,12 @@ async def lifespan(app: FastAPI):
         "debug_mode": settings.debug,
         "mock_data": settings.mock_data_enabled
     })
+    await ohlcv_cache.start()
     
     yield
     
     # Shutdown
+    await ohlcv_cache.close()
     log_metadata({
         "function": "shutdown", 
         "status": "success"
@@ -33,6 +33,39 @@ class StockDataResponse(BaseModel):
     cache_hit: bool = False
     last_updated: datetime
 
+class BatchStockDataRequest(BaseModel):
+    tickers: List[str] = Field(..., min_length=1, description="Stock ticker symbols")
+    start_date: date = Field(..., description="Start date for data retrieval")
+    end_date: date = Field(..., description="End date for data retrieval")
+
+    @validator('tickers')
+    def validate_tickers(cls, v):
+        tickers = []
+        for ticker in v:
+            ticker = ticker.upper().strip()
+            if not 1 <= len(ticker) <= 10:
+                raise ValueError(f'invalid ticker: {ticker!r}')
+            if ticker not in tickers:
+                tickers.append(ticker)
+        return tickers
+
+    @validator('end_date')
+    def validate_date_range(cls, v, values):
+        if 'start_date' in values and v < values['start_date']:
+            raise ValueError('end_date must be after start_date')
+        return v
+
+class BatchStockDataResult(BaseModel):
+    ticker: str
+    status: int
+    data: Optional[StockDataResponse] = None
+    error: Optional[str] = None
+
+class BatchStockDataResponse(BaseModel):
+    results: List[BatchStockDataResult]
+    meta: Dict[str, Any] = {}
+    last_updated: datetime
+
 class HealthResponse(BaseModel):
     status: str
     timestamp: datetime
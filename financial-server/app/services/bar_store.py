@@ -0,0 +1,275 @@
+import asyncio
+import json
+import os
+import re
+import shutil
+from datetime import date, datetime, time, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from app.config.settings import settings
+
+# (date, open, high, low, close, volume)
+Bar = Tuple[date, float, float, float, float, int]
+Interval = Tuple[date, date]
+# Bars for a date range plus the dates of corporate actions (splits, dividends) among them
+Fetched = Tuple[List[Bar], List[date]]
+
+# Tickers name directories under the store, so only plain symbols (BHP.AX, ^GSPC, EURUSD=X) are allowed
+TICKER_PATTERN = re.compile(r"^[A-Z0-9.^=-]{1,10}$")
+
+COLUMNS = (
+    ("date", np.int32),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.int64),
+)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_epoch_day(day: date) -> int:
+    return day.toordinal() - EPOCH_ORDINAL
+
+
+def _to_columns(bars: List[Bar]) -> Dict[str, np.ndarray]:
+    values = list(zip(*bars))
+    columns = {"date": np.array([to_epoch_day(day) for day in values[0]], dtype=np.int32)}
+    for (name, dtype), column in zip(COLUMNS[1:], values[1:]):
+        columns[name] = np.array(column, dtype=dtype)
+    return columns
+
+
+def to_bars(columns: Dict[str, np.ndarray]) -> List[Bar]:
+    """Column slices back to (date, open, high, low, close, volume) rows"""
+    days = [date.fromordinal(EPOCH_ORDINAL + day) for day in columns["date"].tolist()]
+    return list(zip(days, *(columns[name].tolist() for name, _ in COLUMNS[1:])))
+
+
+def last_closed_session(now: Optional[datetime] = None) -> date:
+    """Most recent trading day whose session has closed (weekends skipped, holidays not)"""
+    now = now or datetime.now(ZoneInfo(settings.market_timezone))
+    day = now.date()
+    close = time(settings.market_close_hour, settings.market_close_minute)
+    if now.time() < close:
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+def check_ticker(ticker: str):
+    """Reject symbols that could escape the store directory (ValueError)"""
+    if not TICKER_PATTERN.fullmatch(ticker) or ".." in ticker:
+        raise ValueError(f"Invalid ticker symbol: {ticker!r}")
+
+
+def missing_intervals(covered: List[Interval], start: date, end: date) -> List[Interval]:
+    """Parts of [start, end] (inclusive) not inside any covered interval"""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start - timedelta(days=1)))
+        cursor = max(cursor, covered_end + timedelta(days=1))
+        if cursor > end:
+            break
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def add_interval(covered: List[Interval], start: date, end: date) -> List[Interval]:
+    """Insert [start, end] and merge overlapping or adjacent intervals"""
+    merged: List[Interval] = []
+    for interval in sorted(covered + [(start, end)]):
+        if merged and interval[0] <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], interval[1]))
+        else:
+            merged.append(interval)
+    return merged
+
+
+class TickerColumns:
+    """One ticker's bars as append-only column files, memory-mapped for reads.
+
+    Dates are int32 days since 1970-01-01 and sorted, so a date range maps
+    to a row range by binary search and every column is sliced without
+    copying. New bars after the last stored date are appended in place;
+    anything else (backfills, replacing unsettled bars) rewrites the
+    columns into new files, so pages already mapped by readers stay valid.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.covered: List[Interval] = []
+        self.columns: Dict[str, np.ndarray] = {}
+        self.rows = 0
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def load(self):
+        try:
+            with open(os.path.join(self.directory, "coverage.json"), "r") as f:
+                self.covered = [(date.fromisoformat(start), date.fromisoformat(end)) for start, end in json.load(f)]
+        except FileNotFoundError:
+            self.covered = []
+        self._map()
+
+    def _map(self):
+        date_path = self._path("date")
+        self.rows = os.path.getsize(date_path) // 4 if os.path.exists(date_path) else 0
+        self.columns = {
+            name: np.memmap(self._path(name), dtype=dtype, mode="r", shape=(self.rows,))
+            if self.rows else np.empty(0, dtype=dtype)
+            for name, dtype in COLUMNS
+        }
+
+    def adjusted_before(self, actions: List[date]) -> bool:
+        """Whether stored bars predate one of these corporate actions, so their adjusted prices are stale"""
+        return bool(self.rows) and any(to_epoch_day(day) > self.columns["date"][0] for day in actions)
+
+    def clear(self):
+        """Drop every stored bar and the coverage record (blocking)"""
+        self.columns = {}
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.covered = []
+        self._map()
+
+    def slice(self, start: date, end: date) -> Dict[str, np.ndarray]:
+        dates = self.columns["date"]
+        low = int(np.searchsorted(dates, to_epoch_day(start), side="left"))
+        high = int(np.searchsorted(dates, to_epoch_day(end), side="right"))
+        return {name: column[low:high] for name, column in self.columns.items()}
+
+    def write(self, bars: List[Bar], covered: List[Interval]):
+        """Merge bars into the column files and record the covered intervals (blocking)"""
+        os.makedirs(self.directory, exist_ok=True)
+        # Unmapped while writing (_write_bars drops the last references before touching the files):
+        # Windows cannot truncate or replace a file that is still mapped
+        mapped, self.columns = self.columns, {}
+        try:
+            if bars:
+                self._write_bars(_to_columns(sorted(bars)), mapped)
+            tmp_path = os.path.join(self.directory, f"coverage.json.{os.getpid()}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump([[str(start), str(end)] for start, end in covered], f)
+            os.replace(tmp_path, os.path.join(self.directory, "coverage.json"))
+            self.covered = covered
+        finally:
+            self._map()
+
+    def _write_bars(self, new: Dict[str, np.ndarray], mapped: Dict[str, np.ndarray]):
+        if not self.rows or new["date"][0] > mapped["date"][-1]:
+            mapped.clear()
+            # Each column is first cut back to the committed row count, so bytes left by an append
+            # that failed part way are overwritten instead of shifting every later row; the date
+            # column goes last, so a partial append never shows rows missing from the others
+            for name, dtype in reversed(COLUMNS):
+                with open(self._path(name), "ab") as f:
+                    f.truncate(self.rows * np.dtype(dtype).itemsize)
+                    f.write(new[name].tobytes())
+            return
+        old = {name: np.array(column) for name, column in mapped.items()}
+        mapped.clear()
+        keep = ~np.isin(old["date"], new["date"])
+        order = np.argsort(np.concatenate([old["date"][keep], new["date"]]), kind="stable")
+        tmp_paths = {}
+        for name, _ in COLUMNS:
+            tmp_paths[name] = f"{self._path(name)}.{os.getpid()}.tmp"
+            np.concatenate([old[name][keep], new[name]])[order].tofile(tmp_paths[name])
+        # Swapped in only once every column is written, date last as for appends
+        for name, _ in reversed(COLUMNS):
+            os.replace(tmp_paths[name], self._path(name))
+
+
+class BarStore:
+    """Canonical per-ticker daily bar store that only fetches what it does not have.
+
+    A request is split into the date intervals not yet covered, only those
+    are fetched and the result is merged in. Intervals up to the last closed
+    trading session never change, so they are recorded as covered and never
+    fetched again; anything later (the session still trading) is refetched
+    every time. Prices are split and dividend adjusted, so a fetch that
+    reports a corporate action after stored bars drops the ticker's store and
+    refetches the range. Bars live in memory-mapped column files, so resident
+    memory does not grow with the number of tickers or the length of their history.
+    """
+
+    def __init__(self):
+        self.store_dir = os.path.join(settings.cache_dir, "bars")
+        self.tickers: Dict[str, TickerColumns] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.counters = {"requests": 0, "fully_covered": 0, "gap_fetches": 0, "days_requested": 0, "days_fetched": 0,
+                         "invalidations": 0}
+
+    async def _columns(self, ticker: str) -> TickerColumns:
+        check_ticker(ticker)
+        columns = self.tickers.get(ticker)
+        if columns is None:
+            columns = TickerColumns(os.path.join(self.store_dir, ticker))
+            await asyncio.to_thread(columns.load)
+            self.tickers[ticker] = columns
+        return columns
+
+    async def missing(self, ticker: str, start: date, end: date) -> List[Interval]:
+        """Intervals of [start, end] a get_range call would currently have to fetch"""
+        return missing_intervals((await self._columns(ticker)).covered, start, end)
+
+    async def get_range(self, ticker: str, start: date, end: date,
+                        fetch: Callable[[date, date], Awaitable[Fetched]]) -> Dict[str, np.ndarray]:
+        """Column slices for [start, end] (inclusive), fetching only the uncovered intervals"""
+        check_ticker(ticker)
+        lock = self.locks.setdefault(ticker, asyncio.Lock())
+        # One request per ticker fills gaps at a time; the next one finds them covered
+        async with lock:
+            columns = await self._columns(ticker)
+
+            self.counters["requests"] += 1
+            self.counters["days_requested"] += (end - start).days + 1
+            gaps = missing_intervals(columns.covered, start, end)
+            if not gaps:
+                self.counters["fully_covered"] += 1
+
+            closed_through = last_closed_session()
+            fetched: List[Bar] = []
+            covered = columns.covered
+            while gaps:
+                gap_start, gap_end = gaps.pop(0)
+                bars, actions = await fetch(gap_start, gap_end)
+                self.counters["gap_fetches"] += 1
+                self.counters["days_fetched"] += (gap_end - gap_start).days + 1
+                if columns.adjusted_before(actions):
+                    # Stored prices were adjusted without this split or dividend; start over with the whole range
+                    self.counters["invalidations"] += 1
+                    await asyncio.to_thread(columns.clear)
+                    fetched, covered = [], []
+                    gaps = [(start, end)]
+                    continue
+                fetched.extend(bars)
+                # An empty answer for an unknown ticker is not proof the dates have no bars
+                if gap_start <= closed_through and (fetched or columns.rows):
+                    covered = add_interval(covered, gap_start, min(gap_end, closed_through))
+
+            if fetched or covered != columns.covered:
+                await asyncio.to_thread(columns.write, fetched, covered)
+            return columns.slice(start, end)
+
+    def stats(self) -> Dict:
+        return {
+            "tickers_loaded": len(self.tickers),
+            "rows_mapped": sum(columns.rows for columns in self.tickers.values()),
+            **self.counters
+        }
+
+
+# Global bar store instance
+bar_store = BarStore()
@@ -1,6 +1,6 @@
 import yfinance as yf
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional, Dict, Any, Tuple, Union
+from datetime import date, datetime, timedelta
 import asyncio
 from decimal import Decimal
 import firebase_admin
@@ -9,9 +9,11 @@ import json  # Added for JSON parsing
 
 from app.config.settings import settings
 from app.services import nlp_integration
+from app.services.bar_store import Fetched, bar_store, to_bars
+from app.services.ohlcv_cache import ohlcv_cache
 from app.services.rate_limiter import rate_limiter
 from app.schemas.financial import (
-    StockDataRequest, StockDataResponse, StockPrice
+    BatchStockDataRequest, StockDataRequest, StockDataResponse, StockPrice
 )
 from app.utils.logger import log_metadata
 
@@ -42,8 +44,109 @@ class FinancialService:
     def __init__(self):
         pass
 
+    @staticmethod
+    def _frame_bars(hist_data) -> Fetched:
+        """Rows of a Yahoo Finance OHLCV frame as bars, skipping days without prices,
+        plus the days with a dividend or stock split"""
+        actions = [name for name in ('Dividends', 'Stock Splits') if name in hist_data.columns]
+        action_days = [
+            day.date() for day in hist_data.index[hist_data[actions].fillna(0).ne(0).any(axis=1)]
+        ] if actions else []
+        hist_data = hist_data.dropna(subset=['Open', 'High', 'Low', 'Close']).fillna({'Volume': 0})
+        bars = [
+            (day.date(), float(row['Open']), float(row['High']), float(row['Low']),
+             float(row['Close']), int(row['Volume']))
+            for day, row in hist_data.iterrows()
+        ]
+        return bars, action_days
+
+    def _fetch_bars(self, ticker: str, start_date: Optional[date] = None,
+                    end_date: Optional[date] = None, period: Optional[str] = None) -> Fetched:
+        """Fetch daily bars from Yahoo Finance (blocking; run in a worker thread)"""
+        # Check rate limits
+        if not rate_limiter.can_make_request("yahoo_finance"):
+            raise Exception("Rate limit exceeded for Yahoo Finance API")
+
+        if period:
+            hist_data = yf.Ticker(ticker).history(period=period)
+        else:
+            hist_data = yf.Ticker(ticker).history(
+                start=start_date,
+                end=end_date + timedelta(days=1)  # Include end date
+            )
+        return self._frame_bars(hist_data)
+
+    def _download_bars(self, tickers: List[str], start_date: date, end_date: date) -> Dict[str, Fetched]:
+        """Fetch daily bars for several tickers in one Yahoo Finance download (blocking; run in a worker thread)"""
+        if not rate_limiter.can_make_request("yahoo_finance"):
+            raise Exception("Rate limit exceeded for Yahoo Finance API")
+
+        hist_data = yf.download(
+            tickers,
+            start=start_date,
+            end=end_date + timedelta(days=1),  # Include end date
+            group_by="ticker",
+            threads=True,
+            auto_adjust=True,  # Same adjusted prices as Ticker.history
+            actions=True,  # Dividends and splits, so the bar store can drop stale adjusted history
+            progress=False
+        )
+        bars = {}
+        for ticker in tickers:
+            if hist_data.columns.nlevels == 1:
+                bars[ticker] = self._frame_bars(hist_data)
+            elif ticker in hist_data.columns.get_level_values(0):
+                bars[ticker] = self._frame_bars(hist_data[ticker])
+            else:
+                bars[ticker] = ([], [])
+        return bars
+
+    def _fetch_info(self, ticker: str) -> Dict[str, Any]:
+        """Current Yahoo Finance snapshot for one ticker (blocking; run in a worker thread)"""
+        if not rate_limiter.can_make_request("yahoo_finance"):
+            raise Exception("Rate limit exceeded for Yahoo Finance API")
+        return yf.Ticker(ticker).info
+
+    async def _load_stock_data(self, request: StockDataRequest,
+                               fetch: Optional[Callable[[date, date], Awaitable[Fetched]]] = None,
+                               fallback: bool = True) -> Dict[str, Any]:
+        """Assemble a response from the bar store, fetching only the dates it lacks"""
+        if fetch is None:
+            def fetch(start, end):
+                return asyncio.to_thread(self._fetch_bars, request.ticker, start, end)
+        bars = to_bars(await bar_store.get_range(request.ticker, request.start_date, request.end_date, fetch))
+
+        if not bars and fallback:
+            # Fallback: Try shorter period
+            bars, _ = await asyncio.to_thread(self._fetch_bars, request.ticker, period="1mo")
+        if not bars:
+            raise Exception(
+                f"No data found for ticker {request.ticker} - check symbol or dates")
+
+        # Convert to our schema
+        prices = [
+            StockPrice(date=day, open=open_, high=high, low=low, close=close, volume=volume)
+            for day, open_, high, low, close, volume in bars
+        ]
+
+        return {
+            "ticker": request.ticker,
+            "prices": [price.dict() for price in prices],
+            "meta": {"source": "yahoo_finance"},
+            "cache_hit": False,
+            "last_updated": datetime.utcnow()
+        }
+
+    @staticmethod
+    def _cached_response(response_data: Dict[str, Any], cache_tier: Optional[str]) -> StockDataResponse:
+        # Coalesced requests shared a live fetch rather than reading the cache
+        response_data["cache_hit"] = cache_tier not in (None, "coalesced")
+        if cache_tier is not None:
+            response_data["meta"] = {**response_data.get("meta", {}), "cache_tier": cache_tier}
+        return StockDataResponse(**response_data)
+
     async def get_stock_data(self, request: StockDataRequest, user_id: str = "anonymous") -> StockDataResponse:
-        """Fetch stock price data with rate limiting (no caching)"""
+        """Fetch stock price data through the OHLCV cache and bar store, with rate limiting on fetches"""
         start_time = datetime.utcnow()
 
         try:
@@ -54,43 +157,11 @@ class FinancialService:
             if request.start_date >= request.end_date:
                 raise Exception("Start date must be before end date")
 
-            # Check rate limits
-            if not rate_limiter.can_make_request("yahoo_finance"):
-                raise Exception("Rate limit exceeded for Yahoo Finance API")
-
-            # Fetch real data from Yahoo Finance with fallback
-            ticker = yf.Ticker(request.ticker)
-            hist_data = ticker.history(
-                start=request.start_date,
-                end=request.end_date + timedelta(days=1)  # Include end date
+            key = ohlcv_cache.key(request.ticker, request.start_date, request.end_date)
+            response_data, cache_tier = await ohlcv_cache.get_or_fetch(
+                key, lambda: self._load_stock_data(request), ttl=ohlcv_cache.ttl_for(request.end_date)
             )
-            
-            if hist_data.empty:
-                # Fallback: Try shorter period
-                hist_data = ticker.history(period="1mo")
-                if hist_data.empty:
-                    raise Exception(
-                        f"No data found for ticker {request.ticker} - check symbol or dates")
-
-            # Convert to our schema
-            prices = []
-            for date, row in hist_data.iterrows():
-                prices.append(StockPrice(
-                    date=date.date(),
-                    open=row['Open'],
-                    high=row['High'],
-                    low=row['Low'],
-                    close=row['Close'],
-                    volume=int(row['Volume'])
-                ))
-
-            response_data = {
-                "ticker": request.ticker,
-                "prices": [price.dict() for price in prices],
-                "meta": {"source": "yahoo_finance"},
-                "cache_hit": False,
-                "last_updated": datetime.utcnow()
-            }
+            result = self._cached_response(response_data, cache_tier)
 
             # NLP integration (as before)...
 
@@ -102,10 +173,11 @@ class FinancialService:
                 "ticker": request.ticker,
                 "status": "success",
                 "duration_ms": duration_ms,
-                "api_source": "yahoo_finance"
+                "api_source": "yahoo_finance",
+                "cache_tier": cache_tier
             })
 
-            return StockDataResponse(**response_data)
+            return result
 
         except Exception as e:
             duration_ms = (datetime.utcnow() -
@@ -120,6 +192,91 @@ class FinancialService:
             })
             raise
 
+    async def get_stock_data_batch(self, request: BatchStockDataRequest, user_id: str = "anonymous"
+                                   ) -> Tuple[Dict[str, Union[StockDataResponse, Exception]], Dict[str, Any]]:
+        """Fetch price data for several tickers with at most one bulk Yahoo Finance download.
+
+        Tickers answered by the OHLCV cache are returned from it. For the rest,
+        the dates missing from the bar store are downloaded for all of them
+        together, and each ticker's response is then assembled and cached as
+        get_stock_data would. Failures are returned per ticker, not raised.
+        """
+        start_time = datetime.utcnow()
+        end_date = min(request.end_date, start_time.date())
+        if request.start_date >= end_date:
+            raise Exception("Start date must be before end date")
+
+        requests = {
+            ticker: StockDataRequest(ticker=ticker, start_date=request.start_date, end_date=end_date)
+            for ticker in request.tickers
+        }
+        keys = {ticker: ohlcv_cache.key(ticker, request.start_date, end_date) for ticker in request.tickers}
+
+        results: Dict[str, Union[StockDataResponse, Exception]] = {}
+        for ticker in request.tickers:
+            response_data, cache_tier = await ohlcv_cache.get(keys[ticker])
+            if response_data is not None:
+                results[ticker] = self._cached_response(response_data, cache_tier)
+        pending = [ticker for ticker in request.tickers if ticker not in results]
+
+        gaps = {}
+        for ticker in pending:
+            try:
+                intervals = await bar_store.missing(ticker, request.start_date, end_date)
+            except ValueError as e:
+                results[ticker] = e
+                continue
+            if intervals:
+                gaps[ticker] = intervals
+        pending = [ticker for ticker in pending if ticker not in results]
+        downloaded: Dict[str, Fetched] = {}
+        if gaps:
+            window_start = min(intervals[0][0] for intervals in gaps.values())
+            window_end = max(intervals[-1][1] for intervals in gaps.values())
+            try:
+                downloaded = await asyncio.to_thread(self._download_bars, list(gaps), window_start, window_end)
+            except Exception as e:
+                for ticker in gaps:
+                    results[ticker] = e
+                pending = [ticker for ticker in pending if ticker not in gaps]
+
+        async def fetch_downloaded(ticker: str, start: date, end: date) -> Fetched:
+            bars, actions = downloaded.get(ticker, ([], []))
+            if ticker not in downloaded or start < window_start or end > window_end:
+                # Coverage changed since the download was planned (or was dropped after a split or dividend)
+                return await asyncio.to_thread(self._fetch_bars, ticker, start, end)
+            return [bar for bar in bars if start <= bar[0] <= end], [day for day in actions if start <= day <= end]
+
+        async def load(ticker: str) -> StockDataResponse:
+            response_data, cache_tier = await ohlcv_cache.get_or_fetch(
+                keys[ticker],
+                lambda: self._load_stock_data(
+                    requests[ticker], lambda start, end: fetch_downloaded(ticker, start, end), fallback=False
+                ),
+                ttl=ohlcv_cache.ttl_for(end_date)
+            )
+            return self._cached_response(response_data, cache_tier)
+
+        loaded = await asyncio.gather(*(load(ticker) for ticker in pending), return_exceptions=True)
+        results.update(zip(pending, loaded))
+
+        meta = {
+            "source": "yahoo_finance",
+            "requested": len(request.tickers),
+            "cached": sum(isinstance(result, StockDataResponse) and result.cache_hit for result in results.values()),
+            "downloaded": len(downloaded),
+            "upstream_calls": 1 if gaps else 0,
+            "errors": sum(isinstance(result, Exception) for result in results.values())
+        }
+        log_metadata({
+            "function": "get_stock_data_batch",
+            "user_id": user_id,
+            "status": "success",
+            "duration_ms": (datetime.utcnow() - start_time).total_seconds() * 1000,
+            **meta
+        })
+        return {ticker: results[ticker] for ticker in request.tickers}, meta
+
     async def get_user_portfolio_data(self, user_id: str) -> Dict[str, Any]:
         """Fetch user's portfolio from Firestore, enrich stock holdings with yfinance data"""
         try:
@@ -143,6 +300,28 @@ class FinancialService:
                 'userId', '==', user_id).stream()
             holdings = [h.to_dict() for h in holdings_snap]
 
+            # Latest closes for every stock holding in one download (a week back covers weekends and
+            # holidays); .info has no bulk equivalent, so the snapshots are fetched concurrently
+            symbols = list(dict.fromkeys(h['symbol'] for h in holdings if h['assetType'] == 'stock'))
+            latest: Dict[str, Fetched] = {}
+            infos: Dict[str, Union[Dict[str, Any], BaseException]] = {}
+            if symbols:
+                today = datetime.utcnow().date()
+                try:
+                    latest = await asyncio.to_thread(
+                        self._download_bars, symbols, today - timedelta(days=7), today)
+                except Exception as yf_err:
+                    if "rate limit" in str(yf_err).lower():
+                        raise
+                    log_metadata({"function": "get_user_portfolio_data", "status": "error",
+                                 "message": f"yfinance download failed for {symbols}: {yf_err}"})
+                snapshots = await asyncio.gather(
+                    *(asyncio.to_thread(self._fetch_info, symbol) for symbol in symbols), return_exceptions=True)
+                infos = dict(zip(symbols, snapshots))
+                for info in snapshots:
+                    if isinstance(info, Exception) and "rate limit" in str(info).lower():
+                        raise info
+
             enriched_holdings = []
             total_value = 0.0
 
@@ -155,50 +334,42 @@ class FinancialService:
                     continue
 
                 symbol = holding['symbol']
-
-                # Rate limit check
-                if not rate_limiter.can_make_request("yahoo_finance"):
-                    raise Exception(
-                        "Rate limit exceeded for Yahoo Finance API")
-
-                # Fetch from yfinance with error handling
-                try:
-                    ticker = yf.Ticker(symbol)
-                    info = ticker.info  # Current snapshot
-                    hist = ticker.history(period="1d")  # Latest day for price
-
-                    if hist.empty:
-                        log_metadata({"function": "get_user_portfolio_data", "status": "warning",
-                                     "message": f"No data for {symbol} - using stored price"})
-                        # Fallback to stored value
-                        latest_close = holding['currentPrice']
-                    else:
-                        latest_close = hist['Close'][-1]
-
-                    current_value = holding['quantity'] * latest_close
-
-                    enriched_holding = {
-                        **holding,
-                        "currentPrice": latest_close,
-                        "currentValue": current_value,
-                        "marketCap": info.get('marketCap'),
-                        "volume": info.get('volume'),
-                        "fiftyTwoWeekHigh": info.get('fiftyTwoWeekHigh'),
-                        "fiftyTwoWeekLow": info.get('fiftyTwoWeekLow'),
-                        "dividendYield": info.get('dividendYield'),
-                        "peRatio": info.get('trailingPE'),
-                        "updatedAt": datetime.utcnow().isoformat()
-                    }
-
-                    enriched_holdings.append(enriched_holding)
-                    total_value += current_value
-                except Exception as yf_err:
+                info = infos[symbol]
+                if isinstance(info, BaseException):
                     log_metadata({"function": "get_user_portfolio_data", "status": "error",
-                                 "message": f"yfinance failed for {symbol}: {yf_err}"})
+                                 "message": f"yfinance failed for {symbol}: {info}"})
                     # Fallback: Use stored values without enrichment
                     enriched_holdings.append(holding)
                     total_value += holding['quantity'] * \
                         holding['currentPrice']
+                    continue
+
+                bars, _ = latest.get(symbol, ([], []))
+                if not bars:
+                    log_metadata({"function": "get_user_portfolio_data", "status": "warning",
+                                 "message": f"No data for {symbol} - using stored price"})
+                    # Fallback to stored value
+                    latest_close = holding['currentPrice']
+                else:
+                    latest_close = bars[-1][4]
+
+                current_value = holding['quantity'] * latest_close
+
+                enriched_holding = {
+                    **holding,
+                    "currentPrice": latest_close,
+                    "currentValue": current_value,
+                    "marketCap": info.get('marketCap'),
+                    "volume": info.get('volume'),
+                    "fiftyTwoWeekHigh": info.get('fiftyTwoWeekHigh'),
+                    "fiftyTwoWeekLow": info.get('fiftyTwoWeekLow'),
+                    "dividendYield": info.get('dividendYield'),
+                    "peRatio": info.get('trailingPE'),
+                    "updatedAt": datetime.utcnow().isoformat()
+                }
+
+                enriched_holdings.append(enriched_holding)
+                total_value += current_value
 
             response = {
                 "user": user_data,
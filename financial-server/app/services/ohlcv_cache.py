@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.config.settings import settings
+from app.services.bar_store import last_closed_session
+from app.utils.logger import log_metadata
+
+TIERS = ("memory", "file", "redis")
+
+
+class OHLCVCache:
+    """Multi-tier cache for stock price responses, keyed by ticker and date range.
+
+    Lookups go memory -> local files -> Redis, and a hit in a lower tier is
+    copied into the tiers above it. The memory tier is an LRU bounded by the
+    size of the serialized entries. Concurrent misses for the same key share
+    a single fetch.
+    """
+
+    def __init__(self):
+        self.enabled = settings.cache_type != "none"
+        self.use_files = settings.cache_type in ("file", "redis")
+        self.ttl = settings.cache_ttl_seconds
+        self.recent_ttl = settings.cache_recent_ttl_seconds
+        self.cache_dir = settings.cache_dir
+        self.max_bytes = settings.cache_memory_max_bytes
+        self.memory: "OrderedDict[str, Tuple[datetime, bytes]]" = OrderedDict()
+        self.memory_bytes = 0
+        self.redis = None
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.counters = {
+            **{f"{tier}_hits": 0 for tier in TIERS},
+            "misses": 0, "coalesced": 0, "evictions": 0, "expired": 0, "errors": 0
+        }
+
+    async def start(self):
+        """Create the cache directory and connect to Redis when configured"""
+        if self.use_files:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        if settings.cache_type == "redis" and settings.redis_url:
+            try:
+                import redis.asyncio as aioredis
+                self.redis = aioredis.from_url(settings.redis_url)
+                await self.redis.ping()
+            except Exception as e:
+                self.redis = None
+                log_metadata({"function": "ohlcv_cache_start", "status": "error", "error": str(e)})
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+
+    @staticmethod
+    def key(ticker: str, start_date: date, end_date: date) -> str:
+        return hashlib.md5(f"stock_data:{ticker}:{start_date}:{end_date}".encode()).hexdigest()
+
+    def ttl_for(self, end_date: date) -> int:
+        """Seconds to keep a range: short while its last bar may still be revised, else the full TTL"""
+        return self.recent_ttl if end_date >= last_closed_session() else self.ttl
+
+    # Memory tier
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        entry = self.memory.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at <= datetime.utcnow():
+            self._memory_drop(key)
+            self.counters["expired"] += 1
+            return None
+        self.memory.move_to_end(key)
+        return payload
+
+    def _memory_drop(self, key: str):
+        _, payload = self.memory.pop(key)
+        self.memory_bytes -= len(payload)
+
+    def _memory_set(self, key: str, payload: bytes, expires_at: datetime):
+        if len(payload) > self.max_bytes:
+            return
+        if key in self.memory:
+            self._memory_drop(key)
+        self.memory[key] = (expires_at, payload)
+        self.memory_bytes += len(payload)
+        while self.memory_bytes > self.max_bytes:
+            self._memory_drop(next(iter(self.memory)))
+            self.counters["evictions"] += 1
+
+    # File tier (same {"value", "expires_at", "created_at"} layout as the existing cache/ files)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _file_get(self, key: str) -> Optional[Tuple[bytes, datetime]]:
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        expires_at = datetime.fromisoformat(entry["expires_at"])
+        if expires_at <= datetime.utcnow():
+            os.remove(path)
+            self.counters["expired"] += 1
+            return None
+        return json.dumps(entry["value"]).encode(), expires_at
+
+    def _file_set(self, key: str, payload: bytes, expires_at: datetime):
+        entry = {
+            "value": json.loads(payload),
+            "expires_at": expires_at.isoformat(),
+            "created_at": datetime.utcnow().isoformat()
+        }
+        # Write then rename so readers never see a partial file
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._path(key))
+
+    # Lookup
+
+    async def _lookup(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        payload = self._memory_get(key)
+        if payload is not None:
+            return payload, "memory"
+        try:
+            if self.use_files:
+                found = await asyncio.to_thread(self._file_get, key)
+                if found is not None:
+                    payload, expires_at = found
+                    self._memory_set(key, payload, expires_at)
+                    return payload, "file"
+            if self.redis is not None:
+                payload = await self.redis.get(f"financial:{key}")
+                ttl = await self.redis.ttl(f"financial:{key}") if payload is not None else -2
+                if payload is not None and ttl > 0:
+                    expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+                    self._memory_set(key, payload, expires_at)
+                    if self.use_files:
+                        await asyncio.to_thread(self._file_set, key, payload, expires_at)
+                    return payload, "redis"
+        except Exception as e:
+            # A broken lower tier degrades to a miss rather than failing the request
+            self.counters["errors"] += 1
+            log_metadata({"function": "ohlcv_cache_get", "status": "error", "error": str(e)})
+        return None, None
+
+    async def _store(self, key: str, payload: bytes, ttl: int):
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        self._memory_set(key, payload, expires_at)
+        try:
+            if self.use_files:
+                await asyncio.to_thread(self._file_set, key, payload, expires_at)
+            if self.redis is not None:
+                await self.redis.set(f"financial:{key}", payload, ex=ttl)
+        except Exception as e:
+            self.counters["errors"] += 1
+            log_metadata({"function": "ohlcv_cache_set", "status": "error", "error": str(e)})
+
+    async def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Return the cached value for key and the tier that answered, without fetching on a miss"""
+        if not self.enabled:
+            return None, None
+        payload, tier = await self._lookup(key)
+        if payload is None:
+            return None, None
+        self.counters[f"{tier}_hits"] += 1
+        return json.loads(payload), tier
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]],
+                           ttl: Optional[int] = None) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Return the cached value for key, or fetch, store and return it.
+
+        The second item is the tier that answered ("memory", "file", "redis"
+        or "coalesced" for a request that shared another's fetch), or None
+        when this call fetched the value itself.
+        """
+        if not self.enabled:
+            return await fetch(), None
+
+        value, tier = await self.get(key)
+        if value is not None:
+            return value, tier
+
+        task = self.inflight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+            return json.loads(await asyncio.shield(task)), "coalesced"
+
+        self.counters["misses"] += 1
+        # Shielded so a caller that goes away does not cancel the fetch for the others
+        task = asyncio.ensure_future(self._fill(key, fetch, ttl or self.ttl))
+        self.inflight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return json.loads(await asyncio.shield(task)), None
+
+    async def _fill(self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]], ttl: int) -> bytes:
+        payload = json.dumps(await fetch(), default=str).encode()
+        await self._store(key, payload, ttl)
+        return payload
+
+    def _finish(self, key: str, task: asyncio.Future):
+        self.inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = sum(self.counters[f"{tier}_hits"] for tier in TIERS) + self.counters["misses"]
+        hits = lookups - self.counters["misses"]
+        return {
+            "cache_type": settings.cache_type,
+            "redis_connected": self.redis is not None,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory_bytes,
+            "memory_max_bytes": self.max_bytes,
+            **self.counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# Global cache instance
+ohlcv_cache = OHLCVCache()
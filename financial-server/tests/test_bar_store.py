@@ -0,0 +1,80 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+from app.services.bar_store import BarStore, add_interval, check_ticker, missing_intervals, to_bars
+
+D = date(2024, 3, 1)
+
+
+def day(offset: int) -> date:
+    return D + timedelta(days=offset)
+
+
+def test_missing_intervals():
+    covered = [(day(0), day(4)), (day(10), day(14))]
+    assert missing_intervals([], day(0), day(3)) == [(day(0), day(3))]
+    assert missing_intervals(covered, day(1), day(3)) == []
+    assert missing_intervals(covered, day(2), day(12)) == [(day(5), day(9))]
+    assert missing_intervals(covered, day(-2), day(20)) == [(day(-2), day(-1)), (day(5), day(9)), (day(15), day(20))]
+    assert missing_intervals(covered, day(15), day(16)) == [(day(15), day(16))]
+
+
+def test_add_interval_merges_overlapping_and_adjacent():
+    covered = [(day(0), day(4)), (day(10), day(14))]
+    assert add_interval(covered, day(5), day(9)) == [(day(0), day(14))]
+    assert add_interval(covered, day(3), day(6)) == [(day(0), day(6)), (day(10), day(14))]
+    assert add_interval(covered, day(16), day(17)) == covered + [(day(16), day(17))]
+    assert add_interval([], day(1), day(1)) == [(day(1), day(1))]
+
+
+def test_check_ticker_rejects_path_components():
+    for ticker in ("BHP.AX", "^GSPC", "EURUSD=X", "BRK-B"):
+        check_ticker(ticker)
+    for ticker in ("..", "A..B", "../ETC", "A/B", "bhp", "", "ABCDEFGHIJK", "BHP\n"):
+        with pytest.raises(ValueError, match="Invalid ticker"):
+            check_ticker(ticker)
+
+
+def bar(offset: int, close: float):
+    return (day(offset), close, close, close, close, 100)
+
+
+def test_corporate_action_drops_stale_adjusted_bars(tmp_path):
+    store = BarStore()
+    store.store_dir = str(tmp_path)
+    calls = []
+
+    def fetcher(close: float, actions=()):
+        async def fetch(start, end):
+            calls.append((start, end))
+            offsets = range((start - D).days, (end - D).days + 1)
+            return [bar(offset, close) for offset in offsets], [day(offset) for offset in actions]
+        return fetch
+
+    first = to_bars(asyncio.run(store.get_range("XYZ", day(0), day(4), fetcher(10.0))))
+    assert [row[4] for row in first] == [10.0] * 5
+
+    # A split on day 6 rescales everything before it: the store is dropped and the whole range refetched
+    rows = to_bars(asyncio.run(store.get_range("XYZ", day(0), day(7), fetcher(5.0, actions=[6]))))
+    assert calls[1:] == [(day(5), day(7)), (day(0), day(7))]
+    assert [row[4] for row in rows] == [5.0] * 8
+    assert store.counters["invalidations"] == 1
+
+
+def test_append_after_partial_write_keeps_columns_aligned(tmp_path):
+    store = BarStore()
+    store.store_dir = str(tmp_path)
+
+    async def fetch(start, end):
+        offsets = range((start - D).days, (end - D).days + 1)
+        return [bar(offset, float(offset)) for offset in offsets], []
+
+    asyncio.run(store.get_range("XYZ", day(0), day(2), fetch))
+    # An append that died after writing part of the close column but before the date column
+    with open(tmp_path / "XYZ" / "close.bin", "ab") as f:
+        f.write(b"\x00" * 12)
+
+    rows = to_bars(asyncio.run(store.get_range("XYZ", day(0), day(5), fetch)))
+    assert [(row[0], row[4]) for row in rows] == [(day(offset), float(offset)) for offset in range(6)]
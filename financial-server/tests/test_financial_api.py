@@ -52,6 +52,18 @@ def test_future_date_validation():
     response = client.post("/api/stock/data", json=payload)
     assert response.status_code == 400
 
+def test_batch_date_order_validation():
+    """Test that a batch with start date after end date is rejected"""
+    payload = {
+        "tickers": ["AAPL", "MSFT"],
+        "start_date": str(date.today() - timedelta(days=1)),
+        "end_date": str(date.today() - timedelta(days=30))
+    }
+
+    response = client.post("/api/stock/data/batch", json=payload)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Start date must be before end date"
+
 def test_news_endpoint():
     """Test news retrieval"""
     payload = {
@@ -0,0 +1,74 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.services.bar_store import last_closed_session
+from app.services.ohlcv_cache import OHLCVCache
+
+
+@pytest.fixture
+def cache():
+    cache = OHLCVCache()
+    # Memory tier only, so the tests touch neither cache/ nor Redis
+    cache.enabled = True
+    cache.use_files = False
+    return cache
+
+
+def stub_fetcher():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return {"ticker": "MSFT", "prices": [{"close": 400.0 + len(calls)}]}
+    return fetch, calls
+
+
+def test_miss_then_memory_hit(cache):
+    fetch, calls = stub_fetcher()
+    key = cache.key("MSFT", date(2024, 1, 2), date(2024, 1, 31))
+
+    first, first_tier = asyncio.run(cache.get_or_fetch(key, fetch))
+    second, second_tier = asyncio.run(cache.get_or_fetch(key, fetch))
+
+    assert (first_tier, second_tier) == (None, "memory")
+    assert second == first
+    assert len(calls) == 1
+    assert cache.counters["misses"] == 1 and cache.counters["memory_hits"] == 1
+
+
+def test_expired_entry_is_refetched(cache):
+    fetch, calls = stub_fetcher()
+    key = cache.key("MSFT", date(2024, 1, 2), date(2024, 1, 31))
+    asyncio.run(cache.get_or_fetch(key, fetch, ttl=60))
+
+    # Backdate the entry instead of sleeping past its TTL
+    _, payload = cache.memory[key]
+    cache.memory[key] = (datetime.utcnow() - timedelta(seconds=1), payload)
+    value, tier = asyncio.run(cache.get_or_fetch(key, fetch, ttl=60))
+
+    assert tier is None
+    assert value["prices"] == [{"close": 402.0}]
+    assert len(calls) == 2
+    assert cache.counters["expired"] == 1
+
+
+def test_concurrent_misses_share_one_fetch(cache):
+    fetch, calls = stub_fetcher()
+    key = cache.key("MSFT", date(2024, 1, 2), date(2024, 1, 31))
+
+    async def both():
+        return await asyncio.gather(cache.get_or_fetch(key, fetch), cache.get_or_fetch(key, fetch))
+
+    (first, first_tier), (second, second_tier) = asyncio.run(both())
+    assert {first_tier, second_tier} == {None, "coalesced"}
+    assert first == second
+    assert len(calls) == 1
+
+
+def test_recent_ranges_get_the_short_ttl(cache):
+    closed = last_closed_session()
+    assert cache.ttl_for(closed) == cache.recent_ttl
+    assert cache.ttl_for(closed + timedelta(days=1)) == cache.recent_ttl
+    assert cache.ttl_for(closed - timedelta(days=1)) == cache.ttl
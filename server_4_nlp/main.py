@@ -1,7 +1,9 @@
+import json
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Optional, Any
-from services.orchestrator import orchestrate_query, orchestrate_enhance
+from typing import Dict, Iterator, Optional, Any, Tuple
+from services.orchestrator import orchestrate_query, orchestrate_enhance, stream_query, stream_enhance
 from utils.logger import log_metadata
 from services.user_data_service import fetch_user_data
 from services.stock_sentiment_service import get_user_stock_sentiments
@@ -28,6 +30,12 @@ class UserStockSentimentRequest(BaseModel):
     userId: str
 
 
+@app.get("/health")
+async def health_check():
+    """Liveness endpoint for the gateway's active health checks."""
+    return {"status": "healthy"}
+
+
 @app.post("/nlp/query")
 async def process_query(request: QueryRequest):
     """
@@ -117,6 +125,60 @@ async def enhance_response(request: EnhanceRequest):
         })
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
+def sse_stream(events: Iterator[Tuple[str, Any]], endpoint: str, user_id: str) -> Iterator[str]:
+    """
+    Format (event, data) pairs as server-sent events, ending with an "error" event if a stage fails.
+
+    The orchestrator stages block, so this is a sync generator; Starlette
+    iterates it in a worker thread and flushes every event as it is yielded.
+    """
+    try:
+        for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    except Exception as e:
+        log_metadata({
+            "service": "main",
+            "endpoint": endpoint,
+            "user_id": user_id,
+            "error": str(e),
+            "status": "error"
+        })
+        yield f"event: error\ndata: {json.dumps({'detail': f'Server error: {str(e)}'})}\n\n"
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@app.post("/nlp/query/stream")
+async def process_query_stream(request: QueryRequest):
+    """
+    Streaming /nlp/query: intent, query sentiment and news sentiment are sent as
+    server-sent events as soon as each is ready, followed by a "done" event.
+    """
+    if not request.query:
+        raise HTTPException(status_code=400, detail="Query must be a non-empty string")
+    return StreamingResponse(
+        sse_stream(stream_query(request.query, request.user_id), "/nlp/query/stream", request.user_id),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+@app.post("/nlp/enhance/stream")
+async def enhance_response_stream(request: EnhanceRequest):
+    """
+    Streaming /nlp/enhance: news sentiment, then the ELI5 text token by token as
+    Gemini generates it, followed by a "done" event with the full result.
+    """
+    if not request.simulation_data:
+        raise HTTPException(status_code=400, detail="Simulation data must be a non-empty dictionary")
+    return StreamingResponse(
+        sse_stream(stream_enhance(request.simulation_data, request.user_id, request.ai_prompt),
+                   "/nlp/enhance/stream", request.user_id),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
 @app.post("/nlp/user-stock-sentiments")
 async def user_stock_sentiments(request: UserStockSentimentRequest) -> Dict[str, Dict[str, Any]]:
     try:
@@ -1,5 +1,5 @@
 import os
-from typing import Dict, Optional
+from typing import Dict, Iterator, Optional
 import google.generativeai as genai
 from google.api_core.exceptions import GoogleAPIError
 from config.settings import GEMINI_API_KEY
@@ -7,6 +7,13 @@ from services.user_data_service import fetch_user_data
 from utils.logger import log_metadata
 import json
 
+# Appended to the system prompt for streamed replies: each chunk goes straight to the
+# client, so the reply must be the explanation itself rather than a JSON document
+STREAM_OUTPUT_INSTRUCTIONS = """
+Output override for this reply: ignore any instruction above to answer in JSON.
+Respond with the main explanation only, as plain text - no JSON, no code fences, no field names.
+"""
+
 
 def generate_eli5_response(simulation_data: Dict[str, any], user_id: str, news_context: Optional[Dict[str, any]] = None, ai_prompt: Optional[str] = None) -> Dict[str, any]:
     """
@@ -30,64 +37,12 @@ def generate_eli5_response(simulation_data: Dict[str, any], user_id: str, news_c
         if not simulation_data or not isinstance(simulation_data, dict):
             raise ValueError("Simulation data must be a non-empty dictionary")
 
-        # Fetch user data for personalization
-        user_data = fetch_user_data(user_id)
-
-        # Load system prompt from text file and replace variables
-        system_prompt = load_and_compile_system_prompt(
-            user_data=user_data,
-            simulation_data=simulation_data,
-            news_context=news_context,
-            ai_prompt=ai_prompt
-        )
-
-        # Configure Gemini
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel(
-            "gemini-2.5-flash",
-            system_instruction=system_prompt
-        )
-
-        # Create user message with the data to analyze
-        user_message = f"""
-Please analyze this data and provide an ELI5 explanation:
-
-Simulation Data: {json.dumps(simulation_data)}
-News Context: {json.dumps(news_context) if news_context else 'None'}
-User Query: {ai_prompt if ai_prompt else "What does this mean for my retirement?"}
-"""
+        model, user_message = build_eli5_request(
+            simulation_data, user_id, news_context, ai_prompt)
 
         # Call Gemini for dynamic response
         response = model.generate_content(user_message)
-
-        # Try to parse JSON response, fallback to plain text if needed
-        try:
-            # Check if response is JSON
-            response_text = response.text.strip()
-            if response_text.startswith('{') and response_text.endswith('}'):
-                eli5_data = json.loads(response_text)
-                eli5_response = eli5_data.get('eli5_response', eli5_data)
-            else:
-                # Plain text response - structure it
-                eli5_response = {
-                    "main_explanation": response_text,
-                    "key_takeaway": "Review the explanation above for key insights about your retirement planning.",
-                    "confidence_boost": "You're taking positive steps by learning about your financial future!"
-                }
-        except json.JSONDecodeError:
-            # Fallback for non-JSON responses
-            eli5_response = {
-                "main_explanation": response.text.strip(),
-                "key_takeaway": "Check your response for key insights about your retirement.",
-                "confidence_boost": "You're on the right track with your retirement planning!"
-            }
-
-        # Ensure we return the expected format for backward compatibility
-        if isinstance(eli5_response, str):
-            eli5_text = eli5_response
-        else:
-            eli5_text = eli5_response.get(
-                'main_explanation', str(eli5_response))
+        eli5_text = extract_eli5_text(response.text)
 
         # Prepare return dict - maintaining original format
         result = {
@@ -142,6 +97,120 @@ User Query: {ai_prompt if ai_prompt else "What does this mean for my retirement?
             f"Unexpected error in ELI5 response generation: {str(e)}")
 
 
+def build_eli5_request(simulation_data: Dict[str, any], user_id: str, news_context: Optional[Dict[str, any]] = None, ai_prompt: Optional[str] = None, plain_text: bool = False):
+    """Build the Gemini model (with the personalised system prompt) and the user message for an ELI5 call.
+
+    With plain_text the system prompt asks for the bare explanation instead of JSON (used for streaming).
+    """
+    # Fetch user data for personalization
+    user_data = fetch_user_data(user_id)
+
+    # Load system prompt from text file and replace variables
+    system_prompt = load_and_compile_system_prompt(
+        user_data=user_data,
+        simulation_data=simulation_data,
+        news_context=news_context,
+        ai_prompt=ai_prompt
+    )
+    if plain_text:
+        system_prompt += "\n" + STREAM_OUTPUT_INSTRUCTIONS
+
+    # Configure Gemini
+    genai.configure(api_key=GEMINI_API_KEY)
+    model = genai.GenerativeModel(
+        "gemini-2.5-flash",
+        system_instruction=system_prompt
+    )
+
+    # Create user message with the data to analyze
+    user_message = f"""
+Please analyze this data and provide an ELI5 explanation:
+
+Simulation Data: {json.dumps(simulation_data)}
+News Context: {json.dumps(news_context) if news_context else 'None'}
+User Query: {ai_prompt if ai_prompt else "What does this mean for my retirement?"}
+"""
+    return model, user_message
+
+
+def extract_eli5_text(response_text: str) -> str:
+    """Turn Gemini's reply (JSON or plain text) into the ELI5 string returned to clients."""
+    # Try to parse JSON response, fallback to plain text if needed
+    try:
+        # Check if response is JSON
+        response_text = response_text.strip()
+        if response_text.startswith('{') and response_text.endswith('}'):
+            eli5_data = json.loads(response_text)
+            eli5_response = eli5_data.get('eli5_response', eli5_data)
+        else:
+            # Plain text response - structure it
+            eli5_response = {
+                "main_explanation": response_text,
+                "key_takeaway": "Review the explanation above for key insights about your retirement planning.",
+                "confidence_boost": "You're taking positive steps by learning about your financial future!"
+            }
+    except json.JSONDecodeError:
+        # Fallback for non-JSON responses
+        eli5_response = {
+            "main_explanation": response_text.strip(),
+            "key_takeaway": "Check your response for key insights about your retirement.",
+            "confidence_boost": "You're on the right track with your retirement planning!"
+        }
+
+    # Ensure we return the expected format for backward compatibility
+    if isinstance(eli5_response, str):
+        return eli5_response
+    return eli5_response.get('main_explanation', str(eli5_response))
+
+
+def stream_eli5_response(simulation_data: Dict[str, any], user_id: str, news_context: Optional[Dict[str, any]] = None, ai_prompt: Optional[str] = None) -> Iterator[str]:
+    """
+    Stream the ELI5 explanation text from Gemini as it is generated.
+
+    The model is asked for plain text so chunks can be shown as they arrive. If it
+    answers in JSON anyway, the reply is buffered and its extracted explanation is
+    yielded once at the end, so clients never see raw JSON fragments.
+
+    Yields:
+        str: Text chunks in generation order; joined, they form the ELI5 string.
+
+    Raises:
+        ValueError: If simulation_data is empty or invalid.
+        GoogleAPIError: If Gemini API call fails.
+    """
+    if not simulation_data or not isinstance(simulation_data, dict):
+        raise ValueError("Simulation data must be a non-empty dictionary")
+
+    model, user_message = build_eli5_request(
+        simulation_data, user_id, news_context, ai_prompt, plain_text=True)
+    try:
+        # None until the first non-blank chunk shows whether the reply is JSON
+        structured = None
+        buffered = []
+        for chunk in model.generate_content(user_message, stream=True):
+            if not chunk.text:
+                continue
+            if structured is None and chunk.text.strip():
+                structured = chunk.text.lstrip().startswith(('{', '`'))
+            if structured:
+                buffered.append(chunk.text)
+            else:
+                yield chunk.text
+        if buffered:
+            reply = "".join(buffered).strip().strip('`').strip()
+            yield extract_eli5_text(reply.removeprefix('json').strip())
+    except GoogleAPIError as gae:
+        log_metadata({
+            "service": "eli5_service",
+            "function": "stream_eli5_response",
+            "user_id": user_id,
+            "simulation_data": simulation_data,
+            "error": str(gae),
+            "status": "error"
+        })
+        raise GoogleAPIError(f"Gemini API error: {str(gae)}")
+
+
 def load_and_compile_system_prompt(user_data: Dict, simulation_data: Dict, news_context: Optional[Dict] = None, ai_prompt: Optional[str] = None) -> str:
     """Load the system prompt from file and replace template variables."""
 
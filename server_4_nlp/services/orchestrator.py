@@ -1,9 +1,9 @@
 import json
-from typing import Dict, Optional, Any
+from typing import Dict, Iterator, Optional, Any, Tuple
 import redis
 from services.gemini_service import process_query_with_gemini
 from services.nlp_service import analyze_sentiment, fetch_news_sentiment
-from services.eli5_service import generate_eli5_response
+from services.eli5_service import generate_eli5_response, stream_eli5_response
 from utils.logger import log_metadata
 from config.settings import REDIS_PASSWORD
 
@@ -208,4 +208,108 @@ def orchestrate_enhance(simulation_data: Dict[str, Any], user_id: str, ai_prompt
             "error": str(e),
             "status": "error"
         })
-        raise Exception(f"Unexpected error in orchestration: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Unexpected error in orchestration: {str(e)}")
+
+def stream_query(query: str, user_id: str) -> Iterator[Tuple[str, Any]]:
+    """
+    Streaming variant of orchestrate_query: yields (event, data) as each stage completes.
+
+    Events, in order: "intent" (intent and entities), "query_sentiment",
+    "news_sentiment" and finally "done" with the same combined result that
+    orchestrate_query returns. Results share orchestrate_query's cache.
+
+    Raises:
+        ValueError: If query is invalid.
+    """
+    if not query or not isinstance(query, str):
+        raise ValueError("Query must be a non-empty string")
+
+    cache_key = f"query:{user_id}:{query}"
+    cached = redis_client.get(cache_key)
+    if cached:
+        result = json.loads(cached)
+        yield "intent", {"intent": result["intent"], "entities": result["entities"]}
+        yield "query_sentiment", result["query_sentiment"]
+        yield "news_sentiment", result["news_sentiment"]
+        yield "done", result
+        return
+
+    gemini_result = process_query_with_gemini(query, user_id)
+    intent = gemini_result["intent"]
+    entities = gemini_result["entities"]
+    yield "intent", {"intent": intent, "entities": entities}
+
+    query_sentiment = analyze_sentiment(query, user_id)
+    yield "query_sentiment", query_sentiment
+
+    news_sentiment = None
+    if intent == "scenario_simulation" and entities.get("scenario"):
+        news_sentiment = fetch_news_sentiment(query, user_id, intent, entities)
+    yield "news_sentiment", news_sentiment
+
+    result = {
+        "intent": intent,
+        "entities": entities,
+        "query_sentiment": query_sentiment,
+        "news_sentiment": news_sentiment
+    }
+    redis_client.setex(cache_key, 3600, json.dumps(result))
+    log_metadata({
+        "service": "orchestrator",
+        "function": "stream_query",
+        "user_id": user_id,
+        "query": query[:50],
+        "status": "success"
+    })
+    yield "done", result
+
+
+def stream_enhance(simulation_data: Dict[str, Any], user_id: str, ai_prompt: Optional[str] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Streaming variant of orchestrate_enhance: yields (event, data) as each stage completes.
+
+    Events, in order: "news_sentiment", one "eli5_token" per Gemini text chunk
+    and finally "done" with the same combined result that orchestrate_enhance
+    returns. Results share orchestrate_enhance's cache.
+
+    Raises:
+        ValueError: If simulation_data is invalid.
+    """
+    if not simulation_data or not isinstance(simulation_data, dict):
+        raise ValueError("Simulation data must be a non-empty dictionary")
+
+    cache_key = f"enhance:{user_id}:{json.dumps(simulation_data)}:{ai_prompt or ''}"
+    cached = redis_client.get(cache_key)
+    if cached:
+        result = json.loads(cached)
+        yield "news_sentiment", result["news_sentiment"]
+        yield "eli5_token", {"text": result["eli5_response"]}
+        yield "done", result
+        return
+
+    news_sentiment = None
+    if simulation_data.get("scenario"):
+        query = f"{simulation_data['scenario']} superannuation"
+        news_sentiment = fetch_news_sentiment(query, user_id, "scenario_simulation", {"scenario": simulation_data["scenario"]})
+    yield "news_sentiment", news_sentiment
+
+    chunks = []
+    for text in stream_eli5_response(simulation_data, user_id, news_sentiment, ai_prompt):
+        chunks.append(text)
+        yield "eli5_token", {"text": text}
+
+    result = {
+        "simulation_data": simulation_data,
+        "news_sentiment": news_sentiment,
+        "eli5_response": "".join(chunks).strip()
+    }
+    redis_client.setex(cache_key, 3600, json.dumps(result))
+    log_metadata({
+        "service": "orchestrator",
+        "function": "stream_enhance",
+        "user_id": user_id,
+        "simulation_data": simulation_data,
+        "ai_prompt": ai_prompt,
+        "status": "success"
+    })
+    yield "done", result
@@ -45,6 +45,12 @@ class ScenarioRequest(BaseModel):
         arbitrary_types_allowed = True
 
 
+@app.get("/health")
+async def health_check():
+    """Liveness endpoint for the gateway's active health checks."""
+    return {"status": "healthy"}
+
+
 @app.post("/analytics/user-data")
 async def user_data_endpoint(request: UserRequest):
     """
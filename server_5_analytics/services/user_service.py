@@ -44,24 +44,30 @@ def fetch_user_data(user_id: str) -> Dict[str, Any]:
         start_date = (datetime.now() - timedelta(days=365)
                       ).strftime("%Y-%m-%d")  # 1 year ago
         end_date = datetime.now().strftime("%Y-%m-%d")  # Today
-        for holding in portfolio_data["holdings"]:
-            if holding["assetType"] != "stock":
-                continue
+        stock_holdings_raw = [
+            holding for holding in portfolio_data["holdings"] if holding["assetType"] == "stock"]
 
-            # Fetch historical stock data
-            stock_data_url = f"{FINANCIAL_SERVER_URL}/api/stock/data"
-            stock_data_payload = {
-                "ticker": holding["symbol"],
+        # Fetch historical data for all holdings in one batch request
+        prices_by_symbol = {}
+        if stock_holdings_raw:
+            batch_url = f"{FINANCIAL_SERVER_URL}/api/stock/data/batch"
+            batch_payload = {
+                "tickers": [holding["symbol"] for holding in stock_holdings_raw],
                 "start_date": start_date,
                 "end_date": end_date
             }
-            stock_data_response = requests.post(
-                stock_data_url, json=stock_data_payload, timeout=5)
-            stock_data_response.raise_for_status()
-            stock_data = stock_data_response.json()
+            batch_response = requests.post(
+                batch_url, json=batch_payload, timeout=30)
+            batch_response.raise_for_status()
+            for result in batch_response.json()["results"]:
+                # Tickers that failed fall back to currentPrice below
+                if result["status"] == 200:
+                    prices_by_symbol[result["ticker"]] = result["data"]["prices"]
 
+        for holding in stock_holdings_raw:
             # Convert prices to DataFrame
-            historical_data = pd.DataFrame(stock_data["prices"])
+            historical_data = pd.DataFrame(
+                prices_by_symbol.get(holding["symbol"].upper().strip(), []))
             if not historical_data.empty:
                 historical_data["ds"] = pd.to_datetime(historical_data["date"])
                 historical_data["y"] = historical_data["close"].astype(float)